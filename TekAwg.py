@@ -1,11 +1,24 @@
 #!/usr/bin/env python
 """Module for communication with and translation of data with a tektronix AWG5000 series."""
 
+from __future__ import print_function
 
 import socket
 import time
+import bisect
+import struct
+import gzip
 import sys
+import os
+import json
+import hashlib
+import collections
+import threading
 import numpy as np
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 class TekAwg(socket.socket):
     """Class which allows communication with a tektronix AWG5000 series (7000 series should work
@@ -24,13 +37,48 @@ class TekAwg(socket.socket):
     """
 
 
-    def __init__(self, ip, port):
-        """Initialize connection and set timout to 500ms
+    def __init__(self, ip, port, upload_cache=None, keep_shadows=False, transport=None):
+        """Initialize connection, see Transport for the timeouts and socket options
+
+            Args:
+                upload_cache: optional WaveformCache, when given new_waveform skips uploads
+                    of waveforms the AWG already holds
+
+                keep_shadows: if True a local copy of every uploaded waveform is kept, so
+                    update_waveform can diff against it without downloading the waveform
+
+                transport: optional Transport with the socket options, timeouts and
+                    reconnect behaviour of the connection
+
+            The SequenceTable last programmed with write_sequence or update_sequence is kept
+            as applied_sequence, which update_sequence diffs against. Set it to None if the
+            sequence was changed by other means.
+
+            See enable_waveform_index to keep a local index of the waveform list, and
+            set_error_polling for when uploads read the error queue.
 
             Raises: socket.error"""
-        socket.socket.__init__(self)
-        self.connect((ip, port))
-        self.settimeout(1)
+        socket.socket.__init__(self, socket.AF_INET, socket.SOCK_STREAM)
+        self.address = (ip, port)
+        self.transport = transport if transport is not None else Transport()
+        self.transport.connect(self, self.address)
+        self.reconnects = 0
+        self.reader = ResponseReader(self)
+        self.upload_cache = upload_cache
+        self.waveform_shadows = {} if keep_shadows else None
+        self.applied_sequence = None
+        self.packet_size_tuner = None
+        self.bit_depth = None
+        self.settings_cache = None
+        self.waveform_index = None
+        self.error_polling = "upload"
+        self.stats = None
+        self.recorder = None
+        self._batch = None
+        self._retry_depth = 0
+        self._retry_timeouts = 0
+        self._timeouts = 0
+        self._held_errors = []
 
     def write(self, message, expect_response=False, expected_length=1):
         """Sends text commands to the AWG5000 Series, no newline or return character required
@@ -50,7 +98,116 @@ class TekAwg(socket.socket):
             Raises:
                 IOError if a response was expected but not recieved
             """
-        return self.__write_helper(message, expect_response, expected_length)
+        if self._batch is not None:
+            if not expect_response:
+                self._batch.add(message)
+                return None
+            #queries are answered right away, after the commands queued before them
+            self._batch.flush()
+        if self.stats is None:
+            return self.__write_helper(message, expect_response, expected_length)
+
+        start_time = time.time()
+        self._retry_depth = 0
+        self._retry_timeouts = 0
+        response = None
+        try:
+            response = self.__write_helper(message, expect_response, expected_length)
+            return response
+        finally:
+            failed = expect_response and response is None
+            #every attempt but the one giving up is followed by a resend
+            retries = self._retry_depth-1 if failed else self._retry_depth
+            self.stats.record(_command_family(message), time.time()-start_time,
+                              (len(message)+1)*(retries+1),
+                              0 if response is None else len(response),
+                              self._retry_timeouts, retries, failed, self._retry_depth)
+
+    def enable_stats(self, callbacks=None):
+        """Record the count, latency, bytes, timeouts and retries of every command sent with
+        write or pipeline_queries (each pipelined message with its latency from the start of
+        the pipeline), and of waveform uploads and downloads, per SCPI command family. Raw
+        socket calls are not recorded. When stats are
+        disabled (the default) nothing is recorded and the cost is a single attribute check.
+
+            Args:
+                callbacks: optional list of functions called with a CommandEvent after every
+                    recorded command
+
+            Returns: the CommandStats, also kept as stats"""
+        self.stats = CommandStats(callbacks)
+        return self.stats
+
+    def disable_stats(self):
+        """Stop recording stats"""
+        self.stats = None
+
+    def start_recording(self, path):
+        """Record every byte sent to and received from the AWG, with timestamps, to a
+        session log which TekAwgReplay can replay against the emulator. The socket methods
+        are wrapped while recording, so nothing is added to the normal path.
+
+            Args:
+                path: file the log is written to, compressed if it ends with ".gz"
+
+            Returns: the SessionRecorder, also kept as recorder"""
+        self.stop_recording()
+        recorder = SessionRecorder(path)
+        self.__record_socket_methods(recorder)
+        self.recorder = recorder
+        return recorder
+
+    def __record_socket_methods(self, recorder):
+        """Wrap the socket methods to record what they transfer with recorder"""
+        self._unrecorded_methods = dict((name, getattr(self, name))
+                                        for name in _recorded_socket_methods
+                                        if hasattr(self, name))
+        self.__set_socket_methods(dict((name, recorder.wrap(name, method))
+                                       for name, method in self._unrecorded_methods.items()))
+
+    def __set_socket_methods(self, methods):
+        for name, method in methods.items():
+            setattr(self, name, method)
+
+    def stop_recording(self):
+        """Stop recording the session and close the log, does nothing if not recording"""
+        if self.recorder is None:
+            return
+        self.__set_socket_methods(self._unrecorded_methods)
+        self.recorder.close()
+        self.recorder = None
+
+    def batch(self, max_length=4096, raise_errors=False):
+        """Context manager which queues the commands sent inside it (for example by the
+        set_* methods) and sends them joined by ";" in as few messages as possible, followed
+        by a single check of the AWG's error status.
+
+        Methods writing to the socket directly (waveform uploads and downloads,
+        pipeline_queries) first flush the commands queued so far, so they still reach the
+        AWG in the order they were called.
+
+        Queries can be queued as well with CommandBatch.query, which returns a BatchFuture
+        resolved when the batch is flushed. Methods which need a response immediately (the
+        get_* methods) first flush the commands queued so far.
+
+        Example:
+
+            with awg.batch() as batch:
+                awg.set_amplitude(0.5)
+                awg.set_offset(0.1)
+                freq = batch.query("FREQ?")
+            print(freq.result(), batch.errors)
+
+            Args:
+                max_length: maximum length of a single message sent to the AWG
+
+                raise_errors: raise an IOError at the end of the batch if the AWG reported
+                    errors, otherwise they are only stored in CommandBatch.errors
+
+            Returns: the CommandBatch"""
+        if self._batch is not None:
+            return self._batch
+        return CommandBatch(self, max_length, raise_errors)
 
     def __write_helper(self, message, expect_response, expected_length, depth=3, cur_depth=0):
         """This is the helper for the write command, this allows for multiple attempts to recieve
@@ -61,43 +218,283 @@ class TekAwg(socket.socket):
             raise IOError("Failed to recieve response. Check to be sure spelling of command is "
                           "correct and there is no newline character at the end of the string.")
 
-        #Send the message
-        self.send(message+"\n")
-
-        #if we are expecting a response, wait until we get the full response back, if not, try again
-        if expect_response:
-            try:
-                response = self.recv(10) #Get some response?
-                while (len(response.split(";")) < expected_length
-                       or len(response) < 1
-                       or response[-1] != "\n"):
-                    #keep going until we are satisfied
-                    response = response+self.recv(100)
-
-                return response.strip() #strip off the "\r\n and return"
-
-            except socket.timeout: #If we time out, try again, print a warning so we know
-                cur_depth += 1
-                print ("Timeout. Trying to send {} again "
-                       "(Attempt {} of {})".format(repr(message.strip()[:100]), cur_depth, depth))
-                #try again
-                return self.__write_helper(message, expect_response, expected_length, depth, cur_depth)
+        try:
+            #Send the message
+            self.send(_to_bytes(message+"\n"))
+
+            #if we are expecting a response, wait until we get the full response back, if not, try again
+            if expect_response:
+                return self.__read_response(expected_length)
+
+        except socket.timeout: #If we time out, try again, print a warning so we know
+            if not expect_response:
+                raise
+            cur_depth += 1
+            self._retry_depth = cur_depth
+            self._retry_timeouts += 1
+            print ("Timeout. Trying to send {} again "
+                   "(Attempt {} of {})".format(repr(message.strip()[:100]), cur_depth, depth))
+            #try again
+            return self.__write_helper(message, expect_response, expected_length, depth, cur_depth)
+
+        except (socket.error, IOError) as e: #the connection was lost
+            self.__recover_connection(message, e)
+            self._retry_depth = cur_depth+1
+            return self.__write_helper(message, expect_response, expected_length, depth,
+                                       cur_depth+1)
 
         #if no response expected, return None
         return None
 
+    def __recover_connection(self, message, error):
+        """Reconnect after the connection was lost while sending message, returns if message
+        can be sent again.
+
+            Raises:
+                error if the transport does not reconnect, IOError if reconnecting failed or
+                message is not idempotent, so it is unknown if the AWG executed it"""
+        if self.transport.reconnect_attempts < 1:
+            raise error
+        print("Connection lost ({}). Reconnecting".format(error))
+        for attempt in range(self.transport.reconnect_attempts):
+            try:
+                self.reconnect()
+                break
+            except socket.error as e:
+                error = e
+                time.sleep(self.transport.reconnect_delay)
+        else:
+            raise IOError("Failed to reconnect to the AWG: {}".format(error))
+        if not _is_idempotent(message):
+            raise IOError("The connection to the AWG was lost and reestablished, {} was not "
+                          "sent again as it is not idempotent".format(repr(message[:100])))
+
+    def reconnect(self):
+        """Close the connection and connect to the AWG again with the same transport, then
+        send the transport's session_commands. Unread responses are dropped, and the settings
+        cache, waveform index and applied_sequence are reset as the AWG may have changed
+        meanwhile.
+
+            Raises: socket.error"""
+        recorder = self.recorder
+        if recorder is not None:
+            self.__set_socket_methods(self._unrecorded_methods)
+        try:
+            socket.socket.close(self)
+        except socket.error:
+            pass
+        socket.socket.__init__(self, socket.AF_INET, socket.SOCK_STREAM)
+        if recorder is not None:
+            self.__record_socket_methods(recorder)
+        self.transport.connect(self, self.address)
+        self.reconnects += 1
+        self.reader.clear()
+        if self.settings_cache is not None:
+            self.settings_cache.invalidate()
+        if self.waveform_index is not None:
+            self.waveform_index.invalidate()
+        self.applied_sequence = None
+        for command in self.transport.session_commands:
+            self.sendall(_to_bytes(command+"\n"))
+
+    def __deadline(self, operation):
+        """Switch the socket timeout to the transport's deadline for operation"""
+        self.settimeout(self.transport.deadline(operation))
+
+    def __default_timeout(self):
+        self.settimeout(self.transport.timeout)
+
+    def __read_response(self, expected_length=1):
+        """Read a full response of expected_length ";" separated fields from the AWG.
+
+            Raises: socket.timeout if the response did not arrive in time"""
+        response = self.reader.read_line()
+        fields = len(_split_fields(response))
+        while fields < expected_length:
+            #keep going until we are satisfied
+            line = self.reader.read_line()
+            fields += len(_split_fields(line))
+            response = response+line
+
+        return response.strip() #strip off the "\r\n and return"
+
+    def __query_with_deadline(self, message, timeout, expected_length=1):
+        """Send a query once and wait up to timeout seconds for the response, for commands
+        which take the AWG long to process. Unlike write the query is not resent on a socket
+        timeout, so a late response can not be mistaken for the response to a resend.
+
+            Raises:
+                IOError if the response did not arrive in time"""
+        def read():
+            deadline = time.time()+timeout
+            while True:
+                try:
+                    return self.__read_response(expected_length)
+                except socket.timeout:
+                    if time.time() > deadline:
+                        raise
+
+        start_time = time.time()
+        response = None
+        try:
+            response = self.__query_direct(message, read)
+            return response
+        except socket.timeout:
+            raise IOError("Timeout. No response to {}".format(repr(message[:100])))
+        finally:
+            if self.stats is not None:
+                self.stats.record(_command_family(message), time.time()-start_time,
+                                  len(message)+1, 0 if response is None else len(response),
+                                  int(response is None), 0, response is None)
+
+    def __query_direct(self, message, read):
+        """Send message once and return read(), the responses read by the caller, for the
+        queries which must not be resent on a socket timeout. Commands queued by a batch
+        are sent first, and a lost connection is recovered as in write and message sent
+        again.
+
+            Args:
+                message: one or more newline separated messages
+
+                read: function reading the responses, raising socket.timeout if they did not
+                    arrive in time
+
+            Raises:
+                socket.timeout from read"""
+        self.__flush_batch()
+        try:
+            self.sendall(_to_bytes(message+"\n"))
+            return read()
+        except socket.timeout:
+            raise
+        except (socket.error, IOError) as e: #the connection was lost
+            self.__recover_connection(message.replace("\n", ";"), e)
+        self.sendall(_to_bytes(message+"\n"))
+        return read()
+
+    def __flush_batch(self):
+        """Send the commands queued by a batch before writing to the socket directly, so
+        they reach the AWG first (for example the WLIST:WAVEFORM:NEW before the data)"""
+        if self._batch is not None:
+            self._batch.flush()
+
+    def pipeline_queries(self, messages, expected_lengths=None):
+        """Send several query messages back to back without waiting for the responses in
+        between, then read all the responses in order.
+
+            Args:
+                messages: list of str query messages, each may hold several ";" separated
+                    queries
+
+                expected_lengths: list of the number of responses expected to each message,
+                    defaults to one each
+
+            Returns: list of the response strings, one per message
+
+            Raises:
+                IOError if a response timed out"""
+        if expected_lengths is None:
+            expected_lengths = [1]*len(messages)
+        #(response, arrival time) of every message answered so far
+        received = []
+        def read():
+            del received[:]
+            for length in expected_lengths:
+                received.append((self.__read_response(length), time.time()))
+            return [response for response, _ in received]
+
+        start_time = time.time()
+        try:
+            return self.__query_direct("\n".join(messages), read)
+        except socket.timeout:
+            raise IOError("Timeout. Failed to recieve all pipelined responses.")
+        finally:
+            if self.stats is not None:
+                for i, message in enumerate(messages):
+                    response, arrival = received[i] if i < len(received) else (None, time.time())
+                    self.stats.record(_command_family(message), arrival-start_time,
+                                      len(message)+1, 0 if response is None else len(response),
+                                      int(response is None), 0, response is None)
+
+    def __send_parts(self, parts):
+        """Send a sequence of byte strings and buffers (memoryviews, ndarrays) to the AWG
+        back to back, without joining them into one intermediate string first."""
+        self.__flush_batch()
+        parts = [_to_bytes(p) if isinstance(p, (str, type(u""))) else p for p in parts]
+        if hasattr(self, "sendmsg"):
+            views = [memoryview(p).cast("B") for p in parts]
+            while views:
+                sent = self.sendmsg(views)
+                while views and sent >= len(views[0]):
+                    sent -= len(views[0])
+                    views.pop(0)
+                if views:
+                    views[0] = views[0][sent:]
+        else:
+            for part in parts:
+                self.sendall(part)
+
+    def drain_error_queue(self, batch_size=8, prefix=None):
+        """Read the error queue of the AWG until it is empty, without looking at *ESR?
+        (which may already have been read and cleared). batch_size SYSTEM:ERR? queries are
+        sent per message until the "0,No error" sentinel comes back, so a queue of n errors
+        takes about n/batch_size round trips.
+
+            Args:
+                batch_size: number of SYSTEM:ERR? queries sent in one message
+
+                prefix: optional query sent at the start of the first message, its response
+                    is dropped
+
+            Returns: list of the error strings, starting with any errors get_bit_depth read
+                from the queue on the caller's behalf"""
+        err_queue, self._held_errors = self._held_errors, []
+        queries = [":SYSTEM:ERR?"]*batch_size
+        while True:
+            message = ";".join(queries if prefix is None else [prefix]+queries)
+            responses = _split_fields(self.write(message, True, message.count(";")+1))
+            if prefix is not None:
+                responses = responses[1:]
+                prefix = None
+            for error in responses:
+                if error.strip().startswith("0"):
+                    return err_queue
+                err_queue.append(error.strip())
+
     def get_error_queue(self):
-        err_queue = []
-        err_num = int(self.write("*ESR?", True)[0])
-        while err_num != 0:
-            err_queue.append(self.write("SYSTEM:ERR?",True))
-            err_num = int(self.write("*ESR?", True)[0])
-        return err_queue
+        """Clear the event status register (*ESR?) and read the error queue of the AWG in a
+        single round trip, unless more errors are queued than drain_error_queue reads per
+        message.
+
+            Returns: list of the error strings"""
+        return self.drain_error_queue(prefix="*ESR?")
+
+    def set_error_polling(self, mode):
+        """Choose when uploads read the error queue of the AWG, allowed modes are:
+            upload: before and after every upload (the default), errors are printed
+            checkpoint: only at the packet checkpoints (see ack_window of new_waveform),
+                which detect errors and resend, the queue is left for the caller to read
+                with get_error_queue at checkpoints of its choosing
+
+        In checkpoint mode an error left over from an earlier command makes the first
+        checkpoint of the next upload resend its packets once."""
+        if mode not in _error_polling_modes:
+            raise ValueError("Error polling mode must be one of {}".format(
+                ", ".join(_error_polling_modes)))
+        self.error_polling = mode
+
+    def __poll_upload_errors(self):
+        """get_error_queue around uploads, skipped in the checkpoint error polling mode"""
+        if self.error_polling == "checkpoint":
+            return []
+        return self.get_error_queue()
 
 #############  PRINTING SETTINGS   #########################
 
     def print_waveform_list(self):
         """Prints a formatted list of all the current waveforms in active memory of the AWG.
+        If the names were read but not the lengths, types and timestamps, the names are
+        printed with those left blank.
 
             Returns: 0  if printed correctly
                      -1 if there was a connection issue
@@ -105,59 +502,47 @@ class TekAwg(socket.socket):
         """
         con_error = False
 
-        #get list of waveforms, and count how many we have
         try:
-            waveform_list = self.get_waveform_list()
-            num_saved_waveforms = len(waveform_list)
+            names = self.__scan_waveform_names(50, 4)
         except IOError:
             return -1
 
         try:
-            waveform_lengths = self.get_waveform_lengths(waveform_list)
-        except IOError:
-            waveform_lengths = ["" for _ in range(num_saved_waveforms)]
-            con_error = True
-
-        try:
-            waveform_types = self.get_waveform_type(waveform_list)
+            waveforms = self.__scan_waveform_info(names, 50, 4)
+            rows = [(info.length, info.type, '"'+info.tstamp+'"')
+                    for info in waveforms.values()]
         except IOError:
-            waveform_types = ["" for _ in range(num_saved_waveforms)]
+            rows = [("", "", "") for _ in names]
             con_error = True
 
-        try:
-            waveform_date = self.get_waveform_timestamp(waveform_list)
-        except IOError:
-            waveform_date = ["" for _ in range(0, num_saved_waveforms)]
-            con_error = True
-
-        print "\nList of waveforms in memory:"
-        print "\nIndex \t Name\t\t\t\t Data Points \tType\t\tDate"
-        for i in range(num_saved_waveforms):
+        print("\nList of waveforms in memory:")
+        print("\nIndex \t Name\t\t\t\t Data Points \tType\t\tDate")
+        for i, (name, (length, wave_type, tstamp)) in enumerate(zip(names, rows)):
             print ('{0:<9}{1: <32}{2: <15}{3:<16}{4:<5}'.format(i+1,
-                                                                waveform_list[i],
-                                                                waveform_lengths[i],
-                                                                waveform_types[i],
-                                                                waveform_date[i]))
+                                                                '"'+name+'"',
+                                                                length,
+                                                                wave_type,
+                                                                tstamp))
 
         if con_error:
-            print "\nConnection Error, partial list printed only"
+            print("\nConnection Error, partial list printed only")
             return -1
         else:
             return 0
 
     def print_config(self):
         """Print the current configuration of the AWG"""
-        print "\n\nCurrent Settings\n"
-        print "Hardware ID:     ", self.get_serial()
-        print "Run Mode:        ", self.get_run_mode()
-        print "Run State:       ", self.get_run_state()
-        print "Frequency:       ", self.get_freq()
+        print("\n\nCurrent Settings\n")
+        print("Hardware ID:     ", self.get_serial())
+        print("Run Mode:        ", self.get_run_mode())
+        print("Run State:       ", self.get_run_state())
+        print("Frequency:       ", self.get_freq())
 
         cur_waves = self.get_cur_waveform()
         cur_amp = self.get_amplitude()
         cur_offset = self.get_offset()
         chan_state = self.get_chan_state()
-        print "\nChannel Settings"
+        print("\nChannel Settings")
         print ('%-15s%-15s%-15s%-15s%-15s' %
                ("Setting", "Channel 1", "Channel 2", "Channel 3", "Channel 4"))
         print ('%-15s%-15s%-15s%-15s%-15s' %
@@ -170,32 +555,40 @@ class TekAwg(socket.socket):
                ("Channel State:", chan_state[0], chan_state[1], chan_state[2], chan_state[3]))
 
 
-        seq_list = self.get_seq_list()
-        print "\nCurrent Sequence:"
+        sequence = self.read_sequence()
+        seq_list = sequence.to_list(quoted=True)
+        print("\nCurrent Sequence:")
         print ('%-15s%-15s%-15s%-15s%-15s%-15s%-15s' %
                ("Index", "Channel 1", "Channel 2", "Channel 3",
                 "Channel 4", "Loop Count", "Jump Target"))
         for i in range(len(seq_list)):
-            loop_count = self.get_seq_element_loop_cnt(i+1)
-            jump_trg = self.get_seq_element_jmp_ind(i+1)
+            loop_count = sequence.loop_count[i]
+            jump_trg = sequence.jump_target(i)
             print ('%-15i%-15s%-15s%-15s%-15s%-15s%-15s' %
                    (i+1, seq_list[i][0], seq_list[i][1], seq_list[i][2],
                     seq_list[i][3], loop_count, jump_trg))
 
-        print ""
+        print("")
 
 
 ################  WAVEFORMS    #############################
 
     def get_waveform_list(self):
-        """Returns a list of all the currently saved waveforms on the AWG"""
+        """Returns a list of all the currently saved waveforms on the AWG, served from the
+        waveform index if it is enabled"""
+        if self.waveform_index is not None:
+            self.__check_waveform_index()
+            return ['"'+name+'"' for name in self.waveform_index]
 
         num_saved_waveforms = int(self.write("WLIST:SIZE?", True))
+        if num_saved_waveforms == 0:
+            return []
 
         waveform_list_cmd = 'WLIST:'
         waveform_list_cmd += ";".join(["NAME? "+str(i) for i in range(0, num_saved_waveforms)])
 
-        waveform_list = self.write(waveform_list_cmd, True, num_saved_waveforms).split(";")
+        waveform_list = _split_fields(self.write(waveform_list_cmd, True,
+                                                 num_saved_waveforms))
 
         return waveform_list
 
@@ -208,10 +601,11 @@ class TekAwg(socket.socket):
 
         if num_saved_waveforms > 1:
             waveform_length_cmd = 'WLIST:WAVeform:'+";".join(["LENGTH? "+ i for i in waveform_list])
-            waveform_lengths = self.write(waveform_length_cmd, True, num_saved_waveforms).split(";")
+            waveform_lengths = _split_fields(self.write(waveform_length_cmd, True,
+                                                        num_saved_waveforms))
         else:
             waveform_length_cmd = 'WLIST:WAVeform:LENGTH? '+str(waveform_list)
-            waveform_lengths = self.write(waveform_length_cmd, True).split(";")
+            waveform_lengths = _split_fields(self.write(waveform_length_cmd, True))
 
         if len(waveform_lengths) == num_saved_waveforms:
             return waveform_lengths
@@ -237,10 +631,11 @@ class TekAwg(socket.socket):
 
         if num_saved_waveforms > 1:
             waveform_type_cmd = 'WLIST:WAVeform:'+";".join(["TYPE? "+ str(i) for i in waveform_list])
-            waveform_type = self.write(waveform_type_cmd, True, num_saved_waveforms).split(";")
+            waveform_type = _split_fields(self.write(waveform_type_cmd, True,
+                                                     num_saved_waveforms))
         else:
             waveform_type_cmd = 'WLIST:WAVeform:TYPE? '+str(waveform_list)
-            waveform_type = self.write(waveform_type_cmd, True).split(";")
+            waveform_type = _split_fields(self.write(waveform_type_cmd, True))
 
         if len(waveform_type) == num_saved_waveforms:
             return waveform_type
@@ -265,63 +660,213 @@ class TekAwg(socket.socket):
 
         if num_saved_waveforms > 1:
             waveform_date_cmd = 'WLIST:WAVeform:'+";".join(["TSTAMP? "+ str(i) for i in waveform_list])
-            waveform_date = self.write(waveform_date_cmd, True, num_saved_waveforms).split(";")
+            waveform_date = _split_fields(self.write(waveform_date_cmd, True,
+                                                     num_saved_waveforms))
         else:
             waveform_date_cmd = 'WLIST:WAVeform:TSTAMP? '+str(waveform_list)
-            waveform_date = self.write(waveform_date_cmd, True).split(";")
+            waveform_date = _split_fields(self.write(waveform_date_cmd, True))
 
         if len(waveform_date) == num_saved_waveforms:
             return waveform_date
         else:
             raise IOError("Failed to retrieve lengths of all waveforms.")
 
+    def scan_waveforms(self, chunk_size=50, pipeline_depth=4):
+        """Read the names, lengths, types and timestamps of all waveforms on the AWG in a few
+        pipelined messages, and refresh the waveform index with them if it is enabled.
+
+            Args:
+                chunk_size: number of queries sent in one message
+
+                pipeline_depth: number of messages sent before their responses are read
+
+            Returns: OrderedDict of name: WaveformInfo in the order of the AWG's list
+
+            Raises:
+                IOError if a response was not recieved"""
+        names = self.__scan_waveform_names(chunk_size, pipeline_depth)
+        return self.__scan_waveform_info(names, chunk_size, pipeline_depth)
+
+    def __scan_waveform_names(self, chunk_size, pipeline_depth):
+        """The names of all waveforms on the AWG, see scan_waveforms"""
+        num_saved_waveforms = int(self.write("WLIST:SIZE?", True))
+        return [_unquote(name) for name in
+                self.__pipelined_fields(["NAME? "+str(i) for i in range(num_saved_waveforms)],
+                                        "WLIST:", chunk_size, pipeline_depth)]
+
+    def __scan_waveform_info(self, names, chunk_size, pipeline_depth):
+        """Read the lengths, types and timestamps of the waveforms names, and refresh the
+        waveform index with them, see scan_waveforms"""
+        fields = self.__pipelined_fields([q+' "'+name+'"' for name in names
+                                          for q in ("LENGTH?", "TYPE?", "TSTAMP?")],
+                                         "WLIST:WAVeform:", chunk_size, pipeline_depth)
+        waveforms = collections.OrderedDict(
+            [(name, WaveformInfo(int(fields[3*i]), fields[3*i+1].strip(),
+                                 _unquote(fields[3*i+2])))
+             for i, name in enumerate(names)])
+        if self.waveform_index is not None:
+            self.waveform_index.replace(waveforms)
+        return waveforms
+
+    def __pipelined_fields(self, queries, prefix, chunk_size, pipeline_depth):
+        """Send queries sharing a header prefix in messages of chunk_size queries, pipelined
+        pipeline_depth messages deep, returns the list of all the responses"""
+        messages = []
+        lengths = []
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start+chunk_size]
+            messages.append(prefix+";".join(chunk))
+            lengths.append(len(chunk))
+
+        fields = []
+        for i in range(0, len(messages), pipeline_depth):
+            for response in self.pipeline_queries(messages[i:i+pipeline_depth],
+                                                  lengths[i:i+pipeline_depth]):
+                fields.extend(_split_fields(response))
+        if len(fields) != len(queries):
+            raise IOError("Failed to retrieve the whole waveform list.")
+        return fields
+
+    def enable_waveform_index(self, max_age=0.):
+        """Keep a local index of the waveform list (name, length, type, timestamp), filled by
+        one scan_waveforms and kept current by new_waveform, update_waveform and
+        del_waveform. Uploads then look names up in the index instead of reading the whole
+        waveform list from the AWG.
+
+        Before the index is used it is checked against the AWG by asking for the number of
+        waveforms, and for the name of the last one if the number matches, it is rescanned
+        if either differs. Waveforms replaced by other means under the same name keep their
+        old entry until the next scan.
+
+            Args:
+                max_age: seconds the index is trusted after a check without checking again,
+                    0 to check before every use, None to never check
+
+            Returns: the WaveformIndex"""
+        self.waveform_index = WaveformIndex(max_age)
+        self.scan_waveforms()
+        return self.waveform_index
+
+    def disable_waveform_index(self):
+        """Stop indexing waveforms, every lookup reads the waveform list from the AWG again"""
+        self.waveform_index = None
+
+    def has_waveform(self, filename):
+        """True if a waveform named filename is stored on the AWG, looked up in the waveform
+        index if it is enabled"""
+        if self.waveform_index is None:
+            return '"'+filename+'"' in self.get_waveform_list()
+        self.__check_waveform_index()
+        return filename in self.waveform_index
+
+    def __check_waveform_index(self):
+        """Rescan the waveform index if it was invalidated, or if the number of waveforms on
+        the AWG or the name of the last one differs from the index"""
+        index = self.waveform_index
+        if not index.needs_check():
+            return
+        if index.valid:
+            num_saved_waveforms = int(self.write("WLIST:SIZE?", True))
+            if num_saved_waveforms == len(index) and (
+                    num_saved_waveforms == 0 or index.last_name() == _unquote(
+                        self.write("WLIST:NAME? "+str(num_saved_waveforms-1), True))):
+                return
+        self.scan_waveforms()
 
     def get_waveform_data(self, filename):
-        """"""
-        raw_waveform_str = self.__get_waveform_data(filename)
+        """Download a waveform from the AWG and decode it.
+
+            Args:
+                filename: name of the waveform to get from the AWG
+
+            Returns: (arb, mk1, mk2) ndarrays for an INT waveform, decoded for the bit depth
+                of the AWG, or a structured ndarray of (float32, marker byte) records for a
+                REAL waveform, see decode_real_waveform
+
+            Raises:
+                IOError if there was a timeout, most likely due to connection or incorrect name
+        """
         str_type = self.write('WLISt:WAVeform:TYPE? "'+filename+'"', True)
-        return byte_str_to_vals(raw_waveform_str, str_type)
+        raw_waveform = self.__get_waveform_data(filename, _waveform_dtypes.get(str_type, "<u2"))
+        if str_type == "REAL":
+            return byte_str_to_vals(raw_waveform, str_type)
+        return byte_str_to_vals(raw_waveform, str_type, self.get_bit_depth())
 
 
-    def __get_waveform_data(self, filename):
+    def __get_waveform_data(self, filename, dtype="<u2"):
         """Get the raw waveform data from the AWG, this will be in the packed format containing
         both the channel waveforms as well as the markers, this needs to be correctly formatted.
+
+        The IEEE block header is parsed once, then the data is received directly into a
+        preallocated array of the right size.
             Args:
                 filename: name of the file to get from the AWG
 
-            Returns: a string of binary containing the data from the AWG, header has been removed
+                dtype: numpy dtype of a single point of the waveform
+
+            Returns: an ndarray of dtype containing the data from the AWG, header has been removed
 
             Raises:
                 IOError if there was a timeout, most likely due to connection or incorrect name
         """
-        self.send(str('WLISt:WAVeform:DATA? "'+filename+'"\r\n'))
-        time.sleep(.05)
+        start_time = time.time()
+        self._timeouts = 0
+        self.__flush_batch()
+        self.__deadline("download")
+        try:
+            self.send(_to_bytes('WLISt:WAVeform:DATA? "'+filename+'"\r\n'))
+
+            header = bytearray(2)
+            self.__recv_into_exactly(header)
+            if header[0:1] != bytearray(b"#"):
+                raise IOError("Failed to get waveform, unexpected response from the AWG.")
+            waveform_length = bytearray(int(chr(header[1])))
+            self.__recv_into_exactly(waveform_length)
+            waveform_length = int(bytes(waveform_length))
+
+            raw_waveform = np.empty(waveform_length, dtype=np.uint8)
+            self.__recv_into_exactly(raw_waveform)
+
+            #consume the "\r\n" terminating the response
+            terminator = bytearray(1)
+            while terminator != bytearray(b"\n"):
+                self.__recv_into_exactly(terminator)
+        finally:
+            self.__default_timeout()
+
+        if self.stats is not None:
+            self.stats.record("WLIST:WAVEFORM:DATA?", time.time()-start_time, 0,
+                              waveform_length, self._timeouts)
+        return raw_waveform.view(dtype)
+
+    def __recv_into_exactly(self, buf, max_timeouts=5):
+        """Fill the writable buffer buf completely with data received from the AWG.
 
-        raw_waveform = ""
-        waveform_length = 5
+            Raises:
+                IOError if the AWG timed out max_timeouts times or closed the connection"""
+        view = memoryview(buf)
+        if view.itemsize != 1:
+            view = memoryview(np.frombuffer(buf, dtype=np.uint8))
+        received = 0
         timeouts = 0
-        while len(raw_waveform) < 2 or len(raw_waveform) <= waveform_length:
-            if timeouts >= 5:
-                raise IOError("Timeout. Failed to get waveform")
+        while received < len(view):
             try:
-                raw_waveform = "".join([raw_waveform, self.recv(10000)])
+                num_bytes = self.reader.recv_into(view[received:])
             except socket.error as e:
-                print e
-                time.sleep(1)
+                print(e)
                 timeouts += 1
-            if len(raw_waveform) > 5:
-                num_digits = int(raw_waveform[1])
-                waveform_length = int(raw_waveform[2:2+num_digits])
+                self._timeouts += 1
+                if timeouts >= max_timeouts:
+                    raise IOError("Timeout. Failed to get waveform")
+                continue
+            if num_bytes == 0:
+                raise IOError("Connection closed by the AWG.")
+            received += num_bytes
 
-        raw_waveform = raw_waveform.strip()[num_digits+2:]
 
-        #waveform = list(struct.unpack("<"+"fx"*(waveform_length/5),raw_waveform))
 
-        return raw_waveform
-
-
-
-    def new_waveform(self, filename, packed_data, packet_size=20000):
+    def new_waveform(self, filename, packed_data, packet_size=20000, ack_window=1,
+                     digest=None, length=None, chunk_size=1 << 18, bit_depth=None):
         """Creates a new waveform on the AWG and saves the data. It has error checking
             in the transmission, after every packet it asks the AWG if it had any issues
             writing the data to memory. If the AWG reports an error it resends that packet.
@@ -335,65 +880,421 @@ class TekAwg(socket.socket):
                 filename: the name of the new waveform
 
                 packed_data: numpy ndarray or list of the already 'packed' data (both
-                            the waveform and markers in an int16 format)
+                            the waveform and markers in an int16 format), uploaded as an INT
+                            waveform. A structured ndarray of REAL records, as made by
+                            encode_real_waveform, is uploaded as a REAL waveform. It can also be
+                            an iterator of chunks, each an (arb, mk1, mk2) tuple encoded
+                            with encode_waveform or an ndarray of packed codes, or a
+                            callable returning the chunk of points [start, stop) when
+                            called with (start, stop). Chunks are generated and encoded
+                            in the background while the previous ones are sent, so only a
+                            few chunks are in memory at once. length must then be given.
 
                 packet_size: Size of the TCP/IP packet which are sent to the AWG.
                             This has a large effect on speed of transfer and stability.
+                            "auto" tunes the size during the upload from the measured
+                            time per packet and error rate, see PacketSizeTuner. The best
+                            size found is remembered for later uploads to this AWG.
+
+                ack_window: number of packets sent before the AWG is asked for its error
+                            status. 1 (the default) is the safe mode, every packet is
+                            acknowledged before the next is sent. Larger values keep that
+                            many packets in flight, and on an error only the packets after
+                            the last clean checkpoint are resent. None checks once at the end.
+
+                digest: optional waveform_digest of packed_data, saves hashing the data when
+                            an upload_cache is used
+
+                length: number of points of a streamed waveform
+
+                chunk_size: number of points of the chunks requested from a callable
+
+                bit_depth: bit depth the chunks of a streamed waveform are encoded for, None
+                            for the bit depth of the AWG
+
+            Returns:
+                float, the achieved throughput of the upload in bytes per second, or None if
+                the upload_cache showed the AWG already holds this data under filename
+
+            Raises:
+                IOError: if there was a connection error, or a window of packets still
+                    failed after the transport's max_resends
+                ValueError: if the chunks of a streamed waveform do not add up to length,
+                    the incomplete waveform is then deleted from the AWG"""
+        if _is_chunk_source(packed_data):
+            if bit_depth is None:
+                bit_depth = self.get_bit_depth()
+            return self.__new_waveform_stream(filename, packed_data, length, packet_size,
+                                              ack_window, chunk_size, bit_depth)
+        packed_data = _as_upload_array(packed_data)
+        throughput = None
+        if self.upload_cache is None:
+            throughput = self.__new_waveform_int(filename, packed_data, packet_size, ack_window)
+        else:
+            if digest is None:
+                digest = waveform_digest(packed_data)
+            entry = self.upload_cache.lookup(filename, digest)
+            if entry is not None:
+                length, tstamp = self.__get_waveform_length_tstamp(filename)
+                cache_hit = self.upload_cache.validate(filename, length, tstamp)
+            else:
+                cache_hit = False
+
+            if not cache_hit:
+                throughput = self.__new_waveform_int(filename, packed_data, packet_size,
+                                                     ack_window)
+                length, tstamp = self.__get_waveform_length_tstamp(filename)
+                self.upload_cache.record(filename, digest, length, tstamp)
+
+        if self.waveform_shadows is not None:
+            self.waveform_shadows[filename] = packed_data.copy()
+        return throughput
+
+    def update_waveform(self, filename, packed_data, packet_size=20000, ack_window=1,
+                        merge_gap=64):
+        """Update an existing waveform on the AWG, only the ranges of points which differ from
+            the current contents are sent. The current contents are taken from the local shadow
+            copy (see keep_shadows), or downloaded from the AWG if there is none. If the length
+            of the waveform changes it is uploaded in full with new_waveform.
+
+            Args:
+                filename: the name of the waveform to update
+
+                packed_data: numpy ndarray or list of the new 'packed' data, or REAL
+                            records, see new_waveform
+
+                packet_size, ack_window: see new_waveform
+
+                merge_gap: changed ranges separated by at most this many unchanged points are
+                            sent as one range, as each range costs a command header
 
             Returns:
-                None
+                list of (start, size) ranges of points which were sent
 
             Raises:
                 IOError: if there was a connection error"""
-        packed_data = ints_to_byte_str(packed_data)
-        self.__new_waveform_int(filename, packed_data, packet_size)
+        packed_data = _as_upload_array(packed_data)
+        if self.waveform_shadows is not None and filename in self.waveform_shadows:
+            old_data = self.waveform_shadows[filename]
+        else:
+            str_type = self.write('WLISt:WAVeform:TYPE? "'+filename+'"', True)
+            if np.dtype(_waveform_dtypes.get(str_type, "<u2")) == packed_data.dtype:
+                old_data = self.__get_waveform_data(filename, packed_data.dtype)
+            else:
+                old_data = None
+
+        if packet_size == "auto":
+            packet_size = self.__get_packet_size_tuner().best_size
+
+        if (old_data is None or old_data.dtype != packed_data.dtype
+                or len(old_data) != len(packed_data)):
+            self.new_waveform(filename, packed_data, packet_size, ack_window)
+            return [(0, len(packed_data))]
+
+        ranges = changed_ranges(old_data, packed_data, merge_gap)
+        if ranges == []:
+            return ranges
+
+        errs = self.__poll_upload_errors()
+        self.__deadline("upload")
+        try:
+            packets = []
+            for start, size in ranges:
+                packets.extend([(i, min(packet_size, start+size-i))
+                                for i in range(start, start+size, packet_size)])
+            self.__send_waveform_packets(filename, packed_data, packets, ack_window)
+            errs = self.__poll_upload_errors()
+            if errs != []:
+                print(errs)
+        finally:
+            self.__default_timeout()
+
+        if self.waveform_index is not None:
+            self.waveform_index.touch(filename)
+        if self.waveform_shadows is not None:
+            self.waveform_shadows[filename] = packed_data.copy()
+        if self.upload_cache is not None:
+            length, tstamp = self.__get_waveform_length_tstamp(filename)
+            self.upload_cache.record(filename, waveform_digest(packed_data), length, tstamp)
+        return ranges
+
+    def __get_waveform_length_tstamp(self, filename):
+        """Returns (length, timestamp) of a waveform on the AWG in a single query,
+        (None, None) if the AWG did not answer, for example if the waveform does not exist."""
+        try:
+            response = _split_fields(self.write('WLIST:WAVeform:LENGTH? "'+filename+'";'
+                                                'TSTAMP? "'+filename+'"', True, 2))
+            return int(response[0]), response[1]
+        except (IOError, ValueError, IndexError):
+            return None, None
+
+
+    def __new_waveform_int(self, filename, packed_data, packet_size, ack_window=1):
+        """This is the helper function which actually sends the waveform to the AWG, see above.
+        packed_data is a C-contiguous little-endian uint16 ndarray of the codes, or of REAL
+        records."""
+        errs = self.__poll_upload_errors()
+        #if errs != []:
+        #    print(errs)
+        data_length = packed_data.nbytes
+        start_time = time.time()
+
+        self.__deadline("upload")
+        try:
+            if self.has_waveform(filename):
+                self.del_waveform(filename)
+
+            num_points = len(packed_data)
+            self.write('WLISt:WAVeform:NEW "'+filename+'",'+str(num_points)+","
+                       +_waveform_type(packed_data))
+            if self.waveform_index is not None:
+                self.waveform_index.add(filename, num_points, _waveform_type(packed_data))
+
+            if packet_size == "auto":
+                tuner = self.__get_packet_size_tuner()
+                resends = self.__send_waveform_adaptive(filename, packed_data, tuner, ack_window)
+                _learned_packet_sizes[self.getpeername()] = tuner.best_size
+            else:
+                #(start, size) in points of every packet to be sent
+                packets = [(i, min(packet_size, num_points-i))
+                           for i in range(0, num_points, packet_size)]
+                resends = self.__send_waveform_packets(filename, packed_data, packets, ack_window)
+
+            errs = self.__poll_upload_errors()
+            if errs != []:
+                print(errs)
+        finally:
+            self.__default_timeout()
+
+        elapsed = max(time.time()-start_time, 1e-9)
+        if self.stats is not None:
+            self.stats.record("WLIST:WAVEFORM:DATA", elapsed, data_length, 0, 0, resends)
+        return data_length/elapsed
+
+    def __new_waveform_stream(self, filename, chunks, length, packet_size, ack_window,
+                              chunk_size, bit_depth):
+        """Create a waveform of length points on the AWG and send it chunk by chunk as the
+        chunks are produced, see new_waveform. Every chunk ends with an error check, so only
+        the current chunk is kept for resending."""
+        if length is None:
+            raise ValueError("The length of a streamed waveform must be given.")
+        if packet_size == "auto":
+            packet_size = self.__get_packet_size_tuner().best_size
+        if callable(chunks):
+            generate = chunks
+            chunks = (generate(start, min(start+chunk_size, length))
+                      for start in range(0, length, chunk_size))
+
+        errs = self.__poll_upload_errors()
+        start_time = time.time()
+        self.__deadline("upload")
+        try:
+            if self.has_waveform(filename):
+                self.del_waveform(filename)
+            self.write('WLISt:WAVeform:NEW "'+filename+'",'+str(length)+",INT")
+            if self.waveform_index is not None:
+                self.waveform_index.add(filename, length, "INT")
+
+            digest = hashlib.sha1()
+            offset = 0
+            resends = 0
+            encoded = _encoded_chunks(chunks, bit_depth)
+            try:
+                for codes in encoded:
+                    if offset+len(codes) > length:
+                        raise ValueError("The chunks of waveform {} are longer than its "
+                                         "length of {}".format(filename, length))
+                    packets = [(i, min(packet_size, len(codes)-i))
+                               for i in range(0, len(codes), packet_size)]
+                    resends += self.__send_waveform_packets(filename, codes, packets,
+                                                            ack_window, offset)
+                    digest.update(codes)
+                    offset += len(codes)
+                if offset != length:
+                    raise ValueError("The chunks of waveform {} add up to {} points instead "
+                                     "of {}".format(filename, offset, length))
+            except (IOError, socket.error):
+                raise
+            except Exception:
+                #the chunks failed or did not add up to length, delete the incomplete
+                #waveform so neither the AWG nor the index or cache hold it as complete
+                self.del_waveform(filename)
+                raise
+            finally:
+                encoded.close()
+
+            errs = self.__poll_upload_errors()
+            if errs != []:
+                print(errs)
+        finally:
+            self.__default_timeout()
+        elapsed = max(time.time()-start_time, 1e-9)
+        if self.stats is not None:
+            self.stats.record("WLIST:WAVEFORM:DATA", elapsed, length*2, 0, 0, resends)
+        throughput = length*2/elapsed
+
+        if self.waveform_shadows is not None:
+            self.waveform_shadows.pop(filename, None)
+        if self.upload_cache is not None:
+            stored_length, tstamp = self.__get_waveform_length_tstamp(filename)
+            self.upload_cache.record(filename, digest.hexdigest(), stored_length, tstamp)
+        return throughput
+
+    def __send_waveform_packets(self, filename, packed_data, packets, ack_window=1, offset=0):
+        """Send a list of (start, size) packets of the packed waveform codes, asking the AWG
+        for its error status every ack_window packets (None for once at the end). On an error
+        the packets after the last clean checkpoint are resent. packed_data holds the points
+        of the waveform from offset on. Returns the number of windows which were resent."""
+        if ack_window is None:
+            ack_window = max(len(packets), 1)
+        ack_window = int(ack_window)
+        if ack_window < 1:
+            raise ValueError("ack_window must be at least 1.")
+
+        checkpoint = 0
+        resends = 0
+        failures = 0
+        while checkpoint < len(packets):
+            window = packets[checkpoint:checkpoint+ack_window]
+            for start, size in window[:-1]:
+                self.__send_waveform_packet(filename, packed_data, start, size, offset=offset)
+            start, size = window[-1]
+            status = self.__send_waveform_packet(filename, packed_data, start, size, True,
+                                                 offset)
+            if status == "0":
+                checkpoint += len(window)
+                failures = 0
+            else:
+                #an error occured, resend everything after the last clean checkpoint
+                failures += 1
+                self.__check_resends(filename, failures, status)
+                resends += 1
+        return resends
+
+    def __check_resends(self, filename, failures, status):
+        """Give up an upload once the same window failed more than the transport's
+        max_resends times in a row, status is the last response to *ESR?
+
+            Raises:
+                IOError with the last status and the contents of the error queue"""
+        if failures <= self.transport.max_resends:
+            return
+        try:
+            errors = self.drain_error_queue()
+        except IOError:
+            errors = []
+        raise IOError("Failed to upload waveform {}, the AWG still reported an error after "
+                      "{} resends (*ESR? {}): {}".format(filename, self.transport.max_resends,
+                                                         status, errors))
+
+    def __get_packet_size_tuner(self):
+        """The PacketSizeTuner of this connection, starting from the best packet size learned
+        for this AWG by earlier connections."""
+        if self.packet_size_tuner is None:
+            learned = _learned_packet_sizes.get(self.getpeername())
+            self.packet_size_tuner = PacketSizeTuner(learned if learned is not None else 20000)
+        return self.packet_size_tuner
+
+    def __send_waveform_adaptive(self, filename, packed_data, tuner, ack_window=1):
+        """Send the packed waveform codes in windows of ack_window packets, the packet size of
+        every window is chosen by tuner, which is told how long each window took and whether
+        the AWG reported an error. On an error the window is resent. Returns the number of
+        windows which were resent."""
+        if ack_window is not None and int(ack_window) < 1:
+            raise ValueError("ack_window must be at least 1.")
+        num_points = len(packed_data)
+        checkpoint = 0
+        resends = 0
+        failures = 0
+        while checkpoint < num_points:
+            size = tuner.packet_size
+            if ack_window is None:
+                window_end = num_points
+            else:
+                window_end = min(num_points, checkpoint+size*int(ack_window))
+            window = [(i, min(size, window_end-i)) for i in range(checkpoint, window_end, size)]
+
+            start_time = time.time()
+            for start, packet_size in window[:-1]:
+                self.__send_waveform_packet(filename, packed_data, start, packet_size)
+            start, packet_size = window[-1]
+            status = self.__send_waveform_packet(filename, packed_data, start, packet_size,
+                                                 True)
+            success = status == "0"
+            tuner.report(size, (window_end-checkpoint)*packed_data.itemsize,
+                         time.time()-start_time, success,
+                         full=window_end-checkpoint == size*len(window))
+            if success:
+                checkpoint = window_end
+                failures = 0
+            else:
+                #an error occured, resend everything after the last clean checkpoint
+                failures += 1
+                self.__check_resends(filename, failures, status)
+                resends += 1
+        return resends
+
+    def __send_waveform_packet(self, filename, packed_data, start, size, check=False,
+                               offset=0):
+        """Send points [start, start+size) of the packed waveform codes, if check is True the
+        AWG is asked for its error status after the packet and the response is returned, None
+        is returned if that response never arrived, see __read_ack. packed_data holds the
+        points of the waveform from offset on.
+
+        The header, a memoryview of the codes and the trailer are sent back to back so the
+        waveform data itself is never copied."""
+        header = ('WLIST:WAVEFORM:DATA "'+filename+'",'
+                  +str(offset+start)+','
+                  +str(size)+','
+                  +create_prefix_for_length(size*packed_data.itemsize))
+        self.__send_parts([header, memoryview(packed_data[start:start+size].view(np.uint8)),
+                           ";*ESR?\r\n" if check else "\r\n"])
+        if check:
+            return self.__read_ack()
         return None
 
+    def __read_ack(self):
+        """Read the response to the *ESR? ending a window of packets, waiting up to the
+        transport's "ack" deadline. If it still did not arrive the responses are resynced
+        with a *IDN? marker, so a late acknowledgement is never read as the response to a
+        later query. The late acknowledgement is returned if it arrives before the marker,
+        None if it does not, and the window is resent.
 
-    def __new_waveform_int(self, filename, packed_data, packet_size):
-        """This is the helper function which actually sends the waveform to the AWG, see above."""
-        errs = self.get_error_queue()
-        #if errs != []:
-        #    print errs,
-        data_length = len(packed_data)
-
-        self.settimeout(1)
-        if '"'+filename+'"' in self.get_waveform_list():
-            self.del_waveform(filename)
-
-        self.write('WLISt:WAVeform:NEW "'+filename+'",'+str(data_length/2)+",INT")
-
-        if data_length >= packet_size*2:
-            for i in range(0, data_length/(packet_size*2)):
-                prefix = create_prefix(packed_data[i*packet_size*2:(i+1)*packet_size*2])
-                packet = packed_data[i*packet_size*2:(i+1)*packet_size*2]
-                success = False
-                while not success:
-                    success = self.write('WLIST:WAVEFORM:DATA "'+filename+'",'
-                                         +str(i*packet_size)+','
-                                         +str(packet_size)+','
-                                         +prefix
-                                         +packet
-                                         +";*ESR?\r\n", True) == "0"
-
-        remaining_data_size = data_length-data_length/(packet_size*2)*packet_size*2
-
-        if remaining_data_size > 0:
-            self.write('WLIST:WAVeform:DATA "'+filename+'",'
-                       +str((data_length-remaining_data_size)/2)+','
-                       +str(remaining_data_size/2)+","
-                       +create_prefix(packed_data[data_length-remaining_data_size:])
-                       +packed_data[data_length-remaining_data_size:]
-                       +"\r\n")
-
-        errs = self.get_error_queue()
-        if errs != []:
-            print errs,
-        self.settimeout(.5)
+            Raises:
+                IOError if the AWG did not answer the marker either"""
+        deadline = time.time()+self.transport.deadline("ack")
+        while True:
+            try:
+                return self.__read_response()
+            except socket.timeout:
+                if time.time() > deadline:
+                    break
+
+        self.sendall(_to_bytes("*IDN?\n"))
+        deadline = time.time()+max(self.transport.deadline("ack"), self.transport.timeout)
+        ack = None
+        while True:
+            try:
+                response = self.__read_response()
+            except socket.timeout:
+                if time.time() > deadline:
+                    raise IOError("Timeout. The AWG did not acknowledge a waveform packet.")
+                continue
+            if not response.lstrip("+-").isdigit():
+                return ack
+            ack = response
 
     def del_waveform(self, filename):
         """Delete Specified Waveform"""
         self.write('WLISt:WAVeform:DELete "'+filename+'"')
+        if self.waveform_index is not None:
+            self.waveform_index.remove(filename)
+        if self.upload_cache is not None:
+            self.upload_cache.invalidate(filename)
+        if self.waveform_shadows is not None:
+            self.waveform_shadows.pop(filename, None)
+        if self.applied_sequence is not None and filename in self.applied_sequence.names:
+            self.applied_sequence = None
 
 
 
@@ -403,18 +1304,146 @@ class TekAwg(socket.socket):
         """Returns the hardware serial number and ID as a string"""
         return self.write("*IDN?", True)
 
+    def get_bit_depth(self):
+        """The DAC resolution of the AWG, which INT waveforms are encoded and decoded for.
+        It is queried once and kept in bit_depth, 14 is assumed if the AWG does not report a
+        resolution.
+
+        Firmware without SOURce1:DAC:RESolution? does not answer it at all, so the query is
+        sent once together with *OPC?, which is always answered. The -113 error it leaves is
+        the newest in the queue, the errors queued before it are kept and returned by the
+        next drain_error_queue or get_error_queue.
+
+            Raises: ValueError if the AWG reports a resolution missing from
+                _bit_depth_mult_offset"""
+        if self.bit_depth is None:
+            try:
+                fields = _split_fields(self.__query_with_deadline(
+                    'SOURce1:DAC:RESolution?;*OPC?', self.transport.timeout))
+                if len(fields) == 1:
+                    self.__drop_probe_error()
+                bit_depth = int(float(fields[0])) if len(fields) == 2 else None
+            except (IOError, ValueError):
+                bit_depth = None
+            if bit_depth is not None and bit_depth not in _bit_depth_mult_offset:
+                raise ValueError("The AWG reports a DAC resolution of {} bits, waveforms can "
+                                 "not be converted for it".format(bit_depth))
+            self.bit_depth = 14 if bit_depth is None else bit_depth
+        return self.bit_depth
+
+    def __drop_probe_error(self):
+        """Remove the error of an unanswered probe query from the error queue, which only
+        reads from its oldest end, so the errors before it are held for the caller"""
+        errors = self.drain_error_queue()
+        if errors and errors[-1].startswith("-113"):
+            errors.pop()
+        self._held_errors = errors
+        if errors == []:
+            #the command error bit of *ESR? was set by the probe alone
+            self.write("*ESR?", True)
+
+    def set_bit_depth(self, bit_depth, channel=None):
+        """Set the DAC resolution of channel (default all), taken from the set
+        {8, 10, 12, 14}"""
+        if bit_depth not in _dac_resolutions:
+            raise ValueError("The DAC resolution must be one of {}, not {}".format(
+                ", ".join(str(r) for r in _dac_resolutions), bit_depth))
+        if channel is None: channel = [1, 2, 3, 4]
+        if not isinstance(channel, list): channel = [channel]
+        self.write(';'.join([':SOURce'+str(c)+':DAC:RESolution '+str(bit_depth)
+                             for c in channel]))
+        self.bit_depth = bit_depth
+
+    def enable_settings_cache(self, max_age=None):
+        """Serve the get_* settings methods from a local cache, which the matching set_*
+        methods update by reading the new settings back in the same message, so the cache
+        holds the AWG's own responses. Settings are only asked from the AWG the first time
+        they are read, after an invalidate_settings, or when the whole cache is resynced.
+
+        Settings changed on the AWG by other means (front panel, other connections, raw
+        write calls) are not seen until the next resync.
+
+            Args:
+                max_age: seconds after which the whole cache is resynced with the AWG in a
+                    single query before the next read, None to never resync automatically"""
+        self.settings_cache = SettingsCache(max_age)
+
+    def disable_settings_cache(self):
+        """Stop caching settings, every get_* asks the AWG again"""
+        self.settings_cache = None
+
+    def invalidate_settings(self, queries=None):
+        """Forget cached settings so they are read from the AWG again.
+
+            Args:
+                queries: list of the setting queries to forget, None for all of them"""
+        if self.settings_cache is not None:
+            self.settings_cache.invalidate(queries)
+
+    def reconcile_settings(self, queries=None):
+        """Read every cached setting (or the given queries) from the AWG in one batched
+        query and update the cache.
+
+            Returns: dict of query: (cached value, value on the AWG) for every setting whose
+                cached value was out of date"""
+        if queries is None:
+            queries = _setting_queries() if self.settings_cache is None else \
+                sorted(set(_setting_queries()) | set(self.settings_cache.values))
+        values = self.__query_awg(queries)
+        if self.settings_cache is None:
+            return {}
+        return self.settings_cache.update(zip(queries, values))
+
+    def __query_awg(self, queries):
+        """Send a list of queries to the AWG in a single message, returns the responses"""
+        #commands after a ";" are relative to the previous one, so root them
+        cmd_str = ';'.join([q if q[0] in ":*" else ":"+q for q in queries])
+        return _split_fields(self.write(cmd_str, True, len(queries)))
+
+    def __query_settings(self, queries):
+        """Returns the responses to a list of setting queries, served from the settings cache
+        if it is enabled, with all the settings it is missing fetched in a single message."""
+        if self.settings_cache is None:
+            return self.__query_awg(queries)
+        if self.settings_cache.is_stale():
+            self.reconcile_settings()
+        missing = [q for q in queries if self.settings_cache.get(q) is None]
+        if missing:
+            self.settings_cache.update(zip(missing, self.__query_awg(missing)))
+        return [self.settings_cache.get(q) for q in queries]
+
+    def __set_settings(self, commands, queries):
+        """Send a list of setting commands in one message, queries are the queries reading
+        the settings back. If the settings cache is enabled the queries are appended to the
+        same message and the responses cached, so the cache holds the values as the AWG
+        formats, clamps or keeps them (a rejected command leaves the old value). Inside a
+        batch the queries are forgotten instead, so the commands stay queued."""
+        if self.settings_cache is None:
+            self.write(';'.join(commands))
+        elif self._batch is not None:
+            self.write(';'.join(commands))
+            self.settings_cache.invalidate(queries)
+        else:
+            #commands after a ";" are relative to the previous one, so root the queries
+            message = ';'.join(commands+[q if q[0] in ":*" else ":"+q for q in queries])
+            responses = _split_fields(self.write(message, True, len(queries)))
+            if len(responses) == len(queries):
+                self.settings_cache.update(zip(queries, responses))
+            else:
+                self.settings_cache.invalidate(queries)
+
     def get_freq(self):
         """Returns the current sample rate of the AWG"""
-        return self.write("FREQ?", True)
+        return self.__query_settings(["FREQ?"])[0]
 
     def set_freq(self, freq):
         """Sets the current sample rate of the AWG"""
-        self.write("FREQ "+str(freq))
+        self.__set_settings(["FREQ "+str(freq)], ["FREQ?"])
 
 
     def get_run_mode(self):
         """Gets the current running mode of the AWG: SEQ, CONT, TRIG, GAT"""
-        return self.write("AWGCONTROL:RMODE?", True)
+        return self.__query_settings(["AWGCONTROL:RMODE?"])[0]
 
     def set_run_mode(self, mode):
         """Sets the run mode of the AWG, allowed modes are:
@@ -423,7 +1452,7 @@ class TekAwg(socket.socket):
                             "trigered", "trig",
                             "gated", "gat",
                             "sequence", "seq"]:
-            self.write("AWGCONTROL:RMODE "+mode)
+            self.__set_settings(["AWGCONTROL:RMODE "+mode], ["AWGCONTROL:RMODE?"])
 
     def get_run_state(self):
         """Gets the current state of the AWG, possible states are:
@@ -448,8 +1477,8 @@ class TekAwg(socket.socket):
     def get_amplitude(self, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(c)+':VOLTAGE?' for c in channel])
-        return [float(x) for x in self.write(cmd_str, True, len(channel)).split(";")]
+        queries = [':SOURCE'+str(int(c))+':VOLTAGE?' for c in channel]
+        return [float(x) for x in self.__query_settings(queries)]
 
     def set_amplitude(self, amplitude, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
@@ -462,14 +1491,13 @@ class TekAwg(socket.socket):
         cmd_str = []
         for i in range(len(channel)):
             cmd_str.append(':SOURCE'+str(int(channel[i]))+':VOLTAGE '+str(amplitude[i]) )
-        cmd_str = ';'.join(cmd_str)
-        self.write(cmd_str)
+        self.__set_settings(cmd_str, [':SOURCE'+str(int(c))+':VOLTAGE?' for c in channel])
 
     def get_offset(self, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(c)+':VOLTAGE:OFFSET?' for c in channel])
-        return [float(x) for x in self.write(cmd_str, True, len(channel)).split(";")]
+        queries = [':SOURCE'+str(int(c))+':VOLTAGE:OFFSET?' for c in channel]
+        return [float(x) for x in self.__query_settings(queries)]
 
     def set_offset(self, offset, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
@@ -482,14 +1510,14 @@ class TekAwg(socket.socket):
         cmd_str = []
         for i in range(len(channel)):
             cmd_str.append(':SOURCE'+str(channel[i])+':VOLTAGE:OFFSET '+str(offset[i]) )
-        cmd_str = ';'.join(cmd_str)
-        self.write(cmd_str)
+        self.__set_settings(cmd_str, [':SOURCE'+str(int(c))+':VOLTAGE:OFFSET?'
+                                      for c in channel])
 
     def get_marker_high(self, marker, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(c)+':MARKER'+str(int(marker))+':VOLTAGE:HIGH?' for c in channel])
-        return [float(x) for x in self.write(cmd_str, True, len(channel)).split(";")]
+        queries = [':SOURCE'+str(int(c))+':MARKER'+str(int(marker))+':VOLTAGE:HIGH?' for c in channel]
+        return [float(x) for x in self.__query_settings(queries)]
 
     def set_marker_high(self, voltage, marker, channel=None):
         """Set whether the channels are on or off, where 0 means off and 1 means on"""
@@ -501,16 +1529,17 @@ class TekAwg(socket.socket):
         if len(voltage) != len(channel):
             raise ValueError("Number of channels does not match number of voltages.")
 
-        cmd_str = ''
+        cmd_str = []
         for i in range(len(channel)):
-            cmd_str = cmd_str + ';:SOURCE{}:MARKER{}:VOLTAGE:HIGH {}'.format(int(channel[i]),int(marker),voltage[i])
-        self.write(cmd_str)
+            cmd_str.append(':SOURCE{}:MARKER{}:VOLTAGE:HIGH {}'.format(int(channel[i]),int(marker),voltage[i]))
+        self.__set_settings(cmd_str, [':SOURCE{}:MARKER{}:VOLTAGE:HIGH?'.format(int(c), int(marker))
+                                      for c in channel])
 
     def get_marker_low(self, marker, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(int(c))+':MARKER'+str(int(marker))+':VOLTAGE:LOW?' for c in channel])
-        return [float(x) for x in self.write(cmd_str, True, len(channel)).split(";")]
+        queries = [':SOURCE'+str(int(c))+':MARKER'+str(int(marker))+':VOLTAGE:LOW?' for c in channel]
+        return [float(x) for x in self.__query_settings(queries)]
 
     def set_marker_low(self, voltage, marker, channel=None):
         """Set whether the channels are on or off, where 0 means off and 1 means on"""
@@ -522,16 +1551,17 @@ class TekAwg(socket.socket):
         if len(voltage) != len(channel):
             raise ValueError("Number of channels does not match number of voltages.")
 
-        cmd_str = ''
+        cmd_str = []
         for i in range(len(channel)):
-            cmd_str = cmd_str + ';:SOURCE{}:MARKER{}:VOLTAGE:LOW {}'.format(int(channel[i]),int(marker),voltage[i])
-        self.write(cmd_str)    
+            cmd_str.append(':SOURCE{}:MARKER{}:VOLTAGE:LOW {}'.format(int(channel[i]),int(marker),voltage[i]))
+        self.__set_settings(cmd_str, [':SOURCE{}:MARKER{}:VOLTAGE:LOW?'.format(int(c), int(marker))
+                                      for c in channel])
 
     def get_chan_state(self, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':OUTPUT'+str(c)+'?' for c in channel])
-        return [int(x) for x in self.write(cmd_str, True, len(channel)).split(";")]
+        queries = [':OUTPUT'+str(int(c))+'?' for c in channel]
+        return [int(x) for x in self.__query_settings(queries)]
 
     def set_chan_state(self, state, channel=None):
         """Set whether the channels are on or off, where 0 means off and 1 means on"""
@@ -542,25 +1572,25 @@ class TekAwg(socket.socket):
         if len(state) != len(channel):
             raise ValueError("Number of channels does not match number of states.")
 
-        cmd_str = ''
+        cmd_str = []
         for i in range(len(channel)):
-            cmd_str = cmd_str + ';:OUTPUT'+str(channel[i])+':STATE '+str(state[i])
-        self.write(cmd_str)
+            cmd_str.append(':OUTPUT'+str(channel[i])+':STATE '+str(state[i]))
+        self.__set_settings(cmd_str, [':OUTPUT'+str(int(c))+'?' for c in channel])
 
     def get_trig_source(self):
-        return self.write("TRIG:SOUR?",True)
+        return self.__query_settings(["TRIG:SOUR?"])[0]
 
     def set_trig_source(self,source):
         trig_sources = ["int","internal","ext","external"]
         if source.lower() in trig_sources:
-            self.write("TRIG:SOUR "+source)
+            self.__set_settings(["TRIG:SOUR "+source], ["TRIG:SOUR?"])
 
     def get_trig_interval(self):
-        return float(self.write("TRIG:TIM?",True))
+        return float(self.__query_settings(["TRIG:TIM?"])[0])
 
     def set_trig_interval(self, interval):
         assert float(interval) > 0
-        self.write("TRIG:TIM "+str(float(interval)))
+        self.__set_settings(["TRIG:TIM "+str(float(interval))], ["TRIG:TIM?"])
 
     def trig(self):
         return self.write("*TRG")
@@ -570,14 +1600,13 @@ class TekAwg(socket.socket):
     def get_cur_waveform(self, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(c)+':WAV?' for c in channel])
-        return self.write(cmd_str, True, len(channel)).split(";")
+        return self.__query_settings([':SOURCE'+str(int(c))+':WAV?' for c in channel])
 
     def set_cur_waveform(self, waveform_name, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
-        cmd_str = ';'.join([':SOURCE'+str(c)+':WAV "'+waveform_name+'"' for c in channel])
-        self.write(cmd_str)
+        cmd_str = [':SOURCE'+str(c)+':WAV "'+waveform_name+'"' for c in channel]
+        self.__set_settings(cmd_str, [':SOURCE'+str(int(c))+':WAV?' for c in channel])
 
     def set_seq_element(self, element_index, waveform_name, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
@@ -588,24 +1617,27 @@ class TekAwg(socket.socket):
                             +' "'
                             +waveform_name
                             +'"' for c in channel])
+        self.applied_sequence = None
         self.write(cmd_str)
 
     def get_seq_element(self, element_index, channel=None):
         if channel is None: channel = [1, 2, 3, 4]
         if not isinstance(channel, list): channel = [channel]
         cmd_str = ';'.join([':Sequence:ELEM'+str(element_index)+':WAV'+str(c)+"?" for c in channel])
-        return self.write(cmd_str, True, expected_length=len(channel)).split(";")
+        return _split_fields(self.write(cmd_str, True, expected_length=len(channel)))
 
     def get_seq_element_loop_cnt(self, element_index):
         return self.write('SEQuence:ELEMent'+str(element_index)+':LOOP:COUNt?', True)
 
     def set_seq_element_loop_cnt(self, element_index, count):
+        self.applied_sequence = None
         return self.write('SEQuence:ELEMent'+str(element_index)+':LOOP:COUNt '+str(count))
 
     def get_seq_length(self):
         return int(self.write('SEQ:LENGTH?', True, 1))
 
     def set_seq_length(self, length):
+        self.applied_sequence = None
         self.write('SEQ:LENGTH '+str(length))
 
     def get_seq_element_jmp_ind(self, element_index):
@@ -616,6 +1648,7 @@ class TekAwg(socket.socket):
             return tar_type
 
     def set_seq_element_jmp_ind(self, element_index, target):
+        self.applied_sequence = None
         self.set_seq_element_jmp_type(element_index, "ind")
         self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:INDex '+str(target))
 
@@ -624,16 +1657,65 @@ class TekAwg(socket.socket):
 
     def set_seq_element_jmp_type(self, element_index, tar_type):
         if tar_type.lower() in ["index", "ind", "next", "off"]:
+            self.applied_sequence = None
             return self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:TYPE '+str(tar_type))
 
     def get_seq_list(self):
         """Get the current list of waveforms in the sequencer"""
-        seq_length = self.get_seq_length()
-        seq_list = ["" for _ in range(seq_length)]
+        return self.read_sequence(settings=False).to_list(quoted=True)
+
+    def read_sequence(self, settings=True, chunk_size=50, pipeline_depth=4):
+        """Read the whole sequence table in a few pipelined messages, instead of several
+        round trips per element.
+
+            Args:
+                settings: if False only the waveforms of the elements are read, not the
+                    loop, wait, jump and goto settings
+
+                chunk_size: number of elements queried in one message
+
+                pipeline_depth: number of messages sent before their responses are read
 
-        for i in range(seq_length):
-            seq_list[i] = self.get_seq_element(i+1)
-        return seq_list
+            Returns: a SequenceTable
+
+            Raises:
+                IOError if a response was not recieved"""
+        seq_length = self.get_seq_length()
+        channels = range(1, 5)
+        per_element = ['WAV{}?'.format(c) for c in channels]
+        if settings:
+            per_element += _sequence_setting_queries
+        messages = []
+        lengths = []
+        for start in range(1, seq_length+1, chunk_size):
+            elements = range(start, min(start+chunk_size, seq_length+1))
+            messages.append(';'.join([':SEQ:ELEM{}:{}'.format(i, q)
+                                      for i in elements for q in per_element]))
+            lengths.append(len(elements)*len(per_element))
+
+        fields = []
+        for i in range(0, len(messages), pipeline_depth):
+            for response in self.pipeline_queries(messages[i:i+pipeline_depth],
+                                                  lengths[i:i+pipeline_depth]):
+                fields.extend(_split_fields(response))
+        if len(fields) != seq_length*len(per_element):
+            raise IOError("Failed to retrieve the whole sequence.")
+
+        num_channels = len(channels)
+        sequence = SequenceTable([[_unquote(name) for name in
+                                   fields[i*len(per_element):i*len(per_element)+num_channels]]
+                                  for i in range(seq_length)])
+        if settings:
+            columns = [fields[num_channels+k::len(per_element)]
+                       for k in range(len(_sequence_setting_queries))]
+            sequence.loop_count[:] = [int(x) for x in columns[0]]
+            sequence.loop_infinite[:] = [int(x) for x in columns[1]]
+            sequence.wait[:] = [int(x) for x in columns[2]]
+            sequence.jump_type[:] = [JUMP_TYPES.index(_jump_type(x)) for x in columns[3]]
+            sequence.jump_index[:] = [int(x) for x in columns[4]]
+            sequence.goto_state[:] = [int(x) for x in columns[5]]
+            sequence.goto_index[:] = [int(x) for x in columns[6]]
+        return sequence
 
     def set_seq_list(self, seq_list):
         """Set the sequence list"""
@@ -641,19 +1723,1405 @@ class TekAwg(socket.socket):
         assert isinstance(seq_list[0], list)
         assert len(seq_list[0]) == 4
 
-        seq_len = len(seq_list)
-
-        #self.set_seq_length(0) #Delete old sequence list
-        self.set_seq_length(seq_len)
-        cmd_str = ""
-        for i in range(seq_len):
-            for k in range(4):
-                cmd_str = cmd_str+';:Seq:ELEM'+str(i+1)+':WAV'+str(k+1)+' "'+seq_list[i][k]+'"'
-            if i < seq_len:
-                cmd_str = cmd_str+';:SEQ:ELEM'+str(i+1)+':JTAR:TYPE NEXT'
-        self.settimeout(10)
-        self.write(cmd_str)
-        self.settimeout(.5)
+        sequence = SequenceTable(seq_list)
+        sequence.jump_type[:] = JUMP_TYPES.index("NEXT")
+        self.write_sequence(sequence, settings=["jump_type"])
+
+    def write_sequence(self, sequence, settings=True, chunk_size=100, check_every=None,
+                       max_attempts=3, timeout=None):
+        """Program the whole sequence table, streamed to the AWG in messages of chunk_size
+        elements so that very long sequences need neither one giant message nor a long
+        timeout.
+
+            Args:
+                sequence: a SequenceTable, or a list of lists of waveform names
+
+                settings: True to program every element setting of the SequenceTable (loop
+                    count, infinite loop, trigger wait, jump type and index, goto state and
+                    index), False for only the waveforms, or a list of the names of the
+                    SequenceTable attributes to program
+
+                chunk_size: number of elements programmed per message
+
+                check_every: if given, the AWG's error status is checked after every
+                    check_every messages, and the messages since the last clean check are
+                    resent on an error. None checks once at the end
+
+                max_attempts: number of times a failing part is sent before giving up, at
+                    least 1
+
+                timeout: seconds to wait for the AWG to finish each checked part, None for
+                    the transport's "sequence" deadline
+
+            Raises:
+                IOError if the AWG still reported errors after max_attempts, or timed out
+                ValueError if max_attempts is less than 1"""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1, got {}".format(max_attempts))
+        if not isinstance(sequence, SequenceTable):
+            sequence = SequenceTable(sequence)
+        if settings is True:
+            settings = list(_sequence_setting_commands.keys())
+        elif settings is False:
+            settings = []
+
+        self.set_seq_length(len(sequence))
+        self.__send_sequence_commands([self.__sequence_element_commands(sequence, i, settings)
+                                       for i in range(len(sequence))],
+                                      chunk_size, check_every, max_attempts, timeout)
+        if set(settings) == set(_sequence_setting_commands):
+            self.applied_sequence = sequence.copy()
+
+    def update_sequence(self, sequence, chunk_size=100, check_every=None, max_attempts=3,
+                        timeout=None):
+        """Reprogram the sequence table, only the waveforms and settings of the elements
+        which differ from the last applied sequence are sent, so the cost is proportional to
+        the size of the change instead of the length of the sequence. The last applied
+        sequence is applied_sequence, or read from the AWG if there is none. Elements added
+        by a change of length are programmed in full.
+
+            Args:
+                sequence: a SequenceTable, or a list of lists of waveform names
+
+                chunk_size, check_every, max_attempts, timeout: see write_sequence
+
+            Returns:
+                list of (element, channels, settings) changes which were sent, see
+                sequence_changes
+
+            Raises:
+                IOError if the AWG still reported errors after max_attempts, or timed out
+                ValueError if max_attempts is less than 1"""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1, got {}".format(max_attempts))
+        if not isinstance(sequence, SequenceTable):
+            sequence = SequenceTable(sequence)
+        old_sequence = self.applied_sequence
+        if old_sequence is None:
+            old_sequence = self.read_sequence()
+
+        changes = sequence_changes(old_sequence, sequence)
+        if len(sequence) != len(old_sequence):
+            self.set_seq_length(len(sequence))
+        self.__send_sequence_commands([self.__sequence_element_commands(sequence, element,
+                                                                        settings, channels)
+                                       for element, channels, settings in changes],
+                                      chunk_size, check_every, max_attempts, timeout)
+        self.applied_sequence = sequence.copy()
+        return changes
+
+    def __send_sequence_commands(self, element_commands, chunk_size, check_every,
+                                 max_attempts, timeout):
+        """Send lists of commands, one list per element, in messages of chunk_size elements
+        with error checks every check_every messages, see write_sequence"""
+        if element_commands == []:
+            return
+        messages = [';'.join([command for commands in element_commands[start:start+chunk_size]
+                              for command in commands])
+                    for start in range(0, len(element_commands), chunk_size)]
+        if check_every is None:
+            check_every = max(len(messages), 1)
+        if timeout is None:
+            timeout = self.transport.deadline("sequence")
+
+        for start in range(0, len(messages), check_every):
+            for attempt in range(max_attempts):
+                part = messages[start:start+check_every]
+                for message in part[:-1]:
+                    self.write(message)
+                if self.__query_with_deadline(part[-1]+';*ESR?', timeout) == "0":
+                    break
+                errors = self.drain_error_queue()
+            else:
+                raise IOError("Failed to program the sequence: {}".format(errors))
+
+    def __sequence_element_commands(self, sequence, element, settings, channels=None):
+        """Commands programming element (0 based) of the SequenceTable sequence, the
+        waveforms of channels (0 based, all if None) and the given settings"""
+        prefix = ':SEQ:ELEM'+str(element+1)+':'
+        names = sequence.waveform_names(element)
+        if channels is None:
+            channels = range(len(names))
+        commands = [prefix+'WAV'+str(c+1)+' "'+names[c]+'"' for c in channels]
+        for setting in settings:
+            value = getattr(sequence, setting)[element]
+            value = JUMP_TYPES[value] if setting == "jump_type" else int(value)
+            commands.append(prefix+_sequence_setting_commands[setting]+' '+str(value))
+        return commands
+
+
+#jump target types of sequence elements, in the order of SequenceTable.jump_type codes
+JUMP_TYPES = ("OFF", "NEXT", "IND")
+
+#queries of the settings of a sequence element, in the order read_sequence sends them
+_sequence_setting_queries = ["LOOP:COUN?", "LOOP:INF?", "TWA?", "JTAR:TYPE?", "JTAR:IND?",
+                             "GOTO:STAT?", "GOTO:IND?"]
+
+#commands setting each SequenceTable attribute of a sequence element
+_sequence_setting_commands = collections.OrderedDict([("loop_count", "LOOP:COUN"),
+                                                      ("loop_infinite", "LOOP:INF"),
+                                                      ("wait", "TWA"),
+                                                      ("jump_type", "JTAR:TYPE"),
+                                                      ("jump_index", "JTAR:IND"),
+                                                      ("goto_state", "GOTO:STAT"),
+                                                      ("goto_index", "GOTO:IND")])
+
+def _split_fields(response):
+    """Split a response to several queries at the ";" which are not inside quotes"""
+    if '"' not in response:
+        return response.split(";")
+    fields = [""]
+    parts = response.split('"')
+    for i, part in enumerate(parts):
+        if i % 2:
+            #inside quotes, the quote closing it is missing if it is the last part
+            fields[-1] += '"'+part+('"' if i < len(parts)-1 else "")
+        else:
+            part_fields = part.split(";")
+            fields[-1] += part_fields[0]
+            fields.extend(part_fields[1:])
+    return fields
+
+def _jump_type(response):
+    """Normalize a jump target type to one of JUMP_TYPES"""
+    response = response.strip().upper()
+    return "IND" if response.startswith("IND") else response
+
+def _unquote(name):
+    """Remove the quotes the AWG puts around names"""
+    name = name.strip()
+    if len(name) >= 2 and name[0] == name[-1] == '"':
+        return name[1:-1]
+    return name
+
+
+class SequenceTable(object):
+    """Columnar description of a sequence, one row per element.
+
+        Attributes:
+            names: list of the waveform names used, index 0 is "" (no waveform)
+            waveforms: (elements, channels) int array of indices into names
+            loop_count: int array of the number of repeats of each element
+            loop_infinite: bool array, elements which repeat forever
+            wait: bool array, elements which wait for a trigger
+            jump_type: uint8 array of indices into JUMP_TYPES
+            jump_index: int array of the jump target of elements with jump type "IND"
+            goto_state: bool array, elements which go to goto_index instead of the next
+            goto_index: int array of the element gone to after each element
+    """
+
+    def __init__(self, elements, num_channels=4):
+        """Args:
+                elements: list of lists of waveform names, one list per element, or the
+                    number of elements of an empty sequence"""
+        if not isinstance(elements, list):
+            elements = [[""]*num_channels for _ in range(int(elements))]
+        self.names = [""]
+        name_index = {"": 0}
+        for element in elements:
+            for name in element:
+                if name not in name_index:
+                    name_index[name] = len(self.names)
+                    self.names.append(name)
+        num_elements = len(elements)
+        if num_elements:
+            num_channels = len(elements[0])
+        self.waveforms = np.array([[name_index[name] for name in element]
+                                   for element in elements],
+                                  dtype=int).reshape(num_elements, num_channels)
+        self.loop_count = np.ones(num_elements, dtype=int)
+        self.loop_infinite = np.zeros(num_elements, dtype=bool)
+        self.wait = np.zeros(num_elements, dtype=bool)
+        self.jump_type = np.zeros(num_elements, dtype=np.uint8)
+        self.jump_index = np.ones(num_elements, dtype=int)
+        self.goto_state = np.zeros(num_elements, dtype=bool)
+        self.goto_index = np.ones(num_elements, dtype=int)
+
+    def __len__(self):
+        return len(self.waveforms)
+
+    def waveform_names(self, element):
+        """List of the waveform names of element (0 based) on every channel"""
+        return [self.names[i] for i in self.waveforms[element]]
+
+    def jump_target(self, element):
+        """The jump target of element (0 based), its index if the jump type is "IND",
+        otherwise the jump type"""
+        jump_type = JUMP_TYPES[self.jump_type[element]]
+        return str(self.jump_index[element]) if jump_type == "IND" else jump_type
+
+    def to_list(self, quoted=False):
+        """The waveforms as a list of lists of names, as used by set_seq_list. quoted puts
+        quotes around the names as the AWG returns them."""
+        names = ['"'+name+'"' for name in self.names] if quoted else self.names
+        return [[names[i] for i in row] for row in self.waveforms]
+
+    def copy(self):
+        """A copy of the table which does not share its arrays"""
+        table = SequenceTable(0, self.waveforms.shape[1])
+        table.names = list(self.names)
+        table.waveforms = self.waveforms.copy()
+        for setting in _sequence_setting_commands:
+            setattr(table, setting, getattr(self, setting).copy())
+        return table
+
+    def waveform_name_array(self):
+        """(elements, channels) object array of the waveform names"""
+        return np.array(self.names, dtype=object)[self.waveforms]
+
+
+def sequence_changes(old_sequence, new_sequence):
+    """Find the elements where two SequenceTables differ.
+
+    Args:
+        old_sequence, new_sequence: SequenceTables with the same number of channels
+
+    Returns: a list of (element, channels, settings) tuples ordered by element, where
+        element is 0 based, channels is the list of channels (0 based) whose waveform
+        differs and settings the list of names of the SequenceTable settings which differ.
+        Elements past the end of old_sequence have every channel and setting listed.
+    """
+    common = min(len(old_sequence), len(new_sequence))
+    waveforms = (old_sequence.waveform_name_array()[:common] !=
+                 new_sequence.waveform_name_array()[:common])
+    settings = [(name, getattr(old_sequence, name)[:common] !=
+                 getattr(new_sequence, name)[:common])
+                for name in _sequence_setting_commands]
+    changed = waveforms.any(axis=1)
+    for _, setting_changed in settings:
+        changed |= setting_changed
+
+    changes = [(int(i), [int(c) for c in np.flatnonzero(waveforms[i])],
+                [name for name, setting_changed in settings if setting_changed[i]])
+               for i in np.flatnonzero(changed)]
+    all_channels = list(range(new_sequence.waveforms.shape[1]))
+    all_settings = list(_sequence_setting_commands.keys())
+    changes.extend([(i, all_channels, all_settings)
+                    for i in range(common, len(new_sequence))])
+    return changes
+
+
+def _replace_file(src, dst):
+    """Move the file src over dst atomically, so dst always holds either its old or its new
+    contents. Python 2 has no os.replace, os.rename replaces atomically on POSIX there, but
+    on Windows dst has to be removed first."""
+    if hasattr(os, "replace"):
+        os.replace(src, dst)
+        return
+    if os.name == "nt" and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+class WaveformCache(object):
+    """Record of which data each named waveform on an AWG holds, used by TekAwg.new_waveform
+    to skip uploads of unchanged waveforms. Entries are keyed on the waveform name and hold
+    the SHA-1 digest of the packed codes, along with the length and timestamp reported by
+    the AWG after the upload, which are checked against the AWG before an upload is skipped.
+
+    A cache describes the contents of a single AWG, do not share one between instruments.
+
+    Example:
+
+        cache = TekAwg.WaveformCache("awg1_cache.json", max_entries=1000)
+        awg = TekAwg.TekAwg(AWG_IP, AWG_PORT, upload_cache=cache)
+        awg.new_waveform("pulse", codes)  # uploaded
+        awg.new_waveform("pulse", codes)  # skipped
+        print(cache.stats())
+
+    """
+
+    def __init__(self, path=None, max_entries=None):
+        """Args:
+                path: optional file the cache is saved to and loaded from, if None the
+                    cache is only kept in memory
+
+                max_entries: optional maximum number of entries, when exceeded the least
+                    recently used entries are evicted"""
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as cache_file:
+                for name, entry in json.load(cache_file):
+                    self._entries[name] = tuple(entry)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def lookup(self, name, digest):
+        """Returns the (digest, length, tstamp) entry of name if it holds data with digest,
+        otherwise None. A None counts as a miss, a hit is only counted by validate."""
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != digest:
+            self.misses += 1
+            return None
+        return entry
+
+    def validate(self, name, length, tstamp):
+        """Check the length and timestamp reported by the AWG against the entry of name.
+        Returns True and counts a hit if they match, otherwise the entry is invalidated."""
+        entry = self._entries.get(name)
+        if entry is None or length is None or entry[1] != length or entry[2] != tstamp:
+            self.misses += 1
+            self.invalidate(name)
+            return False
+        self.hits += 1
+        self._entries[name] = self._entries.pop(name) #mark as most recently used
+        return True
+
+    def record(self, name, digest, length, tstamp):
+        """Record that the AWG now holds data with digest under name."""
+        self._entries.pop(name, None)
+        if length is not None:
+            self._entries[name] = (digest, length, tstamp)
+        while self.max_entries is not None and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self.save()
+
+    def invalidate(self, name=None):
+        """Forget the entry of name, or every entry if name is None."""
+        if name is None:
+            self._entries.clear()
+        elif self._entries.pop(name, None) is None:
+            return
+        self.save()
+
+    def stats(self):
+        """Returns a dict of the number of hits, misses, evictions and entries."""
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries)}
+
+    def save(self):
+        """Write the cache to its file, does nothing for an in memory cache."""
+        if self.path is None:
+            return
+        tmp_path = self.path+".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump([[name, list(entry)] for name, entry in self._entries.items()],
+                      cache_file)
+        _replace_file(tmp_path, self.path)
+
+
+#an entry of a WaveformIndex, tstamp is None until the waveform is next scanned
+WaveformInfo = collections.namedtuple("WaveformInfo", ["length", "type", "tstamp"])
+
+
+class WaveformIndex(object):
+    """Local copy of the waveform list of an AWG, name: WaveformInfo in the order of the
+    AWG's list. See TekAwg.enable_waveform_index.
+
+    New waveforms are assumed to be appended to the end of the AWG's list, if they are not
+    the next check finds a different last name and the index is rescanned."""
+
+    def __init__(self, max_age=0.):
+        """Args:
+                max_age: seconds the index is trusted after a check, None for ever"""
+        self.max_age = max_age
+        self.waveforms = collections.OrderedDict()
+        self.valid = False
+        self.last_check = time.time()
+        self.scans = 0
+
+    def __len__(self):
+        return len(self.waveforms)
+
+    def __contains__(self, name):
+        return name in self.waveforms
+
+    def __iter__(self):
+        return iter(self.waveforms)
+
+    def get(self, name):
+        """Returns the WaveformInfo of name, None if it is not in the index"""
+        return self.waveforms.get(name)
+
+    def last_name(self):
+        """The name of the last waveform in the list, None if it is empty"""
+        return next(reversed(self.waveforms), None)
+
+    def replace(self, waveforms):
+        """Replace the whole index with an OrderedDict of name: WaveformInfo"""
+        self.waveforms = collections.OrderedDict(waveforms)
+        self.valid = True
+        self.last_check = time.time()
+        self.scans += 1
+
+    def add(self, name, length, wave_type):
+        """Record a newly created waveform at the end of the list"""
+        self.waveforms.pop(name, None)
+        self.waveforms[name] = WaveformInfo(length, wave_type, None)
+
+    def touch(self, name):
+        """Record that the data of name changed, which changes its timestamp"""
+        if name in self.waveforms:
+            self.waveforms[name] = self.waveforms[name]._replace(tstamp=None)
+
+    def remove(self, name):
+        self.waveforms.pop(name, None)
+
+    def invalidate(self):
+        """Force a rescan before the index is used next"""
+        self.valid = False
+
+    def needs_check(self):
+        """True if the index must be checked against the AWG before it is used, and
+        restarts the age"""
+        if self.valid and (self.max_age is None or
+                           time.time()-self.last_check < self.max_age):
+            return False
+        self.last_check = time.time()
+        return True
+
+
+class WaveformLibrary(object):
+    """Local store of waveforms, kept on disk as packed "<u2" AWG sample codes with one raw
+    file per waveform, and an index of the name, length, SHA-1 digest and bit depth of each
+    waveform. Waveforms are memory mapped rather than loaded, and are written and uploaded
+    in chunks, so libraries much larger than memory can be served.
+
+    Example:
+
+        library = TekAwg.WaveformLibrary("waveforms")
+        library.add("pulse", TekAwg.merge_arb_and_markers(arb, mk1))
+        library.upload(awg, "pulse")
+
+    """
+
+    index_name = "index.json"
+
+    def __init__(self, path):
+        """Args:
+                path: directory of the library, created if it does not exist"""
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._index = collections.OrderedDict()
+        index_path = os.path.join(path, self.index_name)
+        if os.path.exists(index_path):
+            with open(index_path, "r") as index_file:
+                for name, entry in json.load(index_file):
+                    self._index[name] = entry
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(list(self._index.keys()))
+
+    def info(self, name):
+        """Returns a dict of the file, length, digest and bit_depth of waveform name.
+
+            Raises:
+                KeyError if there is no waveform name in the library"""
+        return dict(self._index[name])
+
+    def add(self, name, codes, bit_depth=14):
+        """Store a waveform, replacing any waveform of the same name.
+
+            Args:
+                name: the name of the waveform
+
+                codes: ndarray or list of AWG sample codes, or an iterable of such blocks
+                    of codes which are written one at a time, so a waveform can be
+                    generated into the library without ever being in memory whole
+
+                bit_depth: the bit depth the codes were encoded for
+
+            Returns:
+                the index entry of the waveform, see info"""
+        if isinstance(codes, (np.ndarray, list)):
+            codes = [codes]
+        file_name = hashlib.sha1(name.encode("utf-8")).hexdigest()+".u2"
+        file_path = os.path.join(self.path, file_name)
+        digest = hashlib.sha1()
+        length = 0
+        with open(file_path+".tmp", "wb") as data_file:
+            for block in codes:
+                block = ints_to_le_codes(block)
+                digest.update(block)
+                block.tofile(data_file)
+                length += len(block)
+        _replace_file(file_path+".tmp", file_path)
+
+        self._index[name] = {"file": file_name,
+                             "length": length,
+                             "digest": digest.hexdigest(),
+                             "bit_depth": bit_depth}
+        self.save()
+        return self.info(name)
+
+    def get(self, name):
+        """Returns a read only memory mapped "<u2" ndarray of the codes of waveform name.
+
+            Raises:
+                KeyError if there is no waveform name in the library"""
+        entry = self._index[name]
+        if entry["length"] == 0:
+            return np.empty(0, dtype="<u2")
+        return np.memmap(os.path.join(self.path, entry["file"]), dtype="<u2", mode="r",
+                         shape=(entry["length"],))
+
+    def remove(self, name):
+        """Delete waveform name from the library, does nothing if it is not in it."""
+        entry = self._index.pop(name, None)
+        if entry is None:
+            return
+        file_path = os.path.join(self.path, entry["file"])
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        self.save()
+
+    def verify(self, name, chunk_size=1 << 20):
+        """Check the file of waveform name against its length and digest, reading chunk_size
+        points at a time. Returns True if they match."""
+        entry = self._index[name]
+        codes = self.get(name)
+        if len(codes) != entry["length"]:
+            return False
+        digest = hashlib.sha1()
+        for start in range(0, len(codes), chunk_size):
+            digest.update(np.ascontiguousarray(codes[start:start+chunk_size]))
+        return digest.hexdigest() == entry["digest"]
+
+    def upload(self, awg, name, packet_size=20000, ack_window=1):
+        """Upload waveform name to the TekAwg awg under the same name. The packets are
+        sent straight from the memory mapped file, and the stored digest is used for the
+        awg's upload_cache. Note that an awg with keep_shadows copies the whole waveform.
+
+            Returns: see TekAwg.new_waveform"""
+        return awg.new_waveform(name, self.get(name), packet_size, ack_window,
+                                digest=self._index[name]["digest"])
+
+    def save(self):
+        """Write the index of the library to its file."""
+        index_path = os.path.join(self.path, self.index_name)
+        with open(index_path+".tmp", "w") as index_file:
+            json.dump([[name, entry] for name, entry in self._index.items()], index_file)
+        _replace_file(index_path+".tmp", index_path)
+
+
+class Transport(object):
+    """Socket options, timeouts and reconnect behaviour of the connection of a TekAwg.
+
+    Nagle's algorithm is disabled by default, as it holds back a small query sent right
+    after a command until the command is acknowledged, which adds a delayed ACK (around
+    40 ms) to the round trip.
+
+    Example:
+
+        transport = TekAwg.Transport(timeout=2., deadlines={"upload": 5.},
+                                     session_commands=[":SYSTEM:ERROR:CLEAR"])
+        awg = TekAwg.TekAwg(AWG_IP, AWG_PORT, transport=transport)
+
+    """
+
+    def __init__(self, timeout=1., connect_timeout=5., nodelay=True, send_buffer=None,
+                 recv_buffer=None, keepalive=True, keepalive_idle=10, keepalive_interval=5,
+                 keepalive_count=3, reconnect_attempts=3, reconnect_delay=.5, deadlines=None,
+                 session_commands=None, max_resends=10):
+        """Args:
+                timeout: default socket timeout in seconds
+
+                connect_timeout: timeout of connecting in seconds
+
+                nodelay: disable Nagle's algorithm (TCP_NODELAY)
+
+                send_buffer, recv_buffer: optional socket buffer sizes in bytes
+
+                keepalive: enable TCP keepalive, probing an idle connection after
+                    keepalive_idle seconds every keepalive_interval seconds, and giving up
+                    after keepalive_count probes (where the platform allows setting these)
+
+                reconnect_attempts: number of times to try reconnecting when the connection
+                    is lost during a write, 0 to raise the error instead
+
+                reconnect_delay: seconds between reconnect attempts
+
+                deadlines: dict of timeouts in seconds of operations, updating the defaults
+                    in _default_deadlines ("upload", "download", "sequence", and "ack", the
+                    total wait for the acknowledgement of a window of waveform packets)
+
+                session_commands: idempotent commands sent again after every reconnect, to
+                    restore state of the session
+
+                max_resends: number of times a window of waveform packets is resent in a
+                    row after the AWG reported an error, before the upload fails"""
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.nodelay = nodelay
+        self.send_buffer = send_buffer
+        self.recv_buffer = recv_buffer
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.keepalive_interval = keepalive_interval
+        self.keepalive_count = keepalive_count
+        self.reconnect_attempts = reconnect_attempts
+        self.reconnect_delay = reconnect_delay
+        self.deadlines = dict(_default_deadlines)
+        self.deadlines.update(deadlines or {})
+        self.session_commands = list(session_commands or [])
+        self.max_resends = max_resends
+
+    def deadline(self, operation):
+        """Timeout in seconds of operation, the default timeout if it has no deadline"""
+        deadline = self.deadlines.get(operation)
+        return self.timeout if deadline is None else deadline
+
+    def configure(self, sock):
+        """Set the socket options of sock, before it is connected"""
+        if self.send_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        if self.recv_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in (("TCP_KEEPIDLE", self.keepalive_idle),
+                                  ("TCP_KEEPINTVL", self.keepalive_interval),
+                                  ("TCP_KEEPCNT", self.keepalive_count)):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+    def connect(self, sock, address):
+        """Configure and connect sock to address, leaving it with the default timeout
+
+            Raises: socket.error"""
+        self.configure(sock)
+        sock.settimeout(self.connect_timeout)
+        sock.connect(address)
+        sock.settimeout(self.timeout)
+
+
+#timeouts in seconds of the operations of TekAwg which take longer than a single query,
+#None is the default timeout of the Transport
+_default_deadlines = {"upload": 1.,
+                      "download": None,
+                      "sequence": 10.,
+                      "ack": 10.}
+
+#error polling modes accepted by TekAwg.set_error_polling
+_error_polling_modes = ("upload", "checkpoint")
+
+#last header node of commands which are not safe to send twice
+_non_idempotent_nodes = ("NEW", "DEL", "DELETE", "*TRG", "TRIG", "TRIGGER", "IMM",
+                         "IMMEDIATE")
+
+def _is_idempotent(message):
+    """True if sending message twice has the same effect as sending it once, all of its
+    commands being queries or setting commands"""
+    for command in _split_fields(message):
+        header = command.strip().split(" ", 1)[0].upper()
+        if header.endswith("?"):
+            continue
+        if header.rstrip("0123456789").split(":")[-1] in _non_idempotent_nodes:
+            return False
+    return True
+
+
+#socket methods wrapped by a SessionRecorder
+_recorded_socket_methods = ("send", "sendall", "sendmsg", "recv", "recv_into")
+
+
+class SessionRecorder(object):
+    """Log of the bytes exchanged with an AWG. Each event is a direction byte (b"S" sent,
+    b"R" received), the seconds since the start of the recording as a double and the length
+    of the data as an unsigned int, all little-endian, followed by the data. See
+    TekAwg.start_recording and TekAwgReplay."""
+
+    magic = b"TEKAWG-SESSION-1\n"
+    event_header = struct.Struct("<cdI")
+
+    def __init__(self, path):
+        self.path = path
+        opener = gzip.open if path.endswith(".gz") else open
+        self._file = opener(path, "wb")
+        self._file.write(self.magic)
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+        self.events = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, direction, data):
+        """Append an event, direction is b"S" or b"R" and data a bytes-like object"""
+        if len(data) == 0:
+            return
+        with self._lock:
+            self._file.write(self.event_header.pack(direction, time.time()-self.start_time,
+                                                    len(data)))
+            self._file.write(data)
+            self.events += 1
+            if direction == b"S":
+                self.bytes_sent += len(data)
+            else:
+                self.bytes_received += len(data)
+
+    def wrap(self, name, method):
+        """Returns a wrapper of the socket method name which records what it transfers"""
+        if name in ("send", "sendall"):
+            def recorded(data, *args):
+                result = method(data, *args)
+                sent = memoryview(data)
+                if name == "send":
+                    sent = sent[:result]
+                self.record(b"S", sent.tobytes())
+                return result
+        elif name == "sendmsg":
+            def recorded(buffers, *args):
+                buffers = list(buffers)
+                result = method(buffers, *args)
+                self.record(b"S", b"".join([memoryview(b).cast("B").tobytes()
+                                            for b in buffers])[:result])
+                return result
+        elif name == "recv":
+            def recorded(*args):
+                data = method(*args)
+                self.record(b"R", data)
+                return data
+        else:
+            def recorded(buf, *args):
+                num_bytes = method(buf, *args)
+                self.record(b"R", memoryview(buf)[:num_bytes].tobytes())
+                return num_bytes
+        return recorded
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def read_session(path):
+    """Generator of the (direction, seconds, data) events of a session log written by a
+    SessionRecorder.
+
+        Raises:
+            IOError if path is not a session log"""
+    opener = gzip.open if path.endswith(".gz") else open
+    header = SessionRecorder.event_header
+    with opener(path, "rb") as log:
+        if log.read(len(SessionRecorder.magic)) != SessionRecorder.magic:
+            raise IOError("{} is not a TekAwg session log".format(path))
+        while True:
+            event = log.read(header.size)
+            if len(event) < header.size:
+                return
+            direction, seconds, length = header.unpack(event)
+            yield direction, seconds, log.read(length)
+
+
+class ResponseCounter(object):
+    """Counts the complete responses in a stream of bytes received from an AWG, fed in
+    arbitrary pieces. A response is a line, or an IEEE definite length block and the rest
+    of its line."""
+
+    def __init__(self):
+        self.count = 0
+        self._in_line = False
+        self._header = None
+        self._skip = 0
+
+    def feed(self, data):
+        """Count the responses completed by data, returns the total count"""
+        data = bytes(data)
+        i = 0
+        while i < len(data):
+            if self._skip:
+                skipped = min(self._skip, len(data)-i)
+                self._skip -= skipped
+                i += skipped
+            elif self._header is not None:
+                self._header += data[i:i+1]
+                i += 1
+                digits = self._header[1:2]
+                if not digits.isdigit() or digits == b"0":
+                    self._header = None
+                    self._in_line = True
+                elif len(self._header) == 2+int(bytes(digits)):
+                    self._skip = int(bytes(self._header[2:]))
+                    self._header = None
+                    self._in_line = True
+            elif not self._in_line and data[i:i+1] == b"#":
+                self._header = bytearray(b"#")
+                i += 1
+            else:
+                end = data.find(b"\n", i)
+                if end < 0:
+                    self._in_line = True
+                    i = len(data)
+                else:
+                    self.count += 1
+                    self._in_line = False
+                    i = end+1
+        return self.count
+
+
+class ResponseReader(object):
+    """Buffered reader of the responses of the AWG. It owns the receive buffer of the socket,
+    returns complete newline terminated responses and keeps any bytes received past them for
+    the next read, so several outstanding responses can be read in linear time."""
+
+    def __init__(self, sock, chunk_size=1 << 16):
+        self.sock = sock
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        #start of the unread data in the buffer, and how far it was searched for a newline
+        self._start = 0
+        self._scanned = 0
+
+    def pending(self):
+        """Number of bytes received but not read yet"""
+        return len(self._buffer)-self._start
+
+    def clear(self):
+        """Discard all bytes received but not read yet"""
+        self._buffer = bytearray()
+        self._start = 0
+        self._scanned = 0
+
+    def _fill(self):
+        """Receive more data from the socket into the buffer.
+
+            Raises: socket.timeout, IOError if the connection was closed"""
+        if self._start > len(self._buffer)//2:
+            #drop the read data once it is most of the buffer
+            del self._buffer[:self._start]
+            self._scanned -= self._start
+            self._start = 0
+        data = self.sock.recv(self.chunk_size)
+        if not data:
+            raise IOError("Connection closed by the AWG.")
+        self._buffer.extend(data)
+
+    def read_line(self):
+        """Returns the next newline terminated response, including the newline.
+
+            Raises: socket.timeout if no complete response arrived in time, the part received
+                so far is kept"""
+        while True:
+            end = self._buffer.find(b"\n", max(self._scanned, self._start))
+            if end >= 0:
+                line = bytes(self._buffer[self._start:end+1])
+                self._start = self._scanned = end+1
+                return _to_str(line)
+            self._scanned = len(self._buffer)
+            self._fill()
+
+    def recv_into(self, buf):
+        """Like socket.recv_into, but buffered bytes are returned first.
+
+            Returns: number of bytes written into buf"""
+        view = memoryview(buf)
+        if self.pending() == 0:
+            return self.sock.recv_into(view)
+        num_bytes = min(len(view), self.pending())
+        view[:num_bytes] = self._buffer[self._start:self._start+num_bytes]
+        self._start += num_bytes
+        return num_bytes
+
+
+class CommandBatch(object):
+    """Commands and queries queued for a TekAwg, see TekAwg.batch"""
+
+    def __init__(self, awg, max_length=4096, raise_errors=False):
+        self.awg = awg
+        self.max_length = max_length
+        self.raise_errors = raise_errors
+        self.errors = []
+        self.messages_sent = 0
+        #(command, BatchFuture or None, expected number of response fields)
+        self._queue = []
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            self.awg._batch = self
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth > 0:
+            return
+        try:
+            if exc_type is None:
+                self.flush(check_errors=True)
+        finally:
+            self.awg._batch = None
+        if exc_type is None and self.errors and self.raise_errors:
+            raise IOError("AWG reported errors during batch: {}".format(self.errors))
+
+    def add(self, message):
+        """Queue a command which has no response"""
+        for command in message.split("\n"):
+            command = command.strip().lstrip(";")
+            if command:
+                self._queue.append((command, None, 0))
+
+    def query(self, message, expected_length=1, convert=None):
+        """Queue a query, returns a BatchFuture for its response.
+
+            Args:
+                expected_length: number of ";" separated responses the query returns
+
+                convert: optional function applied to the response string"""
+        future = BatchFuture(self, convert)
+        self._queue.append((message.strip().lstrip(";"), future, expected_length))
+        return future
+
+    def flush(self, check_errors=False):
+        """Send everything queued, and resolve the futures of the queued queries. If
+        check_errors is True the AWG's error status is checked once at the end."""
+        if check_errors:
+            self._queue.append(("*ESR?", None, 1))
+        queue, self._queue = self._queue, []
+        batch, self.awg._batch = self.awg._batch, None
+        try:
+            chunk = []
+            chunk_length = 0
+            for item in queue:
+                #commands after a ";" are relative to the previous one, so root them
+                command = item[0] if item[0][0] in ":*" else ":"+item[0]
+                if chunk and chunk_length+len(command)+1 > self.max_length:
+                    self._send_chunk(chunk)
+                    chunk = []
+                    chunk_length = 0
+                chunk.append((command,)+item[1:])
+                chunk_length += len(command)+1
+            if chunk:
+                esr = self._send_chunk(chunk)
+                if check_errors and esr not in (None, "0"):
+                    self.errors.extend(self.awg.drain_error_queue())
+        finally:
+            self.awg._batch = batch
+
+    def _send_chunk(self, chunk):
+        """Send one message and hand its response out to the futures, returns the last
+        response field"""
+        num_fields = sum([item[2] for item in chunk])
+        message = ";".join([item[0] for item in chunk])
+        self.messages_sent += 1
+        if num_fields == 0:
+            self.awg.write(message)
+            return None
+        fields = _split_fields(self.awg.write(message, True, num_fields))
+        position = 0
+        for command, future, expected_length in chunk:
+            if future is not None:
+                future._resolve(";".join(fields[position:position+expected_length]))
+            position += expected_length
+        return fields[-1]
+
+
+class BatchFuture(object):
+    """Response to a query queued in a CommandBatch, available once the batch is flushed"""
+
+    def __init__(self, batch, convert=None):
+        self._batch = batch
+        self._convert = convert
+        self._done = False
+        self._value = None
+
+    def done(self):
+        return self._done
+
+    def result(self):
+        """The response to the query, flushes the batch if it has not been sent yet"""
+        if not self._done:
+            self._batch.flush()
+        return self._value
+
+    def _resolve(self, response):
+        self._value = response if self._convert is None else self._convert(response)
+        self._done = True
+
+
+class SettingsCache(object):
+    """Local copy of AWG settings, keyed by the query which reads each setting (for example
+    ":SOURCE1:VOLTAGE?") and holding the response string. See TekAwg.enable_settings_cache.
+    """
+
+    def __init__(self, max_age=None):
+        """Args:
+                max_age: seconds after which the cache counts as stale, None for never"""
+        self.max_age = max_age
+        self.values = {}
+        self.last_sync = time.time()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        """Returns the cached response to query, None if it is not cached"""
+        value = self.values.get(query)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def update(self, items):
+        """Store (query, response) pairs, returns a dict of query: (old, new) for every
+        cached response which changed"""
+        changed = {}
+        for query, value in items:
+            old = self.values.get(query)
+            if old is not None and old != value:
+                changed[query] = (old, value)
+            self.values[query] = value
+        return changed
+
+    def invalidate(self, queries=None):
+        """Forget the given queries, or everything if queries is None"""
+        if queries is None:
+            self.values.clear()
+            self.last_sync = time.time()
+        else:
+            for query in queries:
+                self.values.pop(query, None)
+
+    def is_stale(self):
+        """True if the cache is older than max_age, and restarts the age"""
+        if self.max_age is None or time.time()-self.last_sync < self.max_age:
+            return False
+        self.last_sync = time.time()
+        return True
+
+
+#a command recorded by CommandStats, passed to its callbacks
+CommandEvent = collections.namedtuple("CommandEvent", ["family", "seconds", "bytes_sent",
+                                                       "bytes_received", "timeouts", "retries",
+                                                       "failed", "retry_depth"])
+
+def _command_family(message):
+    """The SCPI command family of a message, the header of its first command without
+    numeric suffixes, for example "SEQ:ELEM:WAV" for 'SEQ:ELEM12:WAV3 "pulse"'."""
+    header = message.lstrip(":").split(";", 1)[0].split(" ", 1)[0]
+    return "".join([c for c in header if not c.isdigit()]).upper()
+
+
+class CommandStats(object):
+    """Count, latency histogram, bytes, timeouts and retries of the commands sent to an AWG,
+    per SCPI command family. Waveform uploads and downloads are recorded under
+    "WLIST:WAVEFORM:DATA" and "WLIST:WAVEFORM:DATA?", the retries of an upload are the
+    number of packet windows which were resent. See TekAwg.enable_stats.
+
+    Example:
+
+        stats = awg.enable_stats()
+        awg.new_waveform("pulse", codes)
+        print(stats.family("WLIST:WAVEFORM:DATA")["sent_mb_per_s"])
+        print(stats)
+
+    """
+
+    #upper bounds in seconds of the latency histogram bins, the last bin is unbounded
+    latency_bounds = (1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 1e-1, 3e-1, 1., 3., 10.)
+
+    def __init__(self, callbacks=None):
+        """Args:
+                callbacks: optional list of functions called with a CommandEvent after every
+                    recorded command"""
+        self.callbacks = list(callbacks) if callbacks is not None else []
+        self.families = {}
+
+    def record(self, family, seconds, bytes_sent=0, bytes_received=0, timeouts=0, retries=0,
+               failed=False, retry_depth=None):
+        """Record one command of family which took seconds, retries is the number of times
+        it was resent, failed whether it gave up without a response and retry_depth the
+        number of attempts after the first it reached (retries if None), which counts the
+        attempt given up on and attempts after a reconnect"""
+        if retry_depth is None:
+            retry_depth = retries
+        entry = self.families.get(family)
+        if entry is None:
+            entry = {"count": 0, "failures": 0, "total_s": 0., "min_s": None, "max_s": 0.,
+                     "histogram": [0]*(len(self.latency_bounds)+1), "bytes_sent": 0,
+                     "bytes_received": 0, "timeouts": 0, "retries": 0, "max_retry_depth": 0}
+            self.families[family] = entry
+        entry["count"] += 1
+        entry["failures"] += int(bool(failed))
+        entry["total_s"] += seconds
+        entry["min_s"] = seconds if entry["min_s"] is None else min(entry["min_s"], seconds)
+        entry["max_s"] = max(entry["max_s"], seconds)
+        entry["histogram"][bisect.bisect_left(self.latency_bounds, seconds)] += 1
+        entry["bytes_sent"] += bytes_sent
+        entry["bytes_received"] += bytes_received
+        entry["timeouts"] += timeouts
+        entry["retries"] += retries
+        entry["max_retry_depth"] = max(entry["max_retry_depth"], retry_depth)
+        if self.callbacks:
+            event = CommandEvent(family, seconds, bytes_sent, bytes_received, timeouts,
+                                 retries, bool(failed), retry_depth)
+            for callback in self.callbacks:
+                callback(event)
+
+    def family(self, family):
+        """Returns a dict of the stats of family, with the mean latency and the send and
+        receive rates in MB/s added, None if no command of family was recorded"""
+        entry = self.families.get(family)
+        if entry is None:
+            return None
+        entry = dict(entry, histogram=list(entry["histogram"]))
+        total_s = max(entry["total_s"], 1e-12)
+        entry["mean_s"] = entry["total_s"]/entry["count"]
+        entry["sent_mb_per_s"] = entry["bytes_sent"]/total_s/1e6
+        entry["received_mb_per_s"] = entry["bytes_received"]/total_s/1e6
+        return entry
+
+    def summary(self):
+        """Returns a dict of family: stats, see family"""
+        return dict((family, self.family(family)) for family in self.families)
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        self.families.clear()
+
+    def __repr__(self):
+        lines = ["{:<32} {:>7} {:>10} {:>10} {:>8} {:>7} {:>9} {:>9}".format(
+            "family", "count", "mean ms", "max ms", "timeouts", "retries", "tx MB/s", "rx MB/s")]
+        for family in sorted(self.families):
+            entry = self.family(family)
+            lines.append("{:<32} {:>7} {:>10.3f} {:>10.3f} {:>8} {:>7} {:>9.3f} {:>9.3f}".format(
+                family[:32], entry["count"], entry["mean_s"]*1e3, entry["max_s"]*1e3,
+                entry["timeouts"], entry["retries"], entry["sent_mb_per_s"],
+                entry["received_mb_per_s"]))
+        return "\n".join(lines)
+
+
+def _setting_queries(channels=(1, 2, 3, 4)):
+    """Every setting query the settings cache knows, for a full resync"""
+    queries = ["FREQ?", "AWGCONTROL:RMODE?", "TRIG:SOUR?", "TRIG:TIM?"]
+    for c in channels:
+        queries += [':SOURCE{}:VOLTAGE?'.format(c),
+                    ':SOURCE{}:VOLTAGE:OFFSET?'.format(c),
+                    ':SOURCE{}:WAV?'.format(c),
+                    ':OUTPUT{}?'.format(c)]
+        for marker in (1, 2):
+            queries += [':SOURCE{}:MARKER{}:VOLTAGE:HIGH?'.format(c, marker),
+                        ':SOURCE{}:MARKER{}:VOLTAGE:LOW?'.format(c, marker)]
+    return queries
+
+
+class PacketSizeTuner(object):
+    """Chooses the packet size of waveform uploads on the fly. After every acknowledged
+    window of packets it is told the time taken and whether the AWG reported an error:
+    errors halve the packet size, otherwise the size keeps moving in the direction which
+    improved the measured throughput, by a factor of step, within [min_size, max_size].
+
+    best_size is the size with the highest smoothed throughput seen so far.
+    """
+
+    def __init__(self, packet_size=20000, min_size=1000, max_size=1000000, step=1.5):
+        self.packet_size = int(packet_size)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.step = step
+        self.windows = 0
+        self.errors = 0
+        #smoothed throughput in bytes per second of every packet size tried
+        self.rates = {}
+        self._direction = step
+        self._last_rate = None
+
+    @property
+    def error_rate(self):
+        """Fraction of windows the AWG reported an error for"""
+        return self.errors/float(max(self.windows, 1))
+
+    @property
+    def best_size(self):
+        """Packet size with the highest throughput measured"""
+        if self.rates == {}:
+            return self.packet_size
+        return max(self.rates, key=self.rates.get)
+
+    def report(self, packet_size, num_bytes, seconds, success, full=True):
+        """Report the outcome of a window of packets of packet_size points, num_bytes long.
+        Timings of windows which were not full (the end of a waveform) are not used."""
+        self.windows += 1
+        if not success:
+            self.errors += 1
+            self.rates[packet_size] = self.rates.get(packet_size, 0.)/2
+            self._direction = 1./self.step
+            self._last_rate = None
+            self.packet_size = max(self.min_size, packet_size//2)
+            return
+        if not full:
+            return
+
+        rate = num_bytes/max(seconds, 1e-9)
+        if packet_size in self.rates:
+            self.rates[packet_size] = (self.rates[packet_size]+rate)/2
+        else:
+            self.rates[packet_size] = rate
+        if self._last_rate is not None and rate < self._last_rate:
+            self._direction = 1./self._direction
+        self._last_rate = rate
+        self.packet_size = int(min(self.max_size,
+                                   max(self.min_size, packet_size*self._direction)))
+
+
+#best packet size learned by PacketSizeTuner for every AWG, by (ip, port)
+_learned_packet_sizes = {}
+
+
+class AwgGroup(object):
+    """Holds connections to several AWGs and runs the same operation on all of them in
+    parallel, one worker thread per AWG (up to max_workers).
+
+    Example:
+
+        group = TekAwg.AwgGroup({"awg1": TekAwg.TekAwg(IP_1, PORT),
+                                 "awg2": TekAwg.TekAwg(IP_2, PORT)})
+        result = group.new_waveform("pulse", codes)
+        print(result.errors, result.wall_time, result.serial_time)
+        group.run()
+        group.close()
+
+    """
+
+    def __init__(self, awgs, max_workers=None):
+        """Args:
+                awgs: dict of name: TekAwg, or a list of TekAwg which are then named by
+                    their index
+
+                max_workers: maximum number of AWGs talked to at the same time, defaults to
+                    all of them"""
+        if not isinstance(awgs, dict):
+            awgs = collections.OrderedDict(enumerate(awgs))
+        self.awgs = awgs
+        self.max_workers = max_workers
+
+    def __len__(self):
+        return len(self.awgs)
+
+    def __getitem__(self, name):
+        return self.awgs[name]
+
+    def call(self, method, *args, **kwargs):
+        """Call method with the same arguments on every AWG in parallel.
+
+            Returns: a GroupResult"""
+        return self.call_each(method, dict((name, (args, kwargs)) for name in self.awgs))
+
+    def call_each(self, method, arguments):
+        """Call method on the AWGs in parallel with different arguments for each.
+
+            Args:
+                method: name of the TekAwg method to call
+
+                arguments: dict of name: (args, kwargs), only the AWGs named are called
+
+            Returns: a GroupResult"""
+        names = list(arguments.keys())
+        result = GroupResult()
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not names:
+                        return
+                    name = names.pop(0)
+                args, kwargs = arguments[name]
+                start_time = time.time()
+                try:
+                    value = getattr(self.awgs[name], method)(*args, **kwargs)
+                    error = None
+                except Exception as e:
+                    value = None
+                    error = e
+                elapsed = time.time()-start_time
+                with lock:
+                    result.times[name] = elapsed
+                    if error is None:
+                        result.results[name] = value
+                    else:
+                        result.errors[name] = error
+
+        num_workers = len(names)
+        if self.max_workers is not None:
+            num_workers = min(num_workers, self.max_workers)
+
+        start_time = time.time()
+        threads = [threading.Thread(target=worker) for _ in range(num_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        result.wall_time = time.time()-start_time
+        return result
+
+    def new_waveform(self, filename, packed_data, *args, **kwargs):
+        """Upload the same waveform to every AWG, see TekAwg.new_waveform"""
+        return self.call("new_waveform", filename, packed_data, *args, **kwargs)
+
+    def set_seq_list(self, seq_list):
+        """Set the same sequence list on every AWG, see TekAwg.set_seq_list"""
+        return self.call("set_seq_list", seq_list)
+
+    def set_amplitude(self, amplitude, channel=None):
+        """Set the amplitude of every AWG, see TekAwg.set_amplitude"""
+        return self.call("set_amplitude", amplitude, channel)
+
+    def run(self):
+        """Start running every AWG"""
+        return self.call("run")
+
+    def stop(self):
+        """Stop every AWG"""
+        return self.call("stop")
+
+    def close(self):
+        """Close the connections to every AWG"""
+        for awg in self.awgs.values():
+            awg.close()
+
+
+class GroupResult(object):
+    """Outcome of an operation run on an AwgGroup.
+
+        Attributes:
+            results: dict of name: return value, for the AWGs which succeeded
+            errors: dict of name: exception, for the AWGs which raised
+            times: dict of name: seconds taken by that AWG
+            wall_time: seconds taken by the whole group operation
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+        self.times = {}
+        self.wall_time = 0.
+
+    @property
+    def serial_time(self):
+        """Sum of the times taken by each AWG, the time the operation would take if the
+        AWGs were talked to one after another."""
+        return sum(self.times.values())
+
+    @property
+    def ok(self):
+        """True if no AWG raised an error"""
+        return self.errors == {}
+
+    def __repr__(self):
+        return ("GroupResult({} ok, {} errors, wall time {:.3f}s, serial time {:.3f}s)"
+                .format(len(self.results), len(self.errors), self.wall_time, self.serial_time))
 
 
 import numpy as np
@@ -661,25 +3129,243 @@ import sys
 
 #These are the bit conversions needed for accurate representation on the AWG
 _bit_depth_mult_offset = {8:  (127, 127),
+                          10: (511, 511),
                           12: (2047, 2047),
                           14: (8191, 8191),
                           16: (32767, 32767)}
 
+#the resolutions the DACs of the AWG can be set to, 16 bit codes are only converted on the host
+_dac_resolutions = (8, 10, 12, 14)
+
+
+#numpy dtypes of a single point of the AWG's waveform formats
+_waveform_dtypes = {"INT":  "<u2",
+                    "REAL": "<f4, <u1"}
+
+#marker bits of the marker byte of REAL waveform points
+_real_mk1_bit = 1 << 6
+_real_mk2_bit = 1 << 7
+
+
+def _to_bytes(message):
+    """Encode a command string for the socket, str is already bytes on python 2."""
+    if isinstance(message, bytes):
+        return message
+    return message.encode("latin-1")
+
+def _to_str(response):
+    """Decode a response from the socket, bytes is already str on python 2."""
+    if isinstance(response, str):
+        return response
+    return response.decode("latin-1")
+
 
 def create_prefix(data):
-    return "#"+str(len(list(str(len(data)))))+str(len(data))
+    return create_prefix_for_length(len(data))
+
+def create_prefix_for_length(length):
+    """IEEE 488.2 definite length block header for a block of length bytes."""
+    return "#"+str(len(str(length)))+str(length)
+
+#number of points encode_waveform and decode_waveform convert at a time, small enough for
+#the temporaries of a block to stay in cache
+_conversion_block_size = 1 << 15
+
+#marker bits of AWG sample codes, and the mask of the arbitrary waveform bits
+_mk1_bit = 1 << 14
+_mk2_bit = 1 << 15
+_arb_mask = (1 << 14)-1
+
+def _mult_offset(bit_depth):
+    try:
+        return _bit_depth_mult_offset[bit_depth]
+    except KeyError:
+        raise ValueError("No rule exists for converting a bipolar float to a bit depth of "
+                         "'{}'; supported bit depths are {}."
+                         .format(bit_depth, sorted(_bit_depth_mult_offset.keys())))
+
+def _output_array(out, length, dtype, name):
+    """Check a caller supplied output array, or allocate one if out is None"""
+    if out is None:
+        return np.empty(length, dtype=dtype)
+    if out.shape != (length,):
+        raise ValueError("{} has shape {}, expected ({},)".format(name, out.shape, length))
+    return out
+
+def _patterns(arb, mk1, mk2):
+    """Check the patterns of a waveform, returns ([arb, mk1, mk2], length) with the patterns
+    given as ndarrays and the others None"""
+    patterns = [None if pattern is None else np.asarray(pattern) for pattern in (arb, mk1, mk2)]
+    lengths = [len(pattern) for pattern in patterns if pattern is not None]
+    if lengths == []:
+        raise ValueError("Must supply at least one sequence pattern to create a"
+                         " merged AWG binary array.")
+    if min(lengths) != max(lengths):
+        raise UnequalPatternLengths("Supplied patterns of unequal length: "
+                                    "len(arb) = {}, len(mk1) = {}, len(mk2) = {}"
+                                    .format(*[None if pattern is None else len(pattern)
+                                              for pattern in patterns]))
+    return patterns, lengths[0]
+
+def encode_waveform(arb=None, mk1=None, mk2=None, bit_depth=14, out=None,
+                    block_size=_conversion_block_size):
+    """Encode an arbitrary waveform and markers into AWG sample codes in a single pass.
+
+    The conversion is done in blocks of block_size points with reused temporaries, so
+    apart from out nothing the size of the waveform is allocated. arb is clipped to
+    [-1.0, 1.0] and rounded to the nearest code, halves rounding up.
+
+    Args:
+        arb: the arbitrary waveform data on the range [-1.0, 1.0], None for all zeros
+        mk1, mk2: the marker data, None for off. Any nonzero value is on
+        bit_depth: the AWG's bit depth, taken from the set {8, 10, 12, 14, 16}. There are no
+            marker bits at a bit depth of 16
+        out: optional uint16 ndarray the codes are written to
+        block_size: number of points converted at a time
+
+    Returns:
+        out, or a new "<u2" ndarray of the codes
+
+    Raises:
+        ValueError if no pattern was supplied, for an unsupported bit depth, or for
+            markers at a bit depth of 16.
+        UnequalPatternLengths if any of the input patterns were of unequal length.
+    """
+    mult, offset = _mult_offset(bit_depth)
+    if bit_depth > 14 and (mk1 is not None or mk2 is not None):
+        raise ValueError("There are no marker bits at a bit depth of {}".format(bit_depth))
+    (arb, mk1, mk2), seq_len = _patterns(arb, mk1, mk2)
+    out = _output_array(out, seq_len, "<u2", "out")
+
+    scaled = np.empty(min(block_size, seq_len), dtype=float)
+    bits = np.empty(len(scaled), dtype=np.uint16)
+    marker = np.empty(len(scaled), dtype=bool)
+    for start in range(0, seq_len, block_size):
+        stop = min(start+block_size, seq_len)
+        size = stop-start
+        block = out[start:stop]
+        if arb is None:
+            block.fill(offset)
+        else:
+            #offset by half a code so the truncating cast rounds to the nearest code
+            np.multiply(arb[start:stop], mult, scaled[:size])
+            scaled[:size] += offset+.5
+            np.clip(scaled[:size], offset-mult, offset+mult, scaled[:size])
+            np.copyto(block, scaled[:size], casting='unsafe')
+        for pattern, bit in ((mk1, _mk1_bit), (mk2, _mk2_bit)):
+            if pattern is None:
+                continue
+            np.not_equal(pattern[start:stop], 0, marker[:size])
+            np.multiply(marker[:size], bit, bits[:size], casting='unsafe')
+            np.bitwise_or(block, bits[:size], block)
+    return out
+
+def decode_waveform(codes, bit_depth=14, arb=None, mk1=None, mk2=None,
+                    block_size=_conversion_block_size):
+    """Decode AWG sample codes into the arbitrary waveform and markers in a single pass.
+
+    The conversion is done in blocks of block_size points with reused temporaries, so
+    apart from the outputs nothing the size of the waveform is allocated.
+
+    Args:
+        codes: ndarray of AWG sample codes
+        bit_depth: the AWG's bit depth, taken from the set {8, 10, 12, 14, 16}
+        arb: optional output ndarray of the arbitrary waveform. A float array receives
+            the values on the range [-1.0, 1.0], an integer array the raw codes
+        mk1, mk2: optional bool output ndarrays of the markers
+        block_size: number of points converted at a time
+
+    Returns:
+        (arb, mk1, mk2), the given or new arrays, arb is float64 unless given
+
+    Raises:
+        ValueError for an unsupported bit depth or outputs of the wrong length.
+    """
+    mult, offset = _mult_offset(bit_depth)
+    codes = np.asarray(codes)
+    seq_len = len(codes)
+    arb = _output_array(arb, seq_len, float, "arb")
+    mk1 = _output_array(mk1, seq_len, bool, "mk1")
+    mk2 = _output_array(mk2, seq_len, bool, "mk2")
+    mask = _arb_mask if bit_depth <= 14 else 0xffff
+    to_float = arb.dtype.kind == "f"
+
+    bits = np.empty(min(block_size, seq_len), dtype=np.uint16)
+    for start in range(0, seq_len, block_size):
+        stop = min(start+block_size, seq_len)
+        size = stop-start
+        block = codes[start:stop]
+        np.bitwise_and(block, mask, bits[:size])
+        if to_float:
+            np.subtract(bits[:size], float(offset), arb[start:stop])
+            np.divide(arb[start:stop], float(mult), arb[start:stop])
+        else:
+            np.copyto(arb[start:stop], bits[:size], casting='unsafe')
+        for marker, bit in ((mk1, _mk1_bit), (mk2, _mk2_bit)):
+            if bit > mask:
+                np.bitwise_and(block, bit, bits[:size])
+                np.not_equal(bits[:size], 0, marker[start:stop])
+            else:
+                marker[start:stop] = False
+    return arb, mk1, mk2
+
+def encode_real_waveform(arb=None, mk1=None, mk2=None, out=None):
+    """Pack an arbitrary waveform and markers into the points of a REAL waveform, a float32
+    value and a marker byte each. The values are sent to the AWG as they are, without
+    quantization on the host.
+
+    Args:
+        arb: the arbitrary waveform data on the range [-1.0, 1.0], None for all zeros
+        mk1, mk2: the marker data, None for off. Any nonzero value is on
+        out: optional ndarray of _waveform_dtypes["REAL"] the points are written to
+
+    Returns:
+        out, or a new structured ndarray of the points
+
+    Raises:
+        ValueError if no pattern was supplied.
+        UnequalPatternLengths if any of the input patterns were of unequal length.
+    """
+    (arb, mk1, mk2), seq_len = _patterns(arb, mk1, mk2)
+    out = _output_array(out, seq_len, _waveform_dtypes["REAL"], "out")
+    values, markers = out["f0"], out["f1"]
+    if arb is None:
+        values.fill(0)
+    else:
+        values[...] = arb
+    markers.fill(0)
+    for pattern, bit in ((mk1, _real_mk1_bit), (mk2, _real_mk2_bit)):
+        if pattern is not None:
+            np.bitwise_or(markers, np.not_equal(pattern, 0).view(np.uint8)*np.uint8(bit),
+                          markers)
+    return out
+
+def decode_real_waveform(points):
+    """Split the points of a REAL waveform into the arbitrary waveform and markers.
+
+    Args:
+        points: structured ndarray of REAL points, or the raw bytes of them
+
+    Returns:
+        (arb, mk1, mk2), arb is a float32 view into points, not a copy
+    """
+    points = _as_waveform_array(points, _waveform_dtypes["REAL"])
+    markers = points["f1"]
+    return (points["f0"], np.bitwise_and(markers, _real_mk1_bit) != 0,
+            np.bitwise_and(markers, _real_mk2_bit) != 0)
 
 def bifloat_to_uint(value, bit_depth):
     """Convert a float on the range [-1.0, 1.0] to a unsigned int.
 
     Not a totally straightforward conversion, this conversion will result in matching
     values seen on the AWG, however some decimals may not be represented exactly
-    as certain fractions in decimal are not representable in binary.
+    as certain fractions in decimal are not representable in binary. Values are clipped
+    to [-1.0, 1.0] and rounded to the nearest code, halves rounding up.
 
     Args:
         value: a single float, or list of floats, or numpy array of
             floats to operate on
-        bit_depth: the target AWG's bit depth, taken from the set {8, 12, 14, 16}
+        bit_depth: the target AWG's bit depth, taken from the set {8, 10, 12, 14, 16}
 
     Returns:
         the converted input value/list/ndarray
@@ -687,26 +3373,19 @@ def bifloat_to_uint(value, bit_depth):
     Raises:
         ValueError for a bit depth outside the set of supported values.
     """
-    try:
-        mult, offset = _bit_depth_mult_offset[bit_depth]
-    except KeyError:
-        raise ValueError("No rule exists for converting a bipolar float to a bit depth of "
-                         "'{}'; supported bit depths are {}."
-                         .format(bit_depth, _bit_depth_mult_offset.keys()))
+    _mult_offset(bit_depth)
     # ndarray case
     if isinstance(value, np.ndarray):
-        output = np.empty(value.shape, dtype=int)
-        np.multiply(value, mult, output, casting='unsafe')
-        output += offset
-        return output
+        output = encode_waveform(value.ravel(), bit_depth=bit_depth)
+        return output.reshape(value.shape)
 
     # generic iterable case
     try:
         val_iter = iter(value)
-        return [int(val*mult + offset) for val in val_iter]
+        return encode_waveform(list(val_iter), bit_depth=bit_depth).tolist()
     except TypeError:
         # hopefully this is a scalar
-        return int(value * mult + offset)
+        return int(encode_waveform([value], bit_depth=bit_depth)[0])
 
 def uint_to_bifloat(value, bit_depth):
     """Convert an unsigned int to a float on the range [-1.0, 1.0].
@@ -716,7 +3395,7 @@ def uint_to_bifloat(value, bit_depth):
     Args:
         value: a single uint, or list of uints, or numpy array of
             uints to operate on
-        bit_depth: the target AWG's bit depth, taken from the set {8, 12, 14, 16}
+        bit_depth: the target AWG's bit depth, taken from the set {8, 10, 12, 14, 16}
 
     Returns:
         the converted input value/list/ndarray
@@ -724,12 +3403,7 @@ def uint_to_bifloat(value, bit_depth):
     Raises:
         ValueError for a bit depth outside the set of supported values.
     """
-    try:
-        mult, offset = _bit_depth_mult_offset[bit_depth]
-    except KeyError:
-        raise ValueError("No rule exists for converting a bipolar float to a bit depth of "
-                         "'{}'; supported bit depths are {}."
-                         .format(bit_depth, _bit_depth_mult_offset.keys()))
+    mult, offset = _mult_offset(bit_depth)
     # ndarray case
     if isinstance(value, np.ndarray):
         output = np.empty(value.shape, dtype=float)
@@ -747,16 +3421,18 @@ def uint_to_bifloat(value, bit_depth):
 
 
 
-def merge_arb_and_markers(arb=None, mk1=None, mk2=None, bit_depth=14):
+def merge_arb_and_markers(arb=None, mk1=None, mk2=None, bit_depth=14, out=None):
     """Merge arbitrary waveform and marker values into a binary array of AWG codes.
 
     If any of the inputs are not supplied, they will be filled with placeholder
-    arrays of zeros.  This function is only set up to support 10 and 12-bit AWGs
+    arrays of zeros. See encode_waveform.
 
     Args:
         arb: the arbitrary waveform data on the range [-1.0, 1.0]
         mk1, mk2: the marker data.  Can be supplied as a booleans, integers
             (0 -> off, non-zero -> on), or floats (0.0 -> off, all other values -> on)
+        bit_depth: the AWG's bit depth, taken from the set {8, 10, 12, 14, 16}
+        out: optional uint16 ndarray the codes are written to
 
     Returns:
         An ndarray of Tektronix-formatted AWG sample codes.
@@ -766,46 +3442,7 @@ def merge_arb_and_markers(arb=None, mk1=None, mk2=None, bit_depth=14):
             provided.
         UnequalPatternLengths if any of the input patterns were of unequal length.
     """
-    supported_bit_depths = (8, 14)
-    if bit_depth not in supported_bit_depths:
-        raise ValueError("Unsupported bit depth of {}; valid bit depths are {}"
-                         .format(bit_depth, supported_bit_depths))
-    if arb is None and mk1 is None and mk2 is None:
-        raise ValueError("Must supply at least one sequence pattern to create a"
-                         " merged AWG binary array.")
-    if arb is not None:
-        master_pat = arb
-    else:
-        master_pat = mk1 if mk1 is not None else mk2
-
-    seq_len = len(master_pat)
-
-    arb = np.zeros(seq_len, dtype=float) if arb is None else arb
-    mk1 = np.zeros(seq_len, dtype=bool) if mk1 is None else mk1.astype(bool)
-    mk2 = np.zeros(seq_len, dtype=bool) if mk2 is None else mk2.astype(bool)
-
-    if len(arb) != len(mk1) or len(mk1) != len(mk2):
-        raise UnequalPatternLengths("Supplied patterns of unequal length: "
-                                    "len(arb) = {}, len(mk1) = {}, len(mk2) = {}"
-                                    .format(len(arb), len(mk1), len(mk2)))
-
-    # all patterns have the same length and are valid
-    # convert the bipolar float to integer
-    arb = bifloat_to_uint(arb, bit_depth).astype("<u2", copy=False)
-    #if bit_depth == 8:
-    #    np.left_shift(arb, 6, arb)
-
-    mk1 = mk1.astype("<u2", copy=False)
-    mk2 = mk2.astype("<u2", copy=False)
-
-    # bit shift mk1 and mk2 to the correct flag bits, 15 and 16 respectively
-    np.left_shift(mk1, 14, mk1)
-    np.left_shift(mk2, 15, mk2)
-
-    np.bitwise_or(arb, mk1, arb)
-    np.bitwise_or(arb, mk2, arb)
-
-    return arb
+    return encode_waveform(arb, mk1, mk2, bit_depth, out)
 
 def ints_to_byte_str(codes):
     """Convert an ndarray of AWG sample codes to bytes of the proper endianness.
@@ -837,35 +3474,135 @@ def ints_to_byte_str(codes):
     else:
     # otherwise, byte-swap first
         return codes.byteswap().tobytes()
-#.4943891
-def byte_str_to_vals(codes,str_format="INT"):
-    if str_format == "INT":
-        vals_ints = np.fromstring(codes, dtype="<u2")
-        (arb, mk1, mk2) = unmerge_arb_and_markers(vals_ints)
-        return (uint_to_bifloat(arb, 14), mk1, mk2)
-    elif str_format == "REAL":
-        return np.fromstring(codes, dtype="<f4, <u1")
+def ints_to_le_codes(codes):
+    """Return the AWG sample codes as a C-contiguous little-endian uint16 ndarray.
 
-def unmerge_arb_and_markers(codes):
-    seq_len = len(codes)
+    Unlike ints_to_byte_str this does not copy when the codes are already in that layout,
+    so memoryview slices of the result can be sent to the AWG directly.
+
+    Args:
+        codes: ndarray or list of AWG sample codes
+
+    Returns: a C-contiguous ndarray with dtype "<u2"
+    """
+    return np.ascontiguousarray(codes, dtype="<u2")
+
+def _as_upload_array(data):
+    """The points of a waveform to upload as a C-contiguous ndarray, REAL records are kept
+    as they are, anything else is converted to INT codes by ints_to_le_codes"""
+    if isinstance(data, np.ndarray) and data.dtype == np.dtype(_waveform_dtypes["REAL"]):
+        return np.ascontiguousarray(data)
+    return ints_to_le_codes(data)
+
+def _waveform_type(data):
+    """The AWG waveform type, "INT" or "REAL", of an array from _as_upload_array"""
+    return "REAL" if data.dtype == np.dtype(_waveform_dtypes["REAL"]) else "INT"
+
+def _is_chunk_source(data):
+    """True for a callable or an iterator, the sources of chunks of a streamed waveform"""
+    if callable(data):
+        return True
+    try:
+        return iter(data) is data
+    except TypeError:
+        return False
 
-    arb_mask = np.zeros(seq_len, dtype="<u2")+2**14-1
-    mk1_mask = np.zeros(seq_len, dtype="<u2")+2**14
-    mk2_mask = np.zeros(seq_len, dtype="<u2")+2**15
+def _encoded_chunks(chunks, bit_depth=14, prefetch=2):
+    """Generator of the packed codes of each chunk, the chunks are produced and encoded in a
+    background thread at most prefetch chunks ahead of the consumer.
 
-    arb = np.empty(seq_len, dtype='uint16')
-    mk1 = np.empty(seq_len, dtype=bool)
+    Args:
+        chunks: iterable of (arb, mk1, mk2) tuples, encoded with encode_waveform, or of
+            ndarrays of already packed codes
+        bit_depth: the bit depth the chunks are encoded for
+    """
+    results = queue.Queue(prefetch)
+    stop = threading.Event()
 
-    mk2 = np.empty(seq_len, dtype=bool)
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
-    np.bitwise_and(codes, arb_mask, arb)
-    np.bitwise_and(codes, mk1_mask, mk1_mask)
-    np.bitwise_and(codes, mk2_mask, mk2_mask)
+    def producer():
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, tuple):
+                    codes = encode_waveform(*chunk, bit_depth=bit_depth)
+                else:
+                    codes = ints_to_le_codes(chunk)
+                if not put((codes, None)):
+                    return
+            put((None, None))
+        except Exception as e:
+            put((None, e))
+
+    thread = threading.Thread(target=producer)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            codes, error = results.get()
+            if error is not None:
+                raise error
+            if codes is None:
+                return
+            yield codes
+    finally:
+        stop.set()
+        thread.join()
+
+def changed_ranges(old_codes, new_codes, merge_gap=0):
+    """Find the ranges of points where two equal length arrays of codes differ.
 
-    np.not_equal(mk1_mask, np.zeros(seq_len), mk1)
-    np.not_equal(mk2_mask, np.zeros(seq_len), mk2)
+    Args:
+        old_codes, new_codes: ndarrays of AWG sample codes, or REAL points, of equal length
+        merge_gap: ranges separated by at most this many equal points are merged
 
-    return (arb, mk1, mk2)
+    Returns: a list of (start, size) tuples, ordered by start
+    """
+    changed = np.flatnonzero(np.asarray(old_codes) != np.asarray(new_codes))
+    if len(changed) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(changed) > merge_gap+1)
+    starts = changed[np.concatenate(([0], breaks+1))]
+    ends = changed[np.concatenate((breaks, [len(changed)-1]))]+1
+    return [(int(start), int(end-start)) for start, end in zip(starts, ends)]
+
+def waveform_digest(codes):
+    """SHA-1 hex digest of AWG sample codes, as packed by ints_to_le_codes, or of REAL
+    points."""
+    return hashlib.sha1(_as_upload_array(codes).view(np.uint8)).hexdigest()
+
+#.4943891
+def byte_str_to_vals(codes,str_format="INT",bit_depth=14):
+    """Decode raw waveform data from the AWG, codes may be a byte string or an ndarray
+    already holding the points in the AWG format, in which case it is used without a copy.
+    INT data is decoded for bit_depth, REAL data is returned as a structured view."""
+    if str_format == "INT":
+        return decode_waveform(_as_waveform_array(codes, _waveform_dtypes["INT"]), bit_depth)
+    elif str_format == "REAL":
+        return _as_waveform_array(codes, _waveform_dtypes["REAL"])
+
+def _as_waveform_array(codes, dtype):
+    """View codes as an ndarray of dtype, without copying if possible."""
+    dtype = np.dtype(dtype)
+    if isinstance(codes, np.ndarray):
+        if codes.dtype == dtype:
+            return codes
+        return codes.view(dtype)
+    return np.frombuffer(codes, dtype=dtype)
+
+def unmerge_arb_and_markers(codes, bit_depth=14):
+    """Split AWG sample codes into the arbitrary waveform codes and the markers, see
+    decode_waveform.
+
+    Returns: (arb, mk1, mk2), arb is a uint16 ndarray of the raw codes"""
+    return decode_waveform(codes, bit_depth, np.empty(len(codes), dtype=np.uint16))
 
 class UnequalPatternLengths(Exception):
     pass
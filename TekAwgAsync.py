@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""asyncio client for a tektronix AWG5000 series, the coroutine counterpart of TekAwg.TekAwg.
+
+This module requires python 3.7 or newer, it is not installed on older versions."""
+
+import asyncio
+import time
+
+import numpy as np
+
+from TekAwg import (byte_str_to_vals, create_prefix_for_length, _as_upload_array,
+                    _bit_depth_mult_offset, _split_fields, _to_bytes, _to_str,
+                    _waveform_dtypes, _waveform_type)
+
+
+class AsyncTekAwg(object):
+    """Coroutine based communication with a tektronix AWG5000 series, built on asyncio
+    streams. Every method of the query/set surface of TekAwg is a coroutine here, so the
+    I/O of many instruments (and waveform synthesis) can share one event loop.
+
+    Timeouts and retries are handled per call: every coroutine which waits for a response
+    takes optional timeout and retries arguments, defaulting to those given to connect.
+    After a timeout the responses are resynced with a *IDN? marker before anything is sent
+    again, so a late response is never read as the response to a later command.
+
+    Example:
+
+        async def main():
+            awg = await TekAwgAsync.AsyncTekAwg.connect(AWG_IP, AWG_PORT)
+            print(await awg.get_waveform_list())
+            await awg.close()
+
+        asyncio.get_event_loop().run_until_complete(main())
+
+    """
+
+    def __init__(self, reader, writer, timeout=1., retries=3):
+        """Use AsyncTekAwg.connect to create a connection"""
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.retries = retries
+        #response to *IDN?, which marks the end of the late responses when resyncing
+        self.idn = None
+        self.bit_depth = None
+        self._held_errors = []
+        #one command/response exchange at a time on this connection
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, ip, port, timeout=1., retries=3):
+        """Open a connection to the AWG and read its *IDN?, used to resync the responses
+        after a timeout.
+
+            Args:
+                timeout: default seconds to wait for a response
+
+                retries: default number of attempts made to get a response
+
+            Raises: OSError, IOError if the AWG did not answer *IDN?"""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        awg = cls(reader, writer, timeout, retries)
+        try:
+            awg.idn = await awg.write("*IDN?", True, retries=1)
+        except IOError:
+            await awg.close()
+            raise
+        return awg
+
+    async def close(self):
+        """Close the connection to the AWG"""
+        self.writer.close()
+        if hasattr(self.writer, "wait_closed"):
+            await self.writer.wait_closed()
+
+    async def write(self, message, expect_response=False, expected_length=1,
+                    timeout=None, retries=None):
+        """Sends text commands to the AWG5000 Series, see TekAwg.write.
+
+            Args:
+                timeout: seconds to wait for the response, defaults to the connection's
+
+                retries: attempts made to get the response, defaults to the connection's
+
+            Returns: Str, response from AWG when expected_response=True, else it returns None
+
+            Raises:
+                IOError if a response was expected but not recieved
+            """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        async with self._lock:
+            for attempt in range(retries):
+                self.writer.write(_to_bytes(message+"\n"))
+                await self.writer.drain()
+                if not expect_response:
+                    return None
+                try:
+                    return await asyncio.wait_for(self._read_response(expected_length),
+                                                  timeout)
+                except asyncio.TimeoutError:
+                    pass
+                if self.idn is None:
+                    #nothing to resync with, a late response would shift every later one
+                    break
+                #the response is late or was lost, only send the message again if it was
+                #lost. The marker may wait for the late response, give it the attempts left
+                late = await self._resync(timeout*max(retries-attempt-1, 1))
+                if late:
+                    return "".join(late)
+        raise IOError("Failed to recieve response. Check to be sure spelling of command is "
+                      "correct and there is no newline character at the end of the string.")
+
+    async def _resync(self, timeout):
+        """Send a *IDN? marker and read the responses up to its response, after a response
+        timed out. Returns the list of the late responses which arrived before the marker,
+        empty if the timed out command was lost.
+
+            Raises:
+                IOError if the AWG did not answer the marker either"""
+        self.writer.write(b"*IDN?\n")
+        await self.writer.drain()
+        late = []
+        deadline = time.time()+timeout
+        while True:
+            try:
+                line = await asyncio.wait_for(self._read_line(),
+                                              max(deadline-time.time(), 0))
+            except asyncio.TimeoutError:
+                raise IOError("Timeout. The AWG did not answer the *IDN? resync marker.")
+            line = _to_str(line).strip()
+            if line == self.idn:
+                return late
+            late.append(line)
+
+    async def _read_response(self, expected_length=1):
+        """Read a full response of expected_length ";" separated fields from the AWG."""
+        response = _to_str(await self._read_line())
+        while len(_split_fields(response)) < expected_length:
+            response = response+_to_str(await self._read_line())
+        return response.strip()
+
+    async def _read_line(self):
+        """Read a newline terminated line of any length. readuntil stops at the limit of
+        the StreamReader (64 KiB by default), which batched replies such as the names of
+        thousands of waveforms exceed, so longer lines are read in pieces."""
+        pieces = []
+        while True:
+            try:
+                pieces.append(await self.reader.readuntil(b"\n"))
+                return b"".join(pieces)
+            except asyncio.LimitOverrunError as e:
+                pieces.append(await self.reader.readexactly(e.consumed))
+
+    async def drain_error_queue(self, batch_size=8, prefix=None):
+        """Read the error queue, batch_size SYSTEM:ERR? queries per message until the
+        "0,No error" sentinel comes back, see TekAwg.drain_error_queue"""
+        err_queue, self._held_errors = self._held_errors, []
+        queries = [":SYSTEM:ERR?"]*batch_size
+        if prefix is not None:
+            queries = [prefix]+queries
+        while True:
+            responses = _split_fields(await self.write(";".join(queries), True, len(queries)))
+            for error in responses[len(queries)-batch_size:]:
+                if error.strip().startswith("0"):
+                    return err_queue
+                err_queue.append(error.strip())
+            queries = [":SYSTEM:ERR?"]*batch_size
+
+    async def get_error_queue(self, batch_size=8):
+        """Clear *ESR? and read the error queue, see drain_error_queue"""
+        return await self.drain_error_queue(batch_size, "*ESR?")
+
+    async def get_bit_depth(self):
+        """The DAC resolution of the AWG, which INT waveforms are decoded for, queried
+        once and kept in bit_depth, see TekAwg.get_bit_depth.
+
+            Raises: ValueError if the AWG reports a resolution missing from
+                _bit_depth_mult_offset"""
+        if self.bit_depth is None:
+            try:
+                fields = _split_fields(await self.write('SOURce1:DAC:RESolution?;*OPC?', True,
+                                                        retries=1))
+                if len(fields) == 1:
+                    await self._drop_probe_error()
+                bit_depth = int(float(fields[0])) if len(fields) == 2 else None
+            except (IOError, ValueError):
+                bit_depth = None
+            if bit_depth is not None and bit_depth not in _bit_depth_mult_offset:
+                raise ValueError("The AWG reports a DAC resolution of {} bits, waveforms can "
+                                 "not be converted for it".format(bit_depth))
+            self.bit_depth = 14 if bit_depth is None else bit_depth
+        return self.bit_depth
+
+    async def _drop_probe_error(self):
+        """Remove the -113 error of an unanswered probe query, the newest in the queue,
+        and hold the errors before it for the caller"""
+        errors = await self.drain_error_queue()
+        if errors and errors[-1].startswith("-113"):
+            errors.pop()
+        self._held_errors = errors
+        if errors == []:
+            await self.write("*ESR?", True)
+
+################  WAVEFORMS    #############################
+
+    async def get_waveform_list(self):
+        """Returns a list of all the currently saved waveforms on the AWG"""
+        num_saved_waveforms = int(await self.write("WLIST:SIZE?", True))
+        if num_saved_waveforms == 0:
+            return []
+        waveform_list_cmd = 'WLIST:'+";".join(["NAME? "+str(i)
+                                                for i in range(num_saved_waveforms)])
+        return _split_fields(await self.write(waveform_list_cmd, True, num_saved_waveforms))
+
+    async def _get_waveform_fields(self, query, waveform_list):
+        """Ask the AWG for one field of every waveform in waveform_list in one message"""
+        if not isinstance(waveform_list, list):
+            waveform_list = [waveform_list]
+        cmd = 'WLIST:WAVeform:'+";".join([query+" "+str(i) for i in waveform_list])
+        fields = _split_fields(await self.write(cmd, True, len(waveform_list)))
+        if len(fields) != len(waveform_list):
+            raise IOError("Failed to retrieve {} of all waveforms.".format(query))
+        return fields
+
+    async def get_waveform_lengths(self, waveform_list):
+        """Returns a list of lengths of the given waveforms"""
+        return await self._get_waveform_fields("LENGTH?", waveform_list)
+
+    async def get_waveform_type(self, waveform_list):
+        """Returns a list of types, "INT" or "REAL", of the given waveforms"""
+        return await self._get_waveform_fields("TYPE?", waveform_list)
+
+    async def get_waveform_timestamp(self, waveform_list):
+        """Returns a list of creation/edit timestamps of the given waveforms"""
+        return await self._get_waveform_fields("TSTAMP?", waveform_list)
+
+    async def get_waveform_data(self, filename, timeout=None):
+        """Download a waveform from the AWG and decode it, see TekAwg.get_waveform_data.
+
+            Raises:
+                IOError if there was a timeout, most likely due to connection or incorrect name
+        """
+        str_type = await self.write('WLISt:WAVeform:TYPE? "'+filename+'"', True)
+        timeout = self.timeout if timeout is None else timeout
+        async with self._lock:
+            self.writer.write(_to_bytes('WLISt:WAVeform:DATA? "'+filename+'"\r\n'))
+            await self.writer.drain()
+            try:
+                raw_waveform = await asyncio.wait_for(self._read_block(), timeout)
+            except asyncio.TimeoutError:
+                raise IOError("Timeout. Failed to get waveform")
+        raw_waveform = np.frombuffer(raw_waveform, dtype=_waveform_dtypes.get(str_type, "<u2"))
+        return byte_str_to_vals(raw_waveform, str_type, await self.get_bit_depth())
+
+    async def _read_block(self):
+        """Read an IEEE definite length block and its terminator, returns the block data"""
+        header = await self.reader.readexactly(2)
+        if header[0:1] != b"#":
+            raise IOError("Failed to get waveform, unexpected response from the AWG.")
+        length = int(await self.reader.readexactly(int(header[1:2])))
+        data = await self.reader.readexactly(length)
+        await self.reader.readuntil(b"\n")
+        return data
+
+    async def new_waveform(self, filename, packed_data, packet_size=20000, ack_window=1,
+                           max_resends=10):
+        """Creates a new waveform on the AWG and saves the data, see TekAwg.new_waveform.
+
+            Args:
+                max_resends: number of times a window is resent in a row after the AWG
+                    reported an error, before the upload fails
+
+            Returns:
+                float, the achieved throughput of the upload in bytes per second
+
+            Raises:
+                IOError: if there was a connection error, or the AWG kept reporting errors"""
+        packed_data = _as_upload_array(packed_data)
+        num_points = len(packed_data)
+        start_time = time.time()
+
+        await self.get_error_queue()
+        if '"'+filename+'"' in await self.get_waveform_list():
+            await self.del_waveform(filename)
+        await self.write('WLISt:WAVeform:NEW "'+filename+'",'+str(num_points)+","
+                         +_waveform_type(packed_data))
+
+        packets = [(i, min(packet_size, num_points-i))
+                   for i in range(0, num_points, packet_size)]
+        if ack_window is None:
+            ack_window = max(len(packets), 1)
+        if ack_window < 1:
+            raise ValueError("ack_window must be at least 1.")
+
+        checkpoint = 0
+        failures = 0
+        while checkpoint < len(packets):
+            window = packets[checkpoint:checkpoint+ack_window]
+            async with self._lock:
+                for i, (start, size) in enumerate(window):
+                    self.writer.write(_to_bytes('WLIST:WAVEFORM:DATA "'+filename+'",'
+                                                +str(start)+','+str(size)+','
+                                                +create_prefix_for_length(
+                                                    size*packed_data.itemsize)))
+                    self.writer.write(memoryview(packed_data[start:start+size]
+                                                 .view(np.uint8)))
+                    self.writer.write(b";*ESR?\r\n" if i == len(window)-1 else b"\r\n")
+                    await self.writer.drain()
+                status = await self._read_ack()
+            if status == "0":
+                checkpoint += len(window)
+                failures = 0
+                continue
+            #an error occured, resend everything after the last clean checkpoint
+            failures += 1
+            if failures > max_resends:
+                raise IOError("Failed to upload waveform {}, the AWG still reported an error "
+                              "after {} resends (*ESR? {}): {}".format(
+                                  filename, max_resends, status,
+                                  await self.get_error_queue()))
+
+        errs = await self.get_error_queue()
+        if errs != []:
+            print(errs)
+        return packed_data.nbytes/max(time.time()-start_time, 1e-9)
+
+    async def _read_ack(self):
+        """Read the response to the *ESR? ending a window of packets, see
+        TekAwg.__read_ack. If it did not arrive in time the responses are resynced, and
+        the late acknowledgement returned if it arrived before the marker, None if it did
+        not, and the window is resent."""
+        try:
+            return await asyncio.wait_for(self._read_response(), self.timeout)
+        except asyncio.TimeoutError:
+            if self.idn is None:
+                return None
+        late = await self._resync(self.timeout)
+        return late[-1] if late else None
+
+    async def del_waveform(self, filename):
+        """Delete Specified Waveform"""
+        await self.write('WLISt:WAVeform:DELete "'+filename+'"')
+
+#######################   AWG SETTINGS  ############################
+
+    async def get_serial(self):
+        """Returns the hardware serial number and ID as a string"""
+        return await self.write("*IDN?", True)
+
+    async def get_freq(self):
+        """Returns the current sample rate of the AWG"""
+        return await self.write("FREQ?", True)
+
+    async def set_freq(self, freq):
+        """Sets the current sample rate of the AWG"""
+        await self.write("FREQ "+str(freq))
+
+    async def get_run_mode(self):
+        """Gets the current running mode of the AWG: SEQ, CONT, TRIG, GAT"""
+        return await self.write("AWGCONTROL:RMODE?", True)
+
+    async def set_run_mode(self, mode):
+        """Sets the run mode of the AWG, allowed modes are:
+            continuous, triggered, gated, sequence"""
+        if mode.lower() in ["continuous", "cont",
+                            "trigered", "trig",
+                            "gated", "gat",
+                            "sequence", "seq"]:
+            await self.write("AWGCONTROL:RMODE "+mode)
+
+    async def get_run_state(self):
+        """Gets the current state of the AWG, possible states are:
+        stopped, waiting for trigger, or running"""
+        state = await self.write("AWGControl:RSTate?", True)
+        states = {"0": "Stopped", "1": "Waiting for Trigger", "2": "Running"}
+        if state not in states:
+            raise IOError("Not valid run state")
+        return states[state]
+
+    async def run(self):
+        """Start running the AWG"""
+        await self.write("AWGControl:RUN")
+
+    async def stop(self):
+        """Stop the AWG"""
+        await self.write("AWGCONTROL:STOP")
+
+    async def _get_channels(self, query, channel, convert=str):
+        """Ask for the same setting of several channels in one message, query is formatted
+        with the channel number"""
+        if channel is None: channel = [1, 2, 3, 4]
+        if not isinstance(channel, list): channel = [channel]
+        cmd_str = ';'.join([query.format(c) for c in channel])
+        return [convert(x) for x in _split_fields(await self.write(cmd_str, True, len(channel)))]
+
+    async def _set_channels(self, command, value, channel, name):
+        """Set the same setting of several channels in one message, command is formatted
+        with the channel number and value"""
+        if channel is None: channel = [1, 2, 3, 4]
+        if not isinstance(channel, list): channel = [channel]
+        if not isinstance(value, list): value = [value]*len(channel)
+
+        if len(value) != len(channel):
+            raise ValueError("Number of channels does not match number of {}.".format(name))
+        await self.write(';'.join([command.format(int(c), v) for c, v in zip(channel, value)]))
+
+    async def get_amplitude(self, channel=None):
+        return await self._get_channels(':SOURCE{}:VOLTAGE?', channel, float)
+
+    async def set_amplitude(self, amplitude, channel=None):
+        await self._set_channels(':SOURCE{}:VOLTAGE {}', amplitude, channel, "amplitudes")
+
+    async def get_offset(self, channel=None):
+        return await self._get_channels(':SOURCE{}:VOLTAGE:OFFSET?', channel, float)
+
+    async def set_offset(self, offset, channel=None):
+        await self._set_channels(':SOURCE{}:VOLTAGE:OFFSET {}', offset, channel, "offsets")
+
+    async def get_marker_high(self, marker, channel=None):
+        return await self._get_channels(':SOURCE{}:MARKER'+str(int(marker))+':VOLTAGE:HIGH?',
+                                        channel, float)
+
+    async def set_marker_high(self, voltage, marker, channel=None):
+        assert int(marker) in [1, 2]
+        await self._set_channels(':SOURCE{}:MARKER'+str(int(marker))+':VOLTAGE:HIGH {}',
+                                 voltage, channel, "voltages")
+
+    async def get_marker_low(self, marker, channel=None):
+        return await self._get_channels(':SOURCE{}:MARKER'+str(int(marker))+':VOLTAGE:LOW?',
+                                        channel, float)
+
+    async def set_marker_low(self, voltage, marker, channel=None):
+        assert int(marker) in [1, 2]
+        await self._set_channels(':SOURCE{}:MARKER'+str(int(marker))+':VOLTAGE:LOW {}',
+                                 voltage, channel, "voltages")
+
+    async def get_chan_state(self, channel=None):
+        return await self._get_channels(':OUTPUT{}?', channel, int)
+
+    async def set_chan_state(self, state, channel=None):
+        """Set whether the channels are on or off, where 0 means off and 1 means on"""
+        await self._set_channels(':OUTPUT{}:STATE {}', state, channel, "states")
+
+    async def get_trig_source(self):
+        return await self.write("TRIG:SOUR?", True)
+
+    async def set_trig_source(self, source):
+        if source.lower() in ["int", "internal", "ext", "external"]:
+            await self.write("TRIG:SOUR "+source)
+
+    async def get_trig_interval(self):
+        return float(await self.write("TRIG:TIM?", True))
+
+    async def set_trig_interval(self, interval):
+        assert float(interval) > 0
+        await self.write("TRIG:TIM "+str(float(interval)))
+
+    async def trig(self):
+        await self.write("*TRG")
+
+####################  SEQUENCER ######################
+
+    async def get_cur_waveform(self, channel=None):
+        return await self._get_channels(':SOURCE{}:WAV?', channel)
+
+    async def set_cur_waveform(self, waveform_name, channel=None):
+        await self._set_channels(':SOURCE{}:WAV "{}"', waveform_name, channel, "waveforms")
+
+    async def set_seq_element(self, element_index, waveform_name, channel=None):
+        await self._set_channels(':Sequence:ELEM'+str(element_index)+':WAV{} "{}"',
+                                 waveform_name, channel, "waveforms")
+
+    async def get_seq_element(self, element_index, channel=None):
+        return await self._get_channels(':Sequence:ELEM'+str(element_index)+':WAV{}?', channel)
+
+    async def get_seq_element_loop_cnt(self, element_index):
+        return await self.write('SEQuence:ELEMent'+str(element_index)+':LOOP:COUNt?', True)
+
+    async def set_seq_element_loop_cnt(self, element_index, count):
+        await self.write('SEQuence:ELEMent'+str(element_index)+':LOOP:COUNt '+str(count))
+
+    async def get_seq_length(self):
+        return int(await self.write('SEQ:LENGTH?', True, 1))
+
+    async def set_seq_length(self, length):
+        await self.write('SEQ:LENGTH '+str(length))
+
+    async def get_seq_element_jmp_ind(self, element_index):
+        tar_type = await self.get_seq_element_jmp_type(element_index)
+        if tar_type == "IND":
+            return await self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:INDex?',
+                                    True, 1)
+        return tar_type
+
+    async def set_seq_element_jmp_ind(self, element_index, target):
+        await self.set_seq_element_jmp_type(element_index, "ind")
+        await self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:INDex '+str(target))
+
+    async def get_seq_element_jmp_type(self, element_index):
+        return await self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:TYPE?', True, 1)
+
+    async def set_seq_element_jmp_type(self, element_index, tar_type):
+        if tar_type.lower() in ["index", "ind", "next", "off"]:
+            await self.write('SEQuence:ELEMent'+str(element_index)+':JTARget:TYPE '
+                             +str(tar_type))
+
+    async def get_seq_list(self):
+        """Get the current list of waveforms in the sequencer"""
+        seq_length = await self.get_seq_length()
+        return [await self.get_seq_element(i+1) for i in range(seq_length)]
+
+    async def set_seq_list(self, seq_list, timeout=10.):
+        """Set the sequence list"""
+        assert isinstance(seq_list, list)
+        assert isinstance(seq_list[0], list)
+        assert len(seq_list[0]) == 4
+
+        await self.set_seq_length(len(seq_list))
+        cmd_str = []
+        for i, element in enumerate(seq_list):
+            for k in range(4):
+                cmd_str.append(':Seq:ELEM'+str(i+1)+':WAV'+str(k+1)+' "'+element[k]+'"')
+            cmd_str.append(':SEQ:ELEM'+str(i+1)+':JTAR:TYPE NEXT')
+        await asyncio.wait_for(self.write(';'.join(cmd_str)), timeout)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""Benchmarks of the transfer throughput, command latency and waveform conversion rates of
+TekAwg, run against the TekAwgMock emulator (or a real AWG) and reported as JSON so results
+can be compared between versions.
+
+Usage:
+
+    python TekAwgBench.py --output results.json
+    python TekAwgBench.py --latency 0.0005 --bandwidth 12.5e6 --sizes 100000 1000000
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+import TekAwg
+import TekAwgMock
+
+
+def _timeit(func, repeat):
+    """Run func repeat times, returns the list of durations in seconds"""
+    times = []
+    for _ in range(repeat):
+        start_time = time.time()
+        func()
+        times.append(time.time()-start_time)
+    return times
+
+
+def _result(name, params, times, amount=None, unit=None):
+    """Summarize the durations of one benchmark, amount is the quantity processed per run
+    (bytes, samples, queries) which rates are given in, per second"""
+    times = sorted(times)
+    result = {"name": name,
+              "params": params,
+              "repeat": len(times),
+              "best_s": times[0],
+              "median_s": times[len(times)//2]}
+    if amount is not None:
+        result["rate"] = amount/max(times[len(times)//2], 1e-12)
+        result["unit"] = unit+"/s"
+    return result
+
+
+def _test_codes(num_points):
+    arb = np.sin(np.linspace(0, 200*np.pi, num_points))
+    mk1 = np.arange(num_points) % 100 < 50
+    return TekAwg.merge_arb_and_markers(arb, mk1)
+
+
+def bench_upload(awg, sizes, packet_sizes, ack_windows=(1,), repeat=3):
+    """new_waveform throughput over a sweep of waveform sizes, packet sizes and ack windows"""
+    results = []
+    for size in sizes:
+        codes = _test_codes(size)
+        for packet_size in packet_sizes:
+            for ack_window in ack_windows:
+                times = _timeit(lambda: awg.new_waveform("bench_upload", codes, packet_size,
+                                                         ack_window), repeat)
+                results.append(_result("upload", {"points": size, "packet_size": packet_size,
+                                                  "ack_window": ack_window},
+                                       times, codes.nbytes, "bytes"))
+    return results
+
+
+def bench_download(awg, sizes, repeat=3):
+    """get_waveform_data throughput over a sweep of waveform sizes"""
+    results = []
+    for size in sizes:
+        codes = _test_codes(size)
+        awg.new_waveform("bench_download", codes, ack_window=None)
+        times = _timeit(lambda: awg.get_waveform_data("bench_download"), repeat)
+        results.append(_result("download", {"points": size}, times, codes.nbytes, "bytes"))
+    return results
+
+
+def bench_query_latency(awg, batch_sizes=(1, 4, 16, 64), repeat=20):
+    """Round trip time of single queries, and of batches of queries sent as one message"""
+    results = []
+    times = _timeit(lambda: awg.write("*ESR?", True), repeat)
+    results.append(_result("query_single", {"queries": 1}, times, 1, "queries"))
+    for batch_size in batch_sizes:
+        message = ";".join(["*ESR?"]*batch_size)
+        times = _timeit(lambda: awg.write(message, True, batch_size), repeat)
+        results.append(_result("query_batched", {"queries": batch_size}, times,
+                               batch_size, "queries"))
+        times = _timeit(lambda: [awg.write("*ESR?", True) for _ in range(batch_size)], repeat)
+        results.append(_result("query_serial", {"queries": batch_size}, times,
+                               batch_size, "queries"))
+    return results
+
+
+def bench_conversion(sizes, repeat=5):
+    """Sample rates of the waveform encode/decode helpers"""
+    results = []
+    for size in sizes:
+        arb = np.sin(np.linspace(0, 200*np.pi, size))
+        mk1 = np.arange(size) % 100 < 50
+        mk2 = np.arange(size) % 7 == 0
+        codes = TekAwg.merge_arb_and_markers(arb, mk1, mk2)
+        params = {"points": size}
+        results.append(_result("bifloat_to_uint", params,
+                               _timeit(lambda: TekAwg.bifloat_to_uint(arb, 14), repeat),
+                               size, "samples"))
+        results.append(_result("merge_arb_and_markers", params,
+                               _timeit(lambda: TekAwg.merge_arb_and_markers(arb, mk1, mk2),
+                                       repeat),
+                               size, "samples"))
+        results.append(_result("unmerge_arb_and_markers", params,
+                               _timeit(lambda: TekAwg.unmerge_arb_and_markers(codes), repeat),
+                               size, "samples"))
+        out = np.empty(size, dtype="<u2")
+        results.append(_result("encode_waveform_into", params,
+                               _timeit(lambda: TekAwg.encode_waveform(arb, mk1, mk2, out=out),
+                                       repeat),
+                               size, "samples"))
+        outputs = (np.empty(size), np.empty(size, dtype=bool), np.empty(size, dtype=bool))
+        results.append(_result("decode_waveform_into", params,
+                               _timeit(lambda: TekAwg.decode_waveform(codes, 14, *outputs),
+                                       repeat),
+                               size, "samples"))
+    return results
+
+
+def run_benchmarks(address=None, sizes=(10000, 100000, 1000000),
+                   packet_sizes=(5000, 20000, 100000), ack_windows=(1, 8),
+                   conversion_sizes=(1000000, 10000000), latency=0., bandwidth=None,
+                   repeat=3):
+    """Run every benchmark, against the AWG at address, or a local MockAwgServer with the
+    given latency and bandwidth if address is None.
+
+    Returns: a dict with the environment and the list of results"""
+    server = None
+    if address is None:
+        server = TekAwgMock.MockAwgServer(latency=latency, bandwidth=bandwidth).start()
+        address = server.address
+    awg = TekAwg.TekAwg(*address)
+    try:
+        results = []
+        results += bench_upload(awg, sizes, packet_sizes, ack_windows, repeat)
+        results += bench_download(awg, sizes, repeat)
+        results += bench_query_latency(awg)
+        results += bench_conversion(conversion_sizes, repeat)
+        for name in ("bench_upload", "bench_download"):
+            awg.del_waveform(name)
+    finally:
+        awg.close()
+        if server is not None:
+            server.stop()
+
+    return {"environment": {"python": platform.python_version(),
+                            "numpy": np.__version__,
+                            "platform": platform.platform(),
+                            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            "target": "mock" if server is not None else "{}:{}".format(*address),
+                            "latency": latency,
+                            "bandwidth": bandwidth},
+            "results": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--address", nargs=2, metavar=("IP", "PORT"),
+                        help="benchmark a real AWG instead of the emulator")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10000, 100000, 1000000])
+    parser.add_argument("--packet-sizes", nargs="+", type=int, default=[5000, 20000, 100000])
+    parser.add_argument("--ack-windows", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--conversion-sizes", nargs="+", type=int,
+                        default=[1000000, 10000000])
+    parser.add_argument("--latency", type=float, default=0.,
+                        help="emulated response latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="emulated link bandwidth in bytes per second")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    address = None if args.address is None else (args.address[0], int(args.address[1]))
+    report = run_benchmarks(address, args.sizes, args.packet_sizes, args.ack_windows,
+                            args.conversion_sizes, args.latency, args.bandwidth, args.repeat)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
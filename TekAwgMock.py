@@ -0,0 +1,768 @@
+#!/usr/bin/env python
+"""Local emulation of a tektronix AWG5000 series for testing and benchmarking TekAwg without
+an instrument. Only the subset of SCPI used by TekAwg is understood."""
+
+from __future__ import print_function
+
+import socket
+import threading
+import random
+import time
+import collections
+import re
+import numpy as np
+
+
+#(long form, short form) of every SCPI header node the emulator understands
+_scpi_nodes = [("WLIST", "WLIS"), ("WAVEFORM", "WAV"), ("SEQUENCE", "SEQ"),
+               ("ELEMENT", "ELEM"), ("JTARGET", "JTAR"), ("INDEX", "IND"), ("TYPE", "TYPE"),
+               ("LOOP", "LOOP"), ("COUNT", "COUN"), ("INFINITE", "INF"), ("TWAIT", "TWA"),
+               ("GOTO", "GOTO"), ("STATE", "STAT"), ("SOURCE", "SOUR"), ("VOLTAGE", "VOLT"),
+               ("AMPLITUDE", "AMPL"), ("LEVEL", "LEV"), ("IMMEDIATE", "IMM"),
+               ("OFFSET", "OFFS"), ("MARKER", "MARK"), ("HIGH", "HIGH"), ("LOW", "LOW"),
+               ("OUTPUT", "OUTP"), ("AWGCONTROL", "AWGC"), ("RMODE", "RMOD"),
+               ("RSTATE", "RST"), ("RUN", "RUN"), ("STOP", "STOP"), ("TRIGGER", "TRIG"),
+               ("TIMER", "TIM"), ("FREQUENCY", "FREQ"), ("LENGTH", "LENG"), ("NAME", "NAME"),
+               ("SIZE", "SIZE"), ("DATA", "DATA"), ("NEW", "NEW"), ("DELETE", "DEL"),
+               ("TSTAMP", "TST"), ("SYSTEM", "SYST"), ("ERROR", "ERR"), ("NEXT", "NEXT"),
+               ("DAC", "DAC"), ("RESOLUTION", "RES")]
+
+#numpy dtypes of a single point of the AWG's waveform formats
+_waveform_dtypes = {"INT":  np.dtype("<u2"),
+                    "REAL": np.dtype("<f4, <u1")}
+
+#bits of the standard event status register
+_ESR_EXECUTION_ERROR = 16
+_ESR_COMMAND_ERROR = 32
+
+#sample rate range of the AWG5000 series, the AWG clamps FREQ to it
+_freq_range = (10e6, 1.2e9)
+
+
+class ScpiError(Exception):
+    """An error the emulated AWG puts in its error queue, code is the SCPI error number."""
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+
+class MockAwgServer(object):
+    """TCP server emulating a tektronix AWG5000 series. It holds an in memory waveform store,
+    sequence table and channel settings, shared by every connection, and answers the WLIST,
+    SEQ, SOURCE, OUTPUT, AWGCONTROL, TRIGGER, *ESR? and SYSTEM:ERR? commands used by TekAwg,
+    including IEEE binary blocks.
+
+    Latency, bandwidth and errors can be injected to measure and regression test the
+    transfer code without hardware.
+
+    Example:
+
+        with TekAwgMock.MockAwgServer(latency=0.001) as server:
+            awg = TekAwg.TekAwg(*server.address)
+            awg.new_waveform("pulse", codes)
+            print(server.waveforms["pulse"]["data"])
+            awg.close()
+
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0., bandwidth=None, error_rate=0.,
+                 seed=None, num_channels=4, idn="TEKTRONIX,AWG5014C,MOCK,SCPI:99.0"):
+        """Args:
+                host, port: address to listen on, port 0 picks a free port
+
+                latency: seconds the emulator waits before answering a message with queries
+
+                bandwidth: bytes per second the connection is limited to, None for unlimited
+
+                error_rate: probability that a waveform data packet is rejected with a
+                    "Data out of range" error, as if it were corrupted in transfer
+
+                seed: seed of the random number generator used for error injection"""
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.num_channels = num_channels
+        self.idn = idn
+        self.random = random.Random(seed)
+        self.forced_errors = 0
+        self.command_errors = {}
+        self.lock = threading.RLock()
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.reset()
+
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((host, port))
+        self._listener.listen(5)
+        self._running = False
+        self._threads = []
+        self._connections = []
+
+    @property
+    def address(self):
+        """(host, port) the emulator is listening on"""
+        return self._listener.getsockname()[:2]
+
+    def reset(self):
+        """Clear all waveforms, the sequence and the error state, and restore the default
+        settings."""
+        with self.lock:
+            self.waveforms = collections.OrderedDict()
+            self.sequence = []
+            self.esr = 0
+            self.error_queue = []
+            self.run_mode = "CONT"
+            self.run_state = 0
+            self.freq = 1.2e9
+            self.trig_source = "EXT"
+            self.trig_interval = 1e-3
+            channels = range(1, self.num_channels+1)
+            self.amplitude = dict((c, 0.6) for c in channels)
+            self.offset = dict((c, 0.) for c in channels)
+            self.marker_high = dict(((c, m), 1.) for c in channels for m in (1, 2))
+            self.marker_low = dict(((c, m), 0.) for c in channels for m in (1, 2))
+            self.output = dict((c, 0) for c in channels)
+            self.cur_waveform = dict((c, "") for c in channels)
+            self.dac_resolution = dict((c, 14) for c in channels)
+
+    def inject_errors(self, count=1, header=None):
+        """Reject the next count waveform data packets with a "Data out of range" error, or
+        the next count commands with the given header.
+
+            Args:
+                header: normalized header of the commands to reject, with numeric suffixes
+                    replaced by "#" (for example "SEQ:ELEM#:WAV#"), None for waveform data"""
+        with self.lock:
+            if header is None:
+                self.forced_errors += count
+            else:
+                self.command_errors[header] = self.command_errors.get(header, 0)+count
+
+    def start(self):
+        """Start accepting connections in a background thread, returns self"""
+        self._running = True
+        thread = threading.Thread(target=self._accept_loop)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def stop(self):
+        """Stop the server and close every connection"""
+        self._running = False
+        for connection in self._connections+[self._listener]:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            connection.close()
+        for thread in self._threads:
+            thread.join(1.)
+
+    def drop_connections(self):
+        """Close every client connection as if the network failed, new connections are
+        still accepted"""
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            connection.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+##################  CONNECTIONS  #############################
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                connection, _ = self._listener.accept()
+            except socket.error:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connections.append(connection)
+            thread = threading.Thread(target=self._serve, args=(connection,))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _serve(self, connection):
+        """Read messages from one connection, execute them and send back the responses"""
+        parser = MessageParser()
+        while self._running:
+            try:
+                data = connection.recv(1 << 16)
+            except socket.error:
+                break
+            if not data:
+                break
+            self._throttle(len(data))
+            parser.feed(data)
+            with self.lock:
+                self.bytes_received += len(data)
+            while True:
+                commands = parser.next_message()
+                if commands is None:
+                    break
+                response = self.execute(commands)
+                if response is not None:
+                    if self.latency:
+                        time.sleep(self.latency)
+                    self._throttle(len(response))
+                    try:
+                        connection.sendall(response)
+                    except socket.error:
+                        return
+                    with self.lock:
+                        self.bytes_sent += len(response)
+        connection.close()
+
+    def _throttle(self, num_bytes):
+        if self.bandwidth:
+            time.sleep(num_bytes/float(self.bandwidth))
+
+##################  COMMANDS  #############################
+
+    def execute(self, commands):
+        """Execute the commands of one message, returns the response as bytes or None if no
+        query was in the message"""
+        responses = []
+        path = []
+        with self.lock:
+            self.messages_received += 1
+            for text, block in commands:
+                text = text.strip()
+                if text == "" and block is None:
+                    continue
+                header, _, args = text.partition(" ")
+                header = header.strip()
+                if not header.startswith("*"):
+                    #commands after a ";" are relative to the path of the previous one
+                    if header.startswith(":"):
+                        nodes = header[1:].split(":")
+                    else:
+                        nodes = path+header.split(":")
+                    path = nodes[:-1]
+                else:
+                    nodes = [header]
+                try:
+                    response = self._command(nodes, _split_args(args), block)
+                except ScpiError as e:
+                    self._error(e.code, e.message)
+                    continue
+                except IndexError:
+                    #a handler read an argument which was not given
+                    self._error(-109, "Missing parameter")
+                    continue
+                except (ValueError, TypeError):
+                    #an argument could not be converted to the type the handler needs
+                    self._error(-104, "Data type error")
+                    continue
+                if response is not None:
+                    responses.append(response)
+        if responses == []:
+            return None
+        return b";".join(responses)+b"\n"
+
+    def _error(self, code, message):
+        self.esr |= _ESR_COMMAND_ERROR if -200 < code <= -100 else _ESR_EXECUTION_ERROR
+        self.error_queue.append('{},"{}"'.format(code, message))
+
+    def _command(self, nodes, args, block):
+        """Execute a single command, returns the response bytes for a query else None"""
+        query = nodes[-1].endswith("?")
+        if query:
+            nodes = nodes[:-1]+[nodes[-1][:-1]]
+        key, suffixes = _normalize_header(nodes)
+        handler = _handlers.get((key, query))
+        if handler is None:
+            raise ScpiError(-113, "Undefined header")
+        if not query and self.command_errors.get(key, 0) > 0:
+            self.command_errors[key] -= 1
+            raise ScpiError(-222, "Data out of range")
+        response = handler(self, suffixes, args, block)
+        if query:
+            if isinstance(response, bytes):
+                return response
+            return str(response).encode("latin-1")
+        return None
+
+    def _waveform(self, name):
+        name = _unquote(name)
+        if name not in self.waveforms:
+            raise ScpiError(-224, "Illegal parameter value")
+        return self.waveforms[name]
+
+    def _element(self, index):
+        index = int(index)
+        if not 1 <= index <= len(self.sequence):
+            raise ScpiError(-222, "Data out of range")
+        return self.sequence[index-1]
+
+    def _new_element(self):
+        return {"wav": dict((c, "") for c in range(1, self.num_channels+1)),
+                "loop": 1, "inf": 0, "twait": 0, "jtype": "OFF", "jind": 1,
+                "goto": 0, "goto_ind": 1}
+
+##################  COMMAND HANDLERS  #############################
+
+    def _idn(self, s, a, b): return self.idn
+    def _rst(self, s, a, b): self.reset()
+    def _cls(self, s, a, b):
+        self.esr = 0
+        self.error_queue = []
+    def _opc(self, s, a, b): return 1
+    def _trg(self, s, a, b): pass
+
+    def _esr(self, s, a, b):
+        esr, self.esr = self.esr, 0
+        return esr
+
+    def _syst_err(self, s, a, b):
+        if self.error_queue:
+            return self.error_queue.pop(0)
+        return '0,"No error"'
+
+    def _wlist_size(self, s, a, b): return len(self.waveforms)
+
+    def _wlist_name(self, s, a, b):
+        names = list(self.waveforms.keys())
+        index = int(a[0])
+        if not 0 <= index < len(names):
+            raise ScpiError(-222, "Data out of range")
+        return '"'+names[index]+'"'
+
+    def _wav_length(self, s, a, b): return len(self._waveform(a[0])["data"])
+    def _wav_type(self, s, a, b): return self._waveform(a[0])["type"]
+    def _wav_tstamp(self, s, a, b): return '"'+self._waveform(a[0])["tstamp"]+'"'
+
+    def _wav_new(self, s, a, b):
+        name = _unquote(a[0])
+        wave_type = a[2].upper() if len(a) > 2 else "INT"
+        if name in self.waveforms or wave_type not in _waveform_dtypes:
+            raise ScpiError(-224, "Illegal parameter value")
+        self.waveforms[name] = {"type": wave_type,
+                                "data": np.zeros(int(a[1]), _waveform_dtypes[wave_type]),
+                                "tstamp": _timestamp()}
+
+    def _wav_delete(self, s, a, b):
+        if a[0].upper() == "ALL":
+            self.waveforms.clear()
+        else:
+            self._waveform(a[0])
+            del self.waveforms[_unquote(a[0])]
+
+    def _wav_data(self, s, a, b):
+        waveform = self._waveform(a[0])
+        if b is None:
+            raise ScpiError(-161, "Invalid block data")
+        if self.forced_errors > 0 or (self.error_rate and
+                                      self.random.random() < self.error_rate):
+            self.forced_errors = max(self.forced_errors-1, 0)
+            raise ScpiError(-222, "Data out of range")
+        data = waveform["data"]
+        if len(b) % data.itemsize != 0:
+            raise ScpiError(-161, "Invalid block data")
+        values = np.frombuffer(b, dtype=data.dtype)
+        start = int(a[1]) if len(a) > 2 and a[1] != "" else 0
+        size = int(a[2]) if len(a) > 3 and a[2] != "" else len(values)
+        if size != len(values) or start < 0 or start+size > len(data):
+            raise ScpiError(-222, "Data out of range")
+        data[start:start+size] = values
+        waveform["tstamp"] = _timestamp()
+
+    def _wav_data_query(self, s, a, b):
+        data = self._waveform(a[0])["data"]
+        start = int(a[1]) if len(a) > 1 else 0
+        size = int(a[2]) if len(a) > 2 else len(data)-start
+        if start < 0 or size < 0 or start+size > len(data):
+            raise ScpiError(-222, "Data out of range")
+        raw = data[start:start+size].tobytes()
+        return ("#"+str(len(str(len(raw))))+str(len(raw))).encode("latin-1")+raw
+
+    def _seq_length(self, s, a, b):
+        length = int(a[0])
+        if length < 0:
+            raise ScpiError(-222, "Data out of range")
+        self.sequence = (self.sequence+[self._new_element()
+                                        for _ in range(length)])[:length]
+
+    def _seq_length_query(self, s, a, b): return len(self.sequence)
+
+    def _elem_wav(self, s, a, b):
+        name = _unquote(a[0])
+        if name != "" and name not in self.waveforms:
+            raise ScpiError(-224, "Illegal parameter value")
+        self._element(s[0])["wav"][s[1] or 1] = name
+
+    def _elem_wav_query(self, s, a, b):
+        return '"'+self._element(s[0])["wav"][s[1] or 1]+'"'
+
+    def _elem_loop(self, s, a, b): self._element(s[0])["loop"] = int(a[0])
+    def _elem_loop_query(self, s, a, b): return self._element(s[0])["loop"]
+    def _elem_inf(self, s, a, b): self._element(s[0])["inf"] = _bool(a[0])
+    def _elem_inf_query(self, s, a, b): return self._element(s[0])["inf"]
+    def _elem_twait(self, s, a, b): self._element(s[0])["twait"] = _bool(a[0])
+    def _elem_twait_query(self, s, a, b): return self._element(s[0])["twait"]
+    def _elem_goto(self, s, a, b): self._element(s[0])["goto"] = _bool(a[0])
+    def _elem_goto_query(self, s, a, b): return self._element(s[0])["goto"]
+    def _elem_goto_ind(self, s, a, b): self._element(s[0])["goto_ind"] = int(a[0])
+    def _elem_goto_ind_query(self, s, a, b): return self._element(s[0])["goto_ind"]
+    def _elem_jind(self, s, a, b): self._element(s[0])["jind"] = int(a[0])
+    def _elem_jind_query(self, s, a, b): return self._element(s[0])["jind"]
+
+    def _elem_jtype(self, s, a, b):
+        jtype = _normalize_node(a[0])
+        if jtype not in ("IND", "NEXT", "OFF"):
+            raise ScpiError(-224, "Illegal parameter value")
+        self._element(s[0])["jtype"] = jtype
+
+    def _elem_jtype_query(self, s, a, b): return self._element(s[0])["jtype"]
+
+    def _channel(self, s):
+        channel = s[0] or 1
+        if channel not in self.amplitude:
+            raise ScpiError(-114, "Header suffix out of range")
+        return channel
+
+    def _amplitude(self, s, a, b): self.amplitude[self._channel(s)] = float(a[0])
+    def _amplitude_query(self, s, a, b): return _nr3(self.amplitude[self._channel(s)])
+    def _offset(self, s, a, b): self.offset[self._channel(s)] = float(a[0])
+    def _offset_query(self, s, a, b): return _nr3(self.offset[self._channel(s)])
+
+    def _marker_high(self, s, a, b):
+        self.marker_high[(self._channel(s), s[1] or 1)] = float(a[0])
+
+    def _marker_high_query(self, s, a, b):
+        return _nr3(self.marker_high[(self._channel(s), s[1] or 1)])
+
+    def _marker_low(self, s, a, b):
+        self.marker_low[(self._channel(s), s[1] or 1)] = float(a[0])
+
+    def _marker_low_query(self, s, a, b):
+        return _nr3(self.marker_low[(self._channel(s), s[1] or 1)])
+
+    def _output(self, s, a, b): self.output[self._channel(s)] = _bool(a[0])
+    def _output_query(self, s, a, b): return self.output[self._channel(s)]
+
+    def _cur_waveform(self, s, a, b):
+        self._waveform(a[0])
+        self.cur_waveform[self._channel(s)] = _unquote(a[0])
+
+    def _cur_waveform_query(self, s, a, b):
+        return '"'+self.cur_waveform[self._channel(s)]+'"'
+
+    def _dac_resolution(self, s, a, b):
+        resolution = int(a[0])
+        if resolution not in (8, 10, 12, 14):
+            raise ScpiError(-224, "Illegal parameter value")
+        self.dac_resolution[self._channel(s)] = resolution
+
+    def _dac_resolution_query(self, s, a, b): return self.dac_resolution[self._channel(s)]
+
+    def _freq(self, s, a, b):
+        freq = float(a[0])
+        self.freq = min(max(freq, _freq_range[0]), _freq_range[1])
+        if self.freq != freq:
+            self._error(-222, "Data out of range")
+
+    def _freq_query(self, s, a, b): return _nr3(self.freq)
+
+    def _run_mode(self, s, a, b):
+        modes = {"CONTINUOUS": "CONT", "CONT": "CONT", "TRIGGERED": "TRIG", "TRIGERED": "TRIG",
+                 "TRIG": "TRIG", "GATED": "GAT", "GAT": "GAT", "SEQUENCE": "SEQ", "SEQ": "SEQ",
+                 "ENHANCED": "ENH", "ENH": "ENH"}
+        if a[0].upper() not in modes:
+            raise ScpiError(-224, "Illegal parameter value")
+        self.run_mode = modes[a[0].upper()]
+
+    def _run_mode_query(self, s, a, b): return self.run_mode
+    def _run_state_query(self, s, a, b): return self.run_state
+
+    def _run(self, s, a, b):
+        self.run_state = 2 if self.run_mode == "CONT" else 1
+
+    def _stop(self, s, a, b): self.run_state = 0
+
+    def _trig_source(self, s, a, b):
+        source = a[0].upper()
+        if source not in ("INT", "INTERNAL", "EXT", "EXTERNAL"):
+            raise ScpiError(-224, "Illegal parameter value")
+        self.trig_source = source[:3]
+
+    def _trig_source_query(self, s, a, b): return self.trig_source
+    def _trig_interval(self, s, a, b): self.trig_interval = float(a[0])
+    def _trig_interval_query(self, s, a, b): return _nr3(self.trig_interval)
+
+
+#(normalized header, is query): handler
+_handlers = {
+    ("*IDN", True): MockAwgServer._idn,
+    ("*RST", False): MockAwgServer._rst,
+    ("*CLS", False): MockAwgServer._cls,
+    ("*OPC", True): MockAwgServer._opc,
+    ("*TRG", False): MockAwgServer._trg,
+    ("*ESR", True): MockAwgServer._esr,
+    ("SYST:ERR", True): MockAwgServer._syst_err,
+    ("WLIS:SIZE", True): MockAwgServer._wlist_size,
+    ("WLIS:NAME", True): MockAwgServer._wlist_name,
+    ("WLIS:WAV:LENG", True): MockAwgServer._wav_length,
+    ("WLIS:WAV:TYPE", True): MockAwgServer._wav_type,
+    ("WLIS:WAV:TST", True): MockAwgServer._wav_tstamp,
+    ("WLIS:WAV:NEW", False): MockAwgServer._wav_new,
+    ("WLIS:WAV:DEL", False): MockAwgServer._wav_delete,
+    ("WLIS:WAV:DATA", False): MockAwgServer._wav_data,
+    ("WLIS:WAV:DATA", True): MockAwgServer._wav_data_query,
+    ("SEQ:LENG", False): MockAwgServer._seq_length,
+    ("SEQ:LENG", True): MockAwgServer._seq_length_query,
+    ("SEQ:ELEM#:WAV#", False): MockAwgServer._elem_wav,
+    ("SEQ:ELEM#:WAV#", True): MockAwgServer._elem_wav_query,
+    ("SEQ:ELEM#:LOOP:COUN", False): MockAwgServer._elem_loop,
+    ("SEQ:ELEM#:LOOP:COUN", True): MockAwgServer._elem_loop_query,
+    ("SEQ:ELEM#:LOOP:INF", False): MockAwgServer._elem_inf,
+    ("SEQ:ELEM#:LOOP:INF", True): MockAwgServer._elem_inf_query,
+    ("SEQ:ELEM#:TWA", False): MockAwgServer._elem_twait,
+    ("SEQ:ELEM#:TWA", True): MockAwgServer._elem_twait_query,
+    ("SEQ:ELEM#:GOTO:STAT", False): MockAwgServer._elem_goto,
+    ("SEQ:ELEM#:GOTO:STAT", True): MockAwgServer._elem_goto_query,
+    ("SEQ:ELEM#:GOTO:IND", False): MockAwgServer._elem_goto_ind,
+    ("SEQ:ELEM#:GOTO:IND", True): MockAwgServer._elem_goto_ind_query,
+    ("SEQ:ELEM#:JTAR:TYPE", False): MockAwgServer._elem_jtype,
+    ("SEQ:ELEM#:JTAR:TYPE", True): MockAwgServer._elem_jtype_query,
+    ("SEQ:ELEM#:JTAR:IND", False): MockAwgServer._elem_jind,
+    ("SEQ:ELEM#:JTAR:IND", True): MockAwgServer._elem_jind_query,
+    ("SOUR#:VOLT", False): MockAwgServer._amplitude,
+    ("SOUR#:VOLT", True): MockAwgServer._amplitude_query,
+    ("SOUR#:VOLT:AMPL", False): MockAwgServer._amplitude,
+    ("SOUR#:VOLT:AMPL", True): MockAwgServer._amplitude_query,
+    ("SOUR#:VOLT:LEV:IMM:AMPL", False): MockAwgServer._amplitude,
+    ("SOUR#:VOLT:LEV:IMM:AMPL", True): MockAwgServer._amplitude_query,
+    ("SOUR#:VOLT:OFFS", False): MockAwgServer._offset,
+    ("SOUR#:VOLT:OFFS", True): MockAwgServer._offset_query,
+    ("SOUR#:VOLT:LEV:IMM:OFFS", False): MockAwgServer._offset,
+    ("SOUR#:VOLT:LEV:IMM:OFFS", True): MockAwgServer._offset_query,
+    ("SOUR#:MARK#:VOLT:HIGH", False): MockAwgServer._marker_high,
+    ("SOUR#:MARK#:VOLT:HIGH", True): MockAwgServer._marker_high_query,
+    ("SOUR#:MARK#:VOLT:LOW", False): MockAwgServer._marker_low,
+    ("SOUR#:MARK#:VOLT:LOW", True): MockAwgServer._marker_low_query,
+    ("SOUR#:WAV", False): MockAwgServer._cur_waveform,
+    ("SOUR#:WAV", True): MockAwgServer._cur_waveform_query,
+    ("SOUR#:DAC:RES", False): MockAwgServer._dac_resolution,
+    ("SOUR#:DAC:RES", True): MockAwgServer._dac_resolution_query,
+    ("SOUR#:FREQ", False): MockAwgServer._freq,
+    ("SOUR#:FREQ", True): MockAwgServer._freq_query,
+    ("FREQ", False): MockAwgServer._freq,
+    ("FREQ", True): MockAwgServer._freq_query,
+    ("OUTP#", False): MockAwgServer._output,
+    ("OUTP#", True): MockAwgServer._output_query,
+    ("OUTP#:STAT", False): MockAwgServer._output,
+    ("OUTP#:STAT", True): MockAwgServer._output_query,
+    ("AWGC:RMOD", False): MockAwgServer._run_mode,
+    ("AWGC:RMOD", True): MockAwgServer._run_mode_query,
+    ("AWGC:RST", True): MockAwgServer._run_state_query,
+    ("AWGC:RUN", False): MockAwgServer._run,
+    ("AWGC:STOP", False): MockAwgServer._stop,
+    ("TRIG:SOUR", False): MockAwgServer._trig_source,
+    ("TRIG:SOUR", True): MockAwgServer._trig_source_query,
+    ("TRIG:TIM", False): MockAwgServer._trig_interval,
+    ("TRIG:TIM", True): MockAwgServer._trig_interval_query,
+}
+
+
+#characters which mean something to the message parser
+_special_characters = re.compile(b'["#;\n]')
+
+
+class MessageParser(object):
+    """Incremental parser splitting the data received on a connection into messages. Data is
+    fed as it arrives and the parse position is kept between feeds, so a long message which
+    arrives in many pieces is only scanned once."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        #start of the text of the current command, and where the next scan starts
+        self._start = 0
+        self._pos = 0
+        #the commands, text and block of the current message parsed so far
+        self._commands = []
+        self._text = []
+        self._block = None
+
+    def feed(self, data):
+        """Add received data to the buffer"""
+        if self._start > len(self.buffer)//2:
+            #drop the parsed data once it is most of the buffer
+            del self.buffer[:self._start]
+            self._pos -= self._start
+            self._start = 0
+        self.buffer.extend(data)
+
+    def next_message(self):
+        """Returns the next complete newline terminated message as a list of (text, block)
+        commands, see parse_message, or None if the buffer does not yet hold one."""
+        buf = self.buffer
+        search = _special_characters.search
+        start, pos = self._start, self._pos
+        commands, text, block = self._commands, self._text, self._block
+        message = None
+        while True:
+            match = search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                break
+            i = match.start()
+            char = buf[i]
+            if char == 34: #"
+                end = buf.find(b'"', i+1)
+                if end < 0:
+                    pos = i
+                    break
+                pos = end+1
+            elif char == 35: ##
+                if len(buf) < i+2:
+                    pos = i
+                    break
+                digits = buf[i+1:i+2]
+                if not digits.isdigit() or digits == b"0":
+                    pos = i+1
+                    continue
+                num_digits = int(digits)
+                end = i+2+num_digits
+                if len(buf) >= end:
+                    end += int(bytes(buf[i+2:end]))
+                if len(buf) < end:
+                    pos = i
+                    break
+                text.append(bytes(buf[start:i]))
+                block = bytes(buf[i+2+num_digits:end])
+                start = pos = end
+            else:
+                if text:
+                    text.append(bytes(buf[start:i]))
+                    command = b"".join(text)
+                    text = []
+                else:
+                    command = bytes(buf[start:i])
+                commands.append((command.decode("latin-1"), block))
+                block = None
+                start = pos = i+1
+                if char == 10: #newline
+                    message, commands = commands, []
+                    break
+        self._start, self._pos = start, pos
+        self._commands, self._text, self._block = commands, text, block
+        return message
+
+
+def parse_message(buf):
+    """Split the first complete newline terminated message in buf into its ";" separated
+    commands, skipping over quoted strings and IEEE definite length blocks.
+
+    Args:
+        buf: bytearray of the data received so far
+
+    Returns: (commands, consumed) where commands is a list of (text, block) tuples, text is
+        the command with any block removed and block is the block data as bytes or None, and
+        consumed is the number of bytes of buf making up the message. None if buf does not
+        yet hold a complete message.
+    """
+    parser = MessageParser()
+    parser.feed(buf)
+    commands = parser.next_message()
+    if commands is None:
+        return None
+    return commands, parser._start
+
+
+def _normalize_node(node):
+    """Short form of a SCPI header node, any numeric suffix is left in place"""
+    node = node.upper()
+    for long_form, short_form in _scpi_nodes:
+        if node.startswith(short_form) and long_form.startswith(node):
+            return short_form
+    return node
+
+
+def _normalize_header(nodes):
+    """Returns the normalized header, with numeric suffixes replaced by "#", and the list
+    of suffixes (None where a node which takes a suffix had none)"""
+    key = []
+    suffixes = []
+    for node in nodes:
+        stripped = node.rstrip("0123456789")
+        short = _normalize_node(stripped)
+        if short in ("SOUR", "ELEM", "WAV", "MARK", "OUTP"):
+            suffix = node[len(stripped):]
+            suffixes.append(int(suffix) if suffix else None)
+            key.append(short+"#")
+        else:
+            key.append(short)
+    key = ":".join(key)
+    #WAV is only suffixed inside a sequence element, SOURce has no suffix under TRIGger
+    key = key.replace("WLIS:WAV#", "WLIS:WAV").replace("SOUR#:WAV#", "SOUR#:WAV")
+    key = key.replace("TRIG:SOUR#", "TRIG:SOUR")
+    if key in ("WLIS:WAV:LENG", "WLIS:WAV:TYPE", "WLIS:WAV:TST", "WLIS:WAV:NEW",
+               "WLIS:WAV:DEL", "WLIS:WAV:DATA", "SOUR#:WAV", "TRIG:SOUR"):
+        suffixes = [s for s in suffixes if s is not None][:1]
+    return key, suffixes
+
+
+def _split_args(args):
+    """Split the arguments of a command on "," outside of quotes"""
+    args = args.strip()
+    if args == "":
+        return []
+    result = []
+    current = []
+    in_quote = False
+    for char in args:
+        if char == '"':
+            in_quote = not in_quote
+        if char == "," and not in_quote:
+            result.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    result.append("".join(current).strip())
+    return result
+
+
+def _unquote(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return value[1:-1]
+    return value
+
+
+def _bool(value):
+    return 1 if value.strip().upper() in ("1", "ON") else 0
+
+
+def _nr3(value):
+    """Format a number the way the AWG answers numeric queries, e.g. 1.2000000000E+9"""
+    mantissa, exponent = ("%.10E" % value).split("E")
+    return "{}E{:+d}".format(mantissa, int(exponent))
+
+
+def _timestamp():
+    return time.strftime("%Y/%m/%d %H:%M:%S")
+
+
+if __name__ == "__main__":
+    import sys
+    server = MockAwgServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 4001).start()
+    print("Mock AWG listening on {}:{}".format(*server.address))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
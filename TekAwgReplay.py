@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Replay of TekAwg session logs, recorded with TekAwg.start_recording, against the
+TekAwgMock emulator (or a real AWG), with the original or accelerated timing, to reproduce
+the traffic of real sessions offline and benchmark changes to the transfer code.
+
+The replay sends the recorded messages in order, and before each one waits for as many
+responses as the recorded session had received by then, so the request/response cadence
+of the original session is kept even when the stand-in answers at a different speed.
+A response which never arrives, for example a query about a waveform the emulator does not
+hold, costs the timeout; that wait is left out of the replayed duration and of the original
+timing, and reported as missing_wait_s.
+
+Usage:
+
+    awg.start_recording("session.log.gz")
+    ...
+    awg.stop_recording()
+
+    python TekAwgReplay.py session.log.gz --speed 10 --output replay.json
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import socket
+import sys
+import time
+
+import TekAwg
+import TekAwgMock
+
+
+def load_schedule(path):
+    """Read a session log into the list of (seconds, data, responses) messages to send,
+    where responses is the number of responses received before the message was sent"""
+    counter = TekAwg.ResponseCounter()
+    schedule = []
+    for direction, seconds, data in TekAwg.read_session(path):
+        if direction == b"S":
+            schedule.append((seconds, data, counter.count))
+        else:
+            counter.feed(data)
+    return schedule, counter.count
+
+
+def replay_session(path, address=None, speed=1., timeout=5., latency=0., bandwidth=None):
+    """Replay a session log.
+
+        Args:
+            path: the session log
+
+            address: (ip, port) of the AWG to replay against, None for a local
+                MockAwgServer with the given latency and bandwidth
+
+            speed: factor the original timing is sped up by, None to send every message as
+                soon as the responses it waited for have arrived
+
+            timeout: seconds to wait for a response before counting it as missing
+
+        Returns: a dict of the recorded and replayed durations, the numbers of messages,
+            bytes and responses, and the responses which never arrived with the seconds
+            spent waiting for them, which are not part of the replayed duration"""
+    schedule, total_responses = load_schedule(path)
+    server = None
+    if address is None:
+        server = TekAwgMock.MockAwgServer(latency=latency, bandwidth=bandwidth).start()
+        address = server.address
+    sock = socket.create_connection(address)
+    sock.settimeout(timeout)
+    counter = TekAwg.ResponseCounter()
+    state = {"missing": 0, "missing_wait_s": 0., "bytes_received": 0}
+
+    def wait_for(responses):
+        while counter.count+state["missing"] < responses:
+            wait_start = time.time()
+            try:
+                data = sock.recv(1 << 16)
+            except socket.timeout:
+                state["missing"] = responses-counter.count
+                state["missing_wait_s"] += time.time()-wait_start
+                return
+            if not data:
+                raise IOError("Connection closed during the replay.")
+            state["bytes_received"] += len(data)
+            counter.feed(data)
+
+    bytes_sent = 0
+    try:
+        start_time = time.time()
+        for seconds, data, responses in schedule:
+            wait_for(responses)
+            if speed:
+                delay = start_time+state["missing_wait_s"]+seconds/speed-time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            sock.sendall(data)
+            bytes_sent += len(data)
+        wait_for(total_responses)
+        replayed_s = time.time()-start_time-state["missing_wait_s"]
+    finally:
+        sock.close()
+        if server is not None:
+            server.stop()
+
+    return {"log": path,
+            "target": "mock" if server is not None else "{}:{}".format(*address),
+            "speed": speed,
+            "recorded_s": schedule[-1][0] if schedule else 0.,
+            "replayed_s": replayed_s,
+            "messages": len(schedule),
+            "bytes_sent": bytes_sent,
+            "bytes_received": state["bytes_received"],
+            "responses_expected": total_responses,
+            "responses_received": counter.count,
+            "missing_responses": state["missing"],
+            "missing_wait_s": state["missing_wait_s"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("log", help="session log written by TekAwg.start_recording")
+    parser.add_argument("--address", nargs=2, metavar=("IP", "PORT"),
+                        help="replay against a real AWG instead of the emulator")
+    parser.add_argument("--speed", type=float, default=1.,
+                        help="speed up factor of the original timing, 0 for no delays")
+    parser.add_argument("--timeout", type=float, default=5.)
+    parser.add_argument("--latency", type=float, default=0.,
+                        help="emulated response latency in seconds")
+    parser.add_argument("--bandwidth", type=float, default=None,
+                        help="emulated link bandwidth in bytes per second")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    address = None if args.address is None else (args.address[0], int(args.address[1]))
+    report = replay_session(args.log, address, args.speed or None, args.timeout,
+                            args.latency, args.bandwidth)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,16 @@
+import sys
 from distutils.core import setup
 
+py_modules = ['TekAwg', 'TekAwgMock', 'TekAwgBench', 'TekAwgReplay']
+#the asyncio client does not compile on python 2, and needs python 3.7
+if sys.version_info >= (3, 7):
+    py_modules.append('TekAwgAsync')
+
 setup(name='TekAwg',
       version='0.1',
       description='Tektronix AWG ethernet interface for python',
       author='Dar Dahlen',
       author_email='dardahlen@gmail.com',
       url='https://github.com/dahlend/TekAwg/',
-      py_modules=['TekAwg']
-     )
\ No newline at end of file
+      py_modules=py_modules
+     )
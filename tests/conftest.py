@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import TekAwg
+import TekAwgMock
+
+
+@pytest.fixture
+def server():
+    server = TekAwgMock.MockAwgServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def awg(server):
+    awg = TekAwg.TekAwg(*server.address)
+    yield awg
+    awg.close()
+
+
+@pytest.fixture
+def codes():
+    return TekAwg.encode_waveform(np.linspace(-1, 1, 1000))
@@ -0,0 +1,125 @@
+import sys
+
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip("TekAwgAsync needs python 3.7", allow_module_level=True)
+
+import asyncio
+import time
+
+import numpy as np
+
+import TekAwg
+import TekAwgAsync
+import TekAwgMock
+
+
+def test_long_batched_replies(server):
+    #the names of 5000 waveforms are a reply well past the 64 KiB StreamReader limit
+    for i in range(5000):
+        server.waveforms["waveform_with_a_long_name_%04d" % i] = {
+            "type": "INT", "data": np.zeros(1, "<u2"), "tstamp": ""}
+
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address, timeout=30.)
+        names = await awg.get_waveform_list()
+        lengths = await awg.get_waveform_lengths(names)
+        await awg.close()
+        return names, lengths
+
+    names, lengths = asyncio.run(main())
+    assert len(names) == 5000 and names[-1] == '"waveform_with_a_long_name_4999"'
+    assert lengths == ["1"]*5000
+
+
+def test_async_upload(server, codes):
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address)
+        await awg.new_waveform("wave", codes, 300, 2)
+        await awg.close()
+
+    asyncio.run(main())
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def _delay_data_packets(server, seconds):
+    """Make the emulator answer messages holding waveform data late"""
+    execute = server.execute
+    def delayed_execute(commands):
+        if any(block is not None for _, block in commands):
+            time.sleep(seconds)
+        return execute(commands)
+    server.execute = delayed_execute
+
+
+def test_slow_ack_does_not_shift_responses(server, codes):
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address, timeout=.1)
+        _delay_data_packets(server, .15)
+        await awg.new_waveform("wave", codes, 500)
+        responses = (await awg.write("WLIST:SIZE?", True), await awg.get_serial())
+        await awg.close()
+        return responses
+
+    assert asyncio.run(main()) == ("1", server.idn)
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_late_response_is_not_resent(server):
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address, timeout=.1)
+        server.latency = .12
+        size = await awg.write("WLIST:SIZE?", True)
+        server.latency = 0.
+        responses = (size, await awg.get_serial(), await awg.get_freq())
+        await awg.close()
+        return responses
+
+    assert asyncio.run(main()) == ("0", server.idn, "1.2000000000E+9")
+    #*IDN? on connect, WLIST:SIZE? once, the *IDN? marker, then the two queries
+    assert server.messages_received == 5
+
+
+def test_async_download_uses_bit_depth(server):
+    codes = TekAwg.encode_waveform(np.linspace(-1, 1, 255), bit_depth=8)
+    server.dac_resolution[1] = 8
+    server.waveforms["wave"] = {"type": "INT", "data": codes, "tstamp": ""}
+
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address)
+        arb, _, _ = await awg.get_waveform_data("wave")
+        await awg.close()
+        return arb
+
+    assert np.allclose(asyncio.run(main()), np.linspace(-1, 1, 255), atol=.5/127)
+
+
+def test_async_bit_depth_probe_keeps_earlier_errors(server, monkeypatch):
+    monkeypatch.delitem(TekAwgMock._handlers, ("SOUR#:DAC:RES", True))
+
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address)
+        await awg.set_cur_waveform("missing", 1)
+        bit_depth = await awg.get_bit_depth()
+        errors = await awg.get_error_queue()
+        await awg.close()
+        return bit_depth, errors
+
+    bit_depth, errors = asyncio.run(main())
+    assert bit_depth == 14
+    assert len(errors) == 1 and not errors[0].startswith("-113")
+    assert server.error_queue == []
+
+
+def test_async_names_with_separators(server, codes):
+    server.waveforms["a;b"] = {"type": "INT", "data": codes, "tstamp": ""}
+
+    async def main():
+        awg = await TekAwgAsync.AsyncTekAwg.connect(*server.address)
+        names = await awg.get_waveform_list()
+        lengths = await awg.get_waveform_lengths(names)
+        await awg.close()
+        return names, lengths
+
+    assert asyncio.run(main()) == (['"a;b"'], ["1000"])
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def test_batch_joins_commands(server, awg):
+    with awg.batch() as batch:
+        awg.set_freq(1e9)
+        awg.set_amplitude(0.5, 1)
+        awg.set_run_mode("trig")
+    assert batch.messages_sent == 1
+    assert server.freq == 1e9
+    assert server.amplitude[1] == 0.5
+    assert server.run_mode == "TRIG"
+
+
+def test_batch_query_future(awg):
+    with awg.batch() as batch:
+        awg.set_freq(1e9)
+        future = batch.query("FREQ?", convert=float)
+    assert future.result() == 1e9
+
+
+def test_upload_inside_batch(server, awg, codes):
+    with awg.batch(raise_errors=True):
+        awg.set_freq(1e9)
+        awg.new_waveform("wave", codes)
+        awg.set_cur_waveform("wave", 1)
+        arb, mk1, mk2 = awg.get_waveform_data("wave")
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+    assert server.cur_waveform[1] == "wave"
+    assert len(arb) == len(codes)
+
+
+def test_replace_inside_batch(server, awg, codes):
+    awg.new_waveform("wave", codes[::-1].copy())
+    with awg.batch(raise_errors=True):
+        awg.del_waveform("wave")
+        awg.new_waveform("wave", codes)
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
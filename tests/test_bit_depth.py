@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+import TekAwg
+import TekAwgMock
+
+
+def test_bit_depth_is_read_once(server, awg):
+    server.dac_resolution[1] = 8
+    assert awg.get_bit_depth() == 8
+    server.dac_resolution[1] = 14
+    assert awg.get_bit_depth() == 8
+
+
+def test_bit_depth_without_resolution_query(server, awg, monkeypatch, capsys):
+    monkeypatch.delitem(TekAwgMock._handlers, ("SOUR#:DAC:RES", True))
+    start = time.time()
+    assert awg.get_bit_depth() == 14
+    assert time.time()-start < awg.transport.timeout
+    assert "Timeout" not in capsys.readouterr().out
+    assert server.error_queue == []
+    assert awg.write("*ESR?", True) == "0"
+
+
+def test_bit_depth_probe_keeps_earlier_errors(server, awg, monkeypatch):
+    monkeypatch.delitem(TekAwgMock._handlers, ("SOUR#:DAC:RES", True))
+    awg.set_cur_waveform("missing", 1)
+    assert awg.get_bit_depth() == 14
+    assert server.error_queue == []
+    errors = awg.get_error_queue()
+    assert len(errors) == 1 and not errors[0].startswith("-113")
+    assert awg.get_error_queue() == []
+
+
+def test_10_bit_depth(server, awg, codes):
+    awg.set_bit_depth(10)
+    awg.write("*OPC?", True)
+    assert server.dac_resolution == {1: 10, 2: 10, 3: 10, 4: 10}
+    awg.bit_depth = None
+    assert awg.get_bit_depth() == 10
+    assert TekAwg.bifloat_to_uint([-1, 0, 1], 10) == [0, 511, 1022]
+
+
+def test_unsupported_bit_depth(server, awg):
+    with pytest.raises(ValueError):
+        awg.set_bit_depth(16)
+    server.dac_resolution[1] = 9
+    with pytest.raises(ValueError):
+        awg.get_bit_depth()
+    assert awg.bit_depth is None
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+import TekAwg
+import TekAwgMock
+
+
+def test_download_roundtrip(awg, codes):
+    awg.new_waveform("wave", codes)
+    arb, mk1, mk2 = awg.get_waveform_data("wave")
+    assert np.array_equal(TekAwg.encode_waveform(arb, mk1, mk2), codes)
+
+
+def test_failed_download_restores_the_timeout(server, codes, monkeypatch):
+    transport = TekAwg.Transport(timeout=.5, deadlines={"download": .05})
+    awg = TekAwg.TekAwg(*server.address, transport=transport)
+    try:
+        awg.new_waveform("wave", codes)
+        monkeypatch.delitem(TekAwgMock._handlers, ("WLIS:WAV:DATA", True))
+        with pytest.raises(IOError):
+            awg.get_waveform_data("wave")
+        assert awg.gettimeout() == .5
+    finally:
+        awg.close()
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import TekAwg
+
+
+@pytest.mark.parametrize("bit_depth", [8, 12, 14, 16])
+def test_encode_edge_values(bit_depth):
+    mult, offset = TekAwg._bit_depth_mult_offset[bit_depth]
+    codes = TekAwg.encode_waveform([-1.5, -1-1e-9, -1, -.5, 0, .5, 1, 1+1e-9, 1.5],
+                                   bit_depth=bit_depth)
+    assert codes.dtype == np.dtype("<u2")
+    #halves round up, values outside [-1.0, 1.0] are clipped
+    assert codes.tolist() == [0, 0, 0, offset-mult//2, offset, offset+mult//2+1,
+                              offset+mult, offset+mult, offset+mult]
+
+
+@pytest.mark.parametrize("bit_depth", [8, 12, 14])
+def test_encode_markers(bit_depth):
+    mult, offset = TekAwg._bit_depth_mult_offset[bit_depth]
+    codes = TekAwg.encode_waveform([-1, 0, 1, 1], [0, 1, 0, 2.5], [0, 0, True, True],
+                                   bit_depth=bit_depth)
+    assert codes.tolist() == [0, offset | 1 << 14, offset+mult | 1 << 15,
+                              offset+mult | 3 << 14]
+    assert TekAwg.encode_waveform(mk1=[1, 0], bit_depth=bit_depth).tolist() == \
+        [offset | 1 << 14, offset]
+
+
+def test_encode_rejects_markers_at_16_bits():
+    with pytest.raises(ValueError):
+        TekAwg.encode_waveform([0, 1], [1, 0], bit_depth=16)
+    with pytest.raises(ValueError):
+        TekAwg.encode_waveform([0, 1], bit_depth=13)
+    with pytest.raises(TekAwg.UnequalPatternLengths):
+        TekAwg.encode_waveform([0, 1], [1])
+
+
+@pytest.mark.parametrize("bit_depth", [8, 12, 14, 16])
+def test_encode_decode_round_trip(bit_depth):
+    mult, _ = TekAwg._bit_depth_mult_offset[bit_depth]
+    arb = np.linspace(-1, 1, 1001)
+    mk1 = mk2 = None
+    if bit_depth <= 14:
+        mk1, mk2 = np.arange(1001) % 2 == 0, np.arange(1001) % 3 == 0
+    codes = TekAwg.encode_waveform(arb, mk1, mk2, bit_depth, block_size=64)
+    decoded, dec_mk1, dec_mk2 = TekAwg.decode_waveform(codes, bit_depth, block_size=100)
+    assert np.abs(decoded-arb).max() <= .5/mult+1e-12
+    assert decoded[0] == -1 and decoded[-1] == 1
+    if mk1 is None:
+        assert not dec_mk1.any() and not dec_mk2.any()
+    else:
+        assert (dec_mk1 == mk1).all() and (dec_mk2 == mk2).all()
+    raw = TekAwg.decode_waveform(codes, bit_depth, arb=np.empty(1001, dtype=np.uint16))[0]
+    assert (raw == TekAwg.encode_waveform(arb, bit_depth=bit_depth)).all()
+
+
+def test_encode_into_out():
+    out = np.zeros(300, dtype=np.uint16)
+    arb = np.linspace(-1, 1, 300)
+    result = TekAwg.encode_waveform(arb, bit_depth=12, out=out, block_size=7)
+    assert result is out
+    assert (out == TekAwg.encode_waveform(arb, bit_depth=12)).all()
+    with pytest.raises(ValueError):
+        TekAwg.encode_waveform(arb, out=np.zeros(299, dtype=np.uint16))
+
+
+def test_decode_into_outputs():
+    codes = TekAwg.encode_waveform([-1, 0, 1], [1, 0, 1], [0, 1, 0])
+    arb, mk1, mk2 = np.empty(3), np.empty(3, dtype=bool), np.empty(3, dtype=bool)
+    assert TekAwg.decode_waveform(codes, arb=arb, mk1=mk1, mk2=mk2) == (arb, mk1, mk2)
+    assert arb.tolist() == [-1, 0, 1]
+    assert mk1.tolist() == [True, False, True] and mk2.tolist() == [False, True, False]
+    with pytest.raises(ValueError):
+        TekAwg.decode_waveform(codes, arb=np.empty(4))
+
+
+@pytest.mark.parametrize("bit_depth", [8, 12, 14, 16])
+def test_bifloat_to_uint(bit_depth):
+    mult, offset = TekAwg._bit_depth_mult_offset[bit_depth]
+    assert TekAwg.bifloat_to_uint(.5, bit_depth) == offset+mult//2+1
+    assert isinstance(TekAwg.bifloat_to_uint(.5, bit_depth), int)
+    assert TekAwg.bifloat_to_uint([-2, 0, 1], bit_depth) == [0, offset, offset+mult]
+    codes = TekAwg.bifloat_to_uint(np.array([[-1, 0], [1, 2]]), bit_depth)
+    assert codes.dtype == np.dtype("<u2") and codes.shape == (2, 2)
+    assert codes.tolist() == [[0, offset], [offset+mult, offset+mult]]
+    assert TekAwg.uint_to_bifloat(codes, bit_depth).tolist() == [[-1, 0], [1, 1]]
+    assert TekAwg.uint_to_bifloat([0, offset+mult], bit_depth) == [-1, 1]
+    with pytest.raises(ValueError):
+        TekAwg.bifloat_to_uint(0, 13)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+import TekAwg
+
+
+def _queue_errors(awg, count):
+    awg.write(";".join([":BOGUS"]*count))
+    awg.write("*OPC?", True)
+
+
+def test_drain_more_errors_than_batch_size(server, awg):
+    _queue_errors(awg, 20)
+    errors = awg.drain_error_queue(batch_size=8)
+    assert len(errors) == 20
+    assert all(error.startswith("-113") for error in errors)
+    assert server.error_queue == []
+    assert awg.drain_error_queue(batch_size=8) == []
+
+
+def test_get_error_queue_clears_esr(awg):
+    _queue_errors(awg, 3)
+    assert len(awg.get_error_queue()) == 3
+    assert awg.write("*ESR?", True) == "0"
+
+
+def test_error_polling_modes(server, awg, codes):
+    with pytest.raises(ValueError):
+        awg.set_error_polling("never")
+    awg.set_error_polling("checkpoint")
+    server.inject_errors(2)
+    awg.new_waveform("wave", codes, packet_size=200)
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_split_fields():
+    assert TekAwg._split_fields("1;2") == ["1", "2"]
+    assert TekAwg._split_fields('"a;b";"c";3') == ['"a;b"', '"c"', "3"]
+    assert TekAwg._split_fields('1,"x;y"') == ['1,"x;y"']
+    assert TekAwg._split_fields('"open;') == ['"open;']
+
+
+def test_names_with_separators(server, awg, codes):
+    awg.new_waveform("a;b", codes)
+    awg.new_waveform("c", codes)
+    assert list(awg.scan_waveforms()) == ["a;b", "c"]
+
+
+def test_reupload_name_with_separators(server, awg, codes):
+    awg.new_waveform("a;b", codes)
+    assert awg.get_waveform_list() == ['"a;b"']
+    assert awg.has_waveform("a;b")
+    assert awg.get_waveform_lengths(['"a;b"', '"a;b"']) == ["1000", "1000"]
+    awg.new_waveform("a;b", codes[:500])
+    assert len(server.waveforms["a;b"]["data"]) == 500
+    assert awg.get_error_queue() == []
+    awg.set_seq_length(1)
+    awg.set_seq_element(1, "a;b", 1)
+    assert awg.get_seq_element(1, [1, 2])[0] == '"a;b"'
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import TekAwg
+import TekAwgMock
+
+
+@pytest.fixture
+def servers():
+    servers = [TekAwgMock.MockAwgServer().start() for _ in range(3)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def group(servers):
+    group = TekAwg.AwgGroup(dict(("awg{}".format(i), TekAwg.TekAwg(*server.address))
+                                 for i, server in enumerate(servers)))
+    yield group
+    group.close()
+
+
+def test_group_uploads_to_every_awg(servers, group, codes):
+    result = group.new_waveform("wave", codes)
+    assert result.ok
+    assert sorted(result.results) == ["awg0", "awg1", "awg2"]
+    assert sorted(result.times) == ["awg0", "awg1", "awg2"]
+    assert result.serial_time >= max(result.times.values())
+    for server in servers:
+        assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_group_reports_partial_failure(servers, codes):
+    transport = TekAwg.Transport(max_resends=1)
+    group = TekAwg.AwgGroup([TekAwg.TekAwg(*server.address, transport=transport)
+                             for server in servers], max_workers=2)
+    try:
+        servers[1].inject_errors(100)
+        result = group.new_waveform("wave", codes, packet_size=200)
+        assert not result.ok
+        assert sorted(result.results) == [0, 2]
+        assert list(result.errors) == [1]
+        assert isinstance(result.errors[1], IOError)
+        assert "1 errors" in repr(result)
+        assert "wave" in servers[0].waveforms and "wave" in servers[2].waveforms
+    finally:
+        group.close()
+
+
+def test_group_call_each(servers, group):
+    result = group.call_each("set_freq", {"awg0": ((1e9,), {}), "awg2": ((5e8,), {})})
+    assert result.ok
+    assert group["awg0"].get_freq() == "1.0000000000E+9"
+    assert servers[1].freq == 1.2e9
+    assert group["awg2"].get_freq() == "5.0000000000E+8"
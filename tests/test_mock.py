@@ -0,0 +1,62 @@
+import socket
+
+import pytest
+
+import TekAwgMock
+
+
+MESSAGES = (b'WLIST:WAV:NEW "a;b#1\\n",4,INT;*ESR?\n'
+            b'WLIST:WAV:DATA "a;b#1\\n",0,2,#14"\n;#;*ESR?\n'
+            b'SEQ:LENG 2;:SEQ:ELEM1:WAV1 "x";ELEM2:WAV1 "y"\n')
+
+
+def _parse_all(parser):
+    messages = []
+    while True:
+        message = parser.next_message()
+        if message is None:
+            return messages
+        messages.append(message)
+
+
+def test_parser_splits_commands_blocks_and_quotes():
+    parser = TekAwgMock.MessageParser()
+    parser.feed(MESSAGES)
+    messages = _parse_all(parser)
+    assert messages == [[('WLIST:WAV:NEW "a;b#1\\n",4,INT', None), ("*ESR?", None)],
+                        [('WLIST:WAV:DATA "a;b#1\\n",0,2,', b'"\n;#'), ("*ESR?", None)],
+                        [("SEQ:LENG 2", None), (':SEQ:ELEM1:WAV1 "x"', None),
+                         ('ELEM2:WAV1 "y"', None)]]
+
+
+def test_parser_is_incremental():
+    parser = TekAwgMock.MessageParser()
+    parser.feed(MESSAGES)
+    whole = _parse_all(parser)
+    parser = TekAwgMock.MessageParser()
+    pieces = []
+    for i in range(len(MESSAGES)):
+        parser.feed(MESSAGES[i:i+1])
+        pieces.extend(_parse_all(parser))
+    assert pieces == whole
+    assert TekAwgMock.parse_message(bytearray(MESSAGES))[0] == whole[0]
+
+
+def _send(server, message):
+    connection = socket.create_connection(server.address, timeout=2.)
+    try:
+        connection.sendall(message)
+        reader = connection.makefile("rb")
+        return reader.readline()
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("command, error", [(b"FREQ", b"-109"), (b"FREQ fast", b"-104"),
+                                            (b"SOUR1:VOLT", b"-109"),
+                                            (b"SEQ:LENG x", b"-104")])
+def test_malformed_commands_are_errors(server, command, error):
+    response = _send(server, command+b"\n*ESR?;SYST:ERR?;*IDN?\n")
+    assert response.startswith(b"32;"+error)
+    assert response.rstrip().endswith(server.idn.encode())
+    assert server.freq == 1.2e9
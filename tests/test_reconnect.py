@@ -0,0 +1,15 @@
+import time
+
+import TekAwg
+
+
+def test_session_commands_are_sent_after_reconnect(server):
+    transport = TekAwg.Transport(session_commands=["FREQ 1E9", "SOUR1:VOLT 0.5"])
+    awg = TekAwg.TekAwg(*server.address, transport=transport)
+    awg.write("*IDN?", True)
+    server.freq = 1.2e9
+    server.drop_connections()
+    time.sleep(.05)
+    assert awg.write("FREQ?", True) == "1.0000000000E+9"
+    assert awg.reconnects == 1
+    awg.close()
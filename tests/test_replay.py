@@ -0,0 +1,20 @@
+import numpy as np
+
+import TekAwgReplay
+
+
+def test_replay_recorded_session(server, awg, codes, tmp_path):
+    path = str(tmp_path / "session.log.gz")
+    #held by the recorded AWG only, so the replay gets no response to its length query
+    server.waveforms["old"] = {"type": "INT", "data": np.zeros(10, "<u2"), "tstamp": ""}
+    awg.start_recording(path)
+    awg.new_waveform("wave", codes)
+    assert awg.get_waveform_lengths(["old", "wave"]) == ["10", "1000"]
+    awg.stop_recording()
+
+    report = TekAwgReplay.replay_session(path, speed=None, timeout=.5)
+    assert report["target"] == "mock"
+    assert report["missing_responses"] == 1
+    assert report["missing_wait_s"] >= .5
+    assert report["replayed_s"] < .5
+    assert report["responses_received"] == report["responses_expected"]-1
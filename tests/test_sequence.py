@@ -0,0 +1,93 @@
+import collections
+
+import pytest
+
+import TekAwg
+
+
+def _upload_waveforms(awg, codes, names):
+    for name in names:
+        awg.new_waveform(name, codes)
+
+
+def _count_element_messages(server):
+    """Count how often the waveform of channel 1 of each element is programmed"""
+    counts = collections.Counter()
+    execute = server.execute
+    def counting_execute(commands):
+        for text, _ in commands:
+            header = text.strip().lstrip(":").split(" ")[0]
+            if header.startswith("SEQ:ELEM") and header.endswith(":WAV1"):
+                counts[int(header[len("SEQ:ELEM"):-len(":WAV1")])] += 1
+        return execute(commands)
+    server.execute = counting_execute
+    return counts
+
+
+def test_write_sequence(server, awg, codes):
+    _upload_waveforms(awg, codes, ["a", "b"])
+    awg.write_sequence([["a", "b", "a", "b"], ["b", "a", "b", "a"]])
+    assert [element["wav"][1] for element in server.sequence] == ["a", "b"]
+    assert awg.read_sequence().waveform_names(1) == ["b", "a", "b", "a"]
+
+
+def test_write_sequence_resends_only_the_failing_part(server, awg, codes):
+    _upload_waveforms(awg, codes, ["a", "b"])
+    counts = _count_element_messages(server)
+    server.inject_errors(1, "SEQ:ELEM#:LOOP:COUN")
+    awg.write_sequence([["a"]*4, ["b"]*4]*5, chunk_size=2, check_every=1)
+    assert [counts[element] for element in range(1, 11)] == [2, 2]+[1]*8
+    assert [element["wav"][1] for element in server.sequence] == ["a", "b"]*5
+    assert awg.get_error_queue() == []
+
+
+def test_write_sequence_gives_up(server, awg, codes):
+    _upload_waveforms(awg, codes, ["a"])
+    server.inject_errors(100, "SEQ:ELEM#:WAV#")
+    with pytest.raises(IOError) as error:
+        awg.write_sequence([["a"]*4]*3, max_attempts=2)
+    assert "Data out of range" in str(error.value)
+
+
+@pytest.mark.parametrize("max_attempts", [0, -1])
+def test_write_sequence_rejects_max_attempts(server, awg, codes, max_attempts):
+    _upload_waveforms(awg, codes, ["a"])
+    with pytest.raises(ValueError):
+        awg.write_sequence([["a"]*4], max_attempts=max_attempts)
+    with pytest.raises(ValueError):
+        awg.update_sequence([["a"]*4], max_attempts=max_attempts)
+    assert server.sequence == []
+
+
+def test_sequence_changes():
+    old = TekAwg.SequenceTable([["a"]*4, ["b"]*4, ["a"]*4])
+    new = TekAwg.SequenceTable([["a"]*4, ["a", "b", "b", "b"], ["a"]*4, ["b"]*4])
+    new.loop_count[2] = 5
+    changes = TekAwg.sequence_changes(old, new)
+    assert changes[:2] == [(1, [0], []), (2, [], ["loop_count"])]
+    assert changes[2][:2] == (3, [0, 1, 2, 3])
+    assert len(changes[2][2]) == 7
+    assert TekAwg.sequence_changes(new, old) == [(1, [0], []), (2, [], ["loop_count"])]
+
+
+def test_update_sequence_sends_only_changes(server, awg, codes):
+    _upload_waveforms(awg, codes, ["a", "b"])
+    sequence = TekAwg.SequenceTable([["a"]*4]*6)
+    awg.write_sequence(sequence)
+    new = TekAwg.SequenceTable([["a"]*4]*4+[["b", "a", "a", "a"], ["a"]*4])
+    counts = _count_element_messages(server)
+    assert awg.update_sequence(new) == [(4, [0], [])]
+    assert dict(counts) == {5: 1}
+    assert [element["wav"][1] for element in server.sequence] == ["a"]*4+["b", "a"]
+
+
+@pytest.mark.parametrize("length", [3, 8])
+def test_update_sequence_changes_length(server, awg, codes, length):
+    _upload_waveforms(awg, codes, ["a", "b"])
+    awg.write_sequence([["a"]*4]*5)
+    awg.applied_sequence = None
+    new = TekAwg.SequenceTable([["a"]*4]*(length-1)+[["b"]*4])
+    awg.update_sequence(new)
+    assert len(server.sequence) == length
+    assert [element["wav"][1] for element in server.sequence] == ["a"]*(length-1)+["b"]
+    assert awg.read_sequence().to_list() == new.to_list()
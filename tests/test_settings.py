@@ -0,0 +1,45 @@
+import TekAwg
+
+
+def test_cache_holds_awg_readback(awg):
+    awg.enable_settings_cache()
+    awg.set_freq(1.2e9)
+    cached = awg.get_freq()
+    awg.disable_settings_cache()
+    assert cached == awg.get_freq() == "1.2000000000E+9"
+
+
+def test_no_false_drift_after_set(awg):
+    awg.enable_settings_cache()
+    awg.set_freq(1e9)
+    awg.set_amplitude(0.5, 1)
+    awg.set_offset(0.1, [1, 2])
+    awg.set_run_mode("trig")
+    awg.set_trig_interval(1e-3)
+    assert awg.reconcile_settings() == {}
+    assert awg.get_amplitude(1) == [0.5]
+
+
+def test_clamped_value_is_cached_as_applied(server, awg):
+    awg.enable_settings_cache()
+    awg.set_freq(5e9)
+    assert float(awg.get_freq()) == server.freq == 1.2e9
+    assert awg.reconcile_settings() == {}
+    assert awg.drain_error_queue()
+
+
+def test_rejected_value_keeps_old_setting(awg):
+    awg.enable_settings_cache()
+    before = awg.get_cur_waveform(1)
+    awg.set_cur_waveform("missing", 1)
+    assert awg.get_cur_waveform(1) == before
+    assert awg.reconcile_settings() == {}
+
+
+def test_batch_invalidates_written_settings(server, awg):
+    awg.enable_settings_cache()
+    assert awg.get_freq() == "1.2000000000E+9"
+    with awg.batch():
+        awg.set_freq(1e9)
+    assert server.freq == 1e9
+    assert awg.get_freq() == "1.0000000000E+9"
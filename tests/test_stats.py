@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import TekAwg
+import TekAwgMock
+
+
+def test_write_is_recorded(awg):
+    stats = awg.enable_stats()
+    awg.write("*IDN?", True)
+    assert stats.family("*IDN?")["count"] == 1
+
+
+def test_pipelined_queries_are_recorded(awg):
+    stats = awg.enable_stats()
+    responses = awg.pipeline_queries(["*IDN?", "WLIST:SIZE?", "WLIST:SIZE?;*ESR?"], [1, 1, 2])
+    assert responses[1] == "0"
+    assert stats.family("*IDN?")["count"] == 1
+    assert stats.family("WLIST:SIZE?")["count"] == 2
+    assert stats.family("WLIST:SIZE?")["bytes_received"] == len("0")+len("0;0")
+    assert stats.family("WLIST:SIZE?")["failures"] == 0
+
+
+def test_queries_with_deadline_are_recorded(awg, codes):
+    awg.new_waveform("a", codes)
+    stats = awg.enable_stats()
+    awg.write_sequence([["a"]*4])
+    assert stats.family("SEQ:ELEM:WAV")["count"] == 1
+
+
+def test_pipelined_queries_reconnect(server, awg):
+    awg.write("*IDN?", True)
+    server.drop_connections()
+    time.sleep(.05)
+    assert awg.pipeline_queries(["WLIST:SIZE?", "*ESR?"]) == ["0", "0"]
+    assert awg.reconnects == 1
+
+
+def test_retry_depth_is_recorded(server, monkeypatch):
+    monkeypatch.delitem(TekAwgMock._handlers, ("FREQ", True))
+    awg = TekAwg.TekAwg(*server.address, transport=TekAwg.Transport(timeout=.1))
+    stats = awg.enable_stats()
+    events = []
+    stats.callbacks.append(events.append)
+    with pytest.raises(IOError):
+        awg.write("FREQ?", True)
+    awg.close()
+    entry = stats.family("FREQ?")
+    assert (entry["timeouts"], entry["retries"], entry["max_retry_depth"]) == (3, 2, 3)
+    assert entry["failures"] == 1 and events[-1].retry_depth == 3
+
+
+def test_reconnect_retry_depth_is_recorded(server, awg):
+    stats = awg.enable_stats()
+    awg.write("*IDN?", True)
+    server.drop_connections()
+    time.sleep(.05)
+    assert awg.write("WLIST:SIZE?", True) == "0"
+    entry = stats.family("WLIST:SIZE?")
+    assert (entry["timeouts"], entry["retries"], entry["max_retry_depth"]) == (0, 1, 1)
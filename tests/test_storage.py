@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+import TekAwg
+
+
+def test_waveform_cache_survives_reload(tmpdir):
+    path = str(tmpdir.join("cache.json"))
+    cache = TekAwg.WaveformCache(path)
+    cache.record("a", "digest-a", 10, "t1")
+    cache.record("a", "digest-b", 20, "t2")
+    assert TekAwg.WaveformCache(path).lookup("a", "digest-b") == ("digest-b", 20, "t2")
+    assert not os.path.exists(path+".tmp")
+
+
+def test_library_replaces_waveforms(tmpdir):
+    library = TekAwg.WaveformLibrary(str(tmpdir))
+    library.add("pulse", np.arange(10))
+    library.add("pulse", np.arange(20))
+    reloaded = TekAwg.WaveformLibrary(str(tmpdir))
+    assert np.array_equal(reloaded.get("pulse"), np.arange(20))
+    assert reloaded.verify("pulse")
+    assert [f for f in os.listdir(str(tmpdir)) if f.endswith(".tmp")] == []
+
+
+def test_replace_file_overwrites(tmpdir):
+    src, dst = tmpdir.join("src"), tmpdir.join("dst")
+    src.write("new")
+    dst.write("old")
+    TekAwg._replace_file(str(src), str(dst))
+    assert dst.read() == "new" and not src.exists()
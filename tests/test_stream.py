@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import TekAwg
+
+
+@pytest.fixture
+def arb():
+    return np.linspace(-1, 1, 5000)
+
+
+def test_stream_from_callable(server, awg, arb):
+    awg.new_waveform("wave", lambda start, stop: (arb[start:stop],), length=len(arb),
+                     chunk_size=1024, packet_size=300)
+    assert np.array_equal(server.waveforms["wave"]["data"], TekAwg.encode_waveform(arb))
+
+
+def test_stream_from_iterator_of_codes(server, awg, arb):
+    codes = TekAwg.encode_waveform(arb)
+    chunks = iter([codes[i:i+700] for i in range(0, len(codes), 700)])
+    awg.new_waveform("wave", chunks, length=len(codes))
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_stream_needs_length(awg, arb):
+    with pytest.raises(ValueError):
+        awg.new_waveform("wave", iter([(arb,)]))
+
+
+@pytest.mark.parametrize("length", [4000, 6000])
+def test_stream_of_wrong_length_is_deleted(server, arb, length):
+    cache = TekAwg.WaveformCache()
+    awg = TekAwg.TekAwg(*server.address, upload_cache=cache)
+    try:
+        index = awg.enable_waveform_index()
+        awg.new_waveform("wave", TekAwg.encode_waveform(arb[:length]))
+        assert "wave" in cache
+        chunks = iter([(arb[i:i+1000],) for i in range(0, len(arb), 1000)])
+        with pytest.raises(ValueError):
+            awg.new_waveform("wave", chunks, length=length)
+        assert not awg.has_waveform("wave")
+        assert "wave" not in index and "wave" not in cache
+        awg.write("*OPC?", True)
+        assert "wave" not in server.waveforms
+    finally:
+        awg.close()
+
+
+def test_failing_chunk_source_is_deleted(server, awg, arb):
+    def generate(start, stop):
+        if start >= 2000:
+            raise RuntimeError("synthesis failed")
+        return (arb[start:stop],)
+    with pytest.raises(RuntimeError):
+        awg.new_waveform("wave", generate, length=len(arb), chunk_size=1000)
+    awg.write("*OPC?", True)
+    assert "wave" not in server.waveforms
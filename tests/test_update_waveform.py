@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import TekAwg
+
+
+def _record_data_packets(server):
+    """List the number of points of every waveform data packet the emulator receives"""
+    sizes = []
+    execute = server.execute
+    def recording_execute(commands):
+        sizes.extend([len(block)//2 for _, block in commands if block is not None])
+        return execute(commands)
+    server.execute = recording_execute
+    return sizes
+
+
+def test_changed_ranges():
+    old = np.zeros(100, dtype="<u2")
+    new = old.copy()
+    assert TekAwg.changed_ranges(old, new) == []
+    new[10:12] = 1
+    new[15] = 1
+    new[80] = 1
+    assert TekAwg.changed_ranges(old, new) == [(10, 2), (15, 1), (80, 1)]
+    assert TekAwg.changed_ranges(old, new, merge_gap=3) == [(10, 6), (80, 1)]
+
+
+@pytest.mark.parametrize("keep_shadows", [False, True])
+def test_update_sends_only_changed_ranges(server, codes, keep_shadows):
+    awg = TekAwg.TekAwg(*server.address, keep_shadows=keep_shadows)
+    try:
+        awg.new_waveform("wave", codes)
+        new_codes = codes.copy()
+        new_codes[100:110] ^= 1
+        new_codes[500] ^= 1
+        sizes = _record_data_packets(server)
+        assert awg.update_waveform("wave", new_codes, merge_gap=8) == [(100, 10), (500, 1)]
+        assert sizes == [10, 1]
+        assert np.array_equal(server.waveforms["wave"]["data"], new_codes)
+        assert awg.update_waveform("wave", new_codes) == []
+    finally:
+        awg.close()
+
+
+def test_update_with_new_length_uploads_in_full(server, awg, codes):
+    awg.new_waveform("wave", codes)
+    assert awg.update_waveform("wave", codes[:600]) == [(0, 600)]
+    assert np.array_equal(server.waveforms["wave"]["data"], codes[:600])
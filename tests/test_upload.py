@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+import pytest
+
+import TekAwg
+
+
+def test_upload_roundtrip(awg, server, codes):
+    awg.new_waveform("wave", codes, packet_size=200, ack_window=2)
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_upload_resends_rejected_packets(awg, server, codes):
+    server.inject_errors(2)
+    awg.new_waveform("wave", codes, packet_size=200)
+    assert np.array_equal(server.waveforms["wave"]["data"], codes)
+
+
+def test_upload_gives_up_on_persistent_errors(server, codes):
+    transport = TekAwg.Transport(max_resends=2, deadlines={"upload": 2.})
+    awg = TekAwg.TekAwg(*server.address, transport=transport)
+    try:
+        server.inject_errors(100)
+        with pytest.raises(IOError) as error:
+            awg.new_waveform("wave", codes, packet_size=200)
+        assert "Data out of range" in str(error.value)
+        assert server.forced_errors == 100-3
+        assert awg.gettimeout() == awg.transport.timeout
+    finally:
+        awg.close()
+
+
+def test_adaptive_upload_gives_up_on_persistent_errors(server, codes):
+    awg = TekAwg.TekAwg(*server.address, transport=TekAwg.Transport(max_resends=2))
+    try:
+        server.inject_errors(100)
+        with pytest.raises(IOError):
+            awg.new_waveform("wave", codes, packet_size="auto")
+    finally:
+        awg.close()
+
+
+def _delay_data_packets(server, seconds):
+    """Make the emulator answer messages holding waveform data late"""
+    execute = server.execute
+    def delayed_execute(commands):
+        if any(block is not None for _, block in commands):
+            time.sleep(seconds)
+        return execute(commands)
+    server.execute = delayed_execute
+
+
+def test_slow_ack_is_waited_for(server, codes):
+    transport = TekAwg.Transport(deadlines={"upload": .02, "ack": 2.})
+    awg = TekAwg.TekAwg(*server.address, transport=transport)
+    try:
+        _delay_data_packets(server, .1)
+        awg.new_waveform("wave", codes, packet_size=500)
+        assert np.array_equal(server.waveforms["wave"]["data"], codes)
+        assert awg.write("WLIST:SIZE?", True) == "1"
+    finally:
+        awg.close()
+
+
+def test_late_ack_does_not_shift_responses(server, codes):
+    transport = TekAwg.Transport(deadlines={"upload": .02, "ack": .05})
+    awg = TekAwg.TekAwg(*server.address, transport=transport)
+    try:
+        _delay_data_packets(server, .1)
+        awg.new_waveform("wave", codes, packet_size=500)
+        assert np.array_equal(server.waveforms["wave"]["data"], codes)
+        assert awg.write("WLIST:SIZE?", True) == "1"
+        assert awg.write("WLIST:NAME? 0", True) == '"wave"'
+    finally:
+        awg.close()
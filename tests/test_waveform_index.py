@@ -0,0 +1,68 @@
+import pytest
+
+import TekAwg
+import TekAwgMock
+
+
+@pytest.fixture
+def other(server):
+    """A second connection changing the AWG behind the back of awg"""
+    other = TekAwg.TekAwg(*server.address)
+    yield other
+    other.close()
+
+
+def test_index_follows_upload_and_delete(server, awg, codes):
+    index = awg.enable_waveform_index()
+    awg.new_waveform("a", codes)
+    awg.new_waveform("b", codes[:500].copy())
+    assert list(index) == list(server.waveforms) == ["a", "b"]
+    assert index.get("b").length == 500
+    awg.del_waveform("a")
+    awg.write("*OPC?", True)
+    assert list(index) == list(server.waveforms) == ["b"]
+    assert not awg.has_waveform("a")
+    assert awg.has_waveform("b")
+
+
+def test_index_sees_waveforms_added_elsewhere(awg, other, codes):
+    index = awg.enable_waveform_index()
+    other.new_waveform("a", codes)
+    assert awg.has_waveform("a")
+    assert list(index) == ["a"]
+
+
+def test_index_sees_same_count_with_other_names(awg, other, codes):
+    index = awg.enable_waveform_index()
+    awg.new_waveform("a", codes)
+    other.del_waveform("a")
+    other.new_waveform("b", codes)
+    assert not awg.has_waveform("a")
+    assert list(index) == ["b"]
+
+
+def test_index_is_trusted_for_max_age(awg, other, codes):
+    index = awg.enable_waveform_index(max_age=None)
+    other.new_waveform("a", codes)
+    assert not awg.has_waveform("a")
+    index.invalidate()
+    assert awg.has_waveform("a")
+
+
+def test_print_waveform_list(awg, codes, capsys):
+    awg.new_waveform("a", codes)
+    assert awg.print_waveform_list() == 0
+    out = capsys.readouterr().out
+    assert '"a"' in out and "1000" in out and "Connection Error" not in out
+
+
+def test_print_waveform_list_keeps_partial_output(server, codes, monkeypatch, capsys):
+    awg = TekAwg.TekAwg(*server.address, transport=TekAwg.Transport(timeout=.2))
+    try:
+        awg.new_waveform("a", codes)
+        monkeypatch.delitem(TekAwgMock._handlers, ("WLIS:WAV:LENG", True))
+        assert awg.print_waveform_list() == -1
+    finally:
+        awg.close()
+    out = capsys.readouterr().out
+    assert '"a"' in out and "Connection Error, partial list printed only" in out